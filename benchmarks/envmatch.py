@@ -0,0 +1,103 @@
+# envmatch.py
+"""Check that the two environments of env.py play the same games
+
+BreakoutEnv plays one game at a time with Simulation, and VectorBreakoutEnv
+plays games in lock-step with BatchSimulation.  They must share the same
+dynamics, so an environment of each kind made with the same seed and given the
+same actions must return the same observations, rewards and done flags.
+
+This script steps BreakoutEnv(seed) and VectorBreakoutEnv(1,seed) side by side
+with seeded random actions, for several games in a row.  When a game is done,
+the vector environment starts the next one by itself, so its observation is
+checked against the one returned by BreakoutEnv.reset.  The actions lean toward
+following the ball, so that games last and hit bricks.  Run it from the
+repository root:
+
+    python benchmarks/envmatch.py
+    python benchmarks/envmatch.py --games 20 --seed 7
+
+The command exits with status 1 at the first step that differs."""
+import os
+import sys
+import random
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0,os.path.join(HERE,'..','breakout'))
+os.environ.setdefault('GAME2D_HEADLESS','1')
+
+#: the default number of games played
+GAMES = 5
+#: the default most steps in a game
+MAXTICKS = 20000
+#: the chance that an action is random instead of following the ball
+NOISE = 0.3
+
+
+def pick(observation, rand):
+    """Returns: an action for observation, usually one that follows the ball
+
+    Precondition: observation is an observation of env.py; rand is a random.Random"""
+    from env import ACTION_STAY, ACTION_LEFT, ACTION_RIGHT, ACTION_COUNT
+    from constants import BALL_DIAMETER, PADDLE_WIDTH
+    if rand.random() < NOISE:
+        return rand.randrange(ACTION_COUNT)
+    ball = observation[0]+BALL_DIAMETER/2.0
+    paddle = observation[4]+PADDLE_WIDTH/2.0
+    if ball < paddle-4:
+        return ACTION_LEFT
+    if ball > paddle+4:
+        return ACTION_RIGHT
+    return ACTION_STAY
+
+
+def compare(games=GAMES, seed=0, maxticks=MAXTICKS):
+    """Returns: (steps, failure), where failure describes the first difference or is None
+
+    steps is the number of steps that matched.
+
+    Precondition: games and maxticks are ints > 0; seed is an int >= 0"""
+    import numpy
+    from env import BreakoutEnv, VectorBreakoutEnv
+    single = BreakoutEnv(seed,maxticks)
+    vector = VectorBreakoutEnv(1,seed,maxticks)
+    rand = random.Random(seed)
+    observation = single.reset()
+    observations = vector.reset()
+    steps = 0
+    for game in xrange(games):
+        if not numpy.array_equal(observation,observations[0]):
+            return (steps,'game %d: the first observations differ' % game)
+        done = False
+        while not done:
+            action = pick(observation,rand)
+            observation, reward, done, info = single.step(action)
+            observations, rewards, dones, infos = vector.step(numpy.array([action]))
+            where = 'game %d, step %d' % (game,steps)
+            if done != dones[0]:
+                return (steps,'%s: done is %s, but %s in the vector' % (where,done,dones[0]))
+            if reward != rewards[0]:
+                return (steps,'%s: reward is %s, but %s in the vector' % (where,reward,rewards[0]))
+            if (info['bricks'], info['tries']) != (infos['bricks'][0], infos['tries'][0]):
+                return (steps,'%s: the bricks or tries differ' % where)
+            if not done and not numpy.array_equal(observation,observations[0]):
+                return (steps,'%s: the observations differ' % where)
+            steps = steps+1
+        observation = single.reset()
+    return (steps,None)
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Check that the environments match.')
+    parser.add_argument('--games',type=int,default=GAMES,help='games to play')
+    parser.add_argument('--seed',type=int,default=0)
+    parser.add_argument('--maxticks',type=int,default=MAXTICKS,
+                        help='most steps in a game')
+    options = parser.parse_args()
+
+    steps, failure = compare(options.games,options.seed,options.maxticks)
+    if failure is not None:
+        print(failure)
+    print('%d steps matched, %s' % (steps,'failed' if failure else 'ok'))
+    if failure is not None:
+        sys.exit(1)
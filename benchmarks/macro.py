@@ -0,0 +1,234 @@
+# macro.py
+"""Scenario benchmark: whole games through the Breakout state machine
+
+Each run plays complete seeded games with a scripted paddle, calling
+Breakout.update once per animation frame, exactly as GameApp does.  The games
+go through every state: the welcome screen, the countdown, play, a lost ball
+and the pause after it, the countdown again, and the game over screen, after
+which the next game starts.  Nothing is drawn; the app gets a stand-in for its
+GView that only holds the touch of the scripted player.
+
+The player presses to start each game and each new ball, and keeps the paddle
+under the ball until the ball has been in play for BALL_FRAMES frames.  Then
+it moves the paddle away and lets the ball fall, so every game ends after a
+bounded number of frames no matter how large the wall is.  The frame time is
+fixed at 1/60 of a second, and the random choices of the game are seeded, so
+every run of a wall size plays exactly the same frames.
+
+The wall size is read by constants.py from the command line, so each size is
+run in its own process.  For each size the benchmark reports the frames played
+per second, the median (p50) and 99th percentile (p99) time of one frame, the
+slowest frame, and the peak memory of the process.  Run it from the repository
+root:
+
+    python benchmarks/macro.py
+    python benchmarks/macro.py --sizes 10x10,100x100 --frames 5000
+    python benchmarks/macro.py --save base.json
+    python benchmarks/macro.py --compare base.json
+
+Walls of more than 48 columns do not fit in the window, so their bricks have
+no width and are never hit.  They still show how building and searching the
+wall scale."""
+import os
+import sys
+import json
+import random
+import resource
+import subprocess
+import timeit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0,os.path.join(HERE,'..','breakout'))
+sys.path.insert(0,HERE)
+os.environ.setdefault('GAME2D_HEADLESS','1')
+
+import runner
+
+#: the default wall sizes, as (columns, rows)
+SIZES = [(10,10),(50,50),(100,100),(200,200),(500,500)]
+#: the default number of frames played for each wall size
+FRAMES = 20000
+#: the default number of runs of each wall size
+REPEAT = 3
+#: the number of frames the player keeps each ball in play before dropping it
+BALL_FRAMES = 1200
+#: the time of one animation frame
+FRAME_TIME = 1.0/60
+
+
+class BenchView(object):
+    """An instance stands in for the GView of a Breakout app.
+
+    It only has the touch of the scripted player; nothing can be drawn in it.
+
+    INSTANCE ATTRIBUTES:
+        touch [GPoint, or None if the player is not pressing]: the current touch
+    """
+
+    def __init__(self):
+        """Creates a view with no touch"""
+        self.touch = None
+
+
+class ScriptedPlayer(object):
+    """An instance picks the touch for each frame of a Breakout app.
+
+    INSTANCE ATTRIBUTES:
+        _app   [Breakout]: the app being played
+        _frames [int >= 0]: the number of frames the current ball has been in play
+    """
+
+    def __init__(self, app):
+        """Creates a player for app
+
+        Precondition: app is a Breakout whose init has been called"""
+        self._app = app
+        self._frames = 0
+
+    def touch(self):
+        """Returns: the touch for the next frame of the app
+
+        On the screens that wait for a click, the player lets go if it was
+        pressing and presses otherwise, so each such screen lasts two frames.
+        During the countdowns and play it holds the paddle and moves it."""
+        from constants import (STATE_COUNTDOWN, STATE_PAUSED_COUNTDOWN, STATE_ACTIVE,
+                               PADDLE_WIDTH, PADDLE_OFFSET, BALL_DIAMETER, GAME_WIDTH)
+        from game2d import GPoint
+        app = self._app
+        state = app.get_state()
+        last = app.view.touch
+        if state not in (STATE_COUNTDOWN, STATE_PAUSED_COUNTDOWN, STATE_ACTIVE):
+            self._frames = 0
+            if last is None:
+                return GPoint(GAME_WIDTH/2.0,PADDLE_OFFSET)
+            return None
+
+        game = app.get_game()
+        paddle = game.get_paddlex()+PADDLE_WIDTH/2.0
+        if last is None:
+            return GPoint(paddle,PADDLE_OFFSET)
+        if state != STATE_ACTIVE:
+            return last
+        self._frames = self._frames+1
+        ball = game.get_ballx()+BALL_DIAMETER/2.0
+        if self._frames > BALL_FRAMES:
+            # Move to the far side of the ball, so it falls past the paddle
+            ball = 0.0 if ball > GAME_WIDTH/2.0 else float(GAME_WIDTH)
+        # Breakout keeps the offset of the first press, so move by the difference
+        return GPoint(last.x+ball-paddle,PADDLE_OFFSET)
+
+
+def play(frames, seed):
+    """Returns: (times, games) for frames frames of a new Breakout app
+
+    times is the list of the time of each call to update, and games is the
+    number of games started.
+
+    Precondition: frames is an int > 0; seed is an int"""
+    from constants import STATE_INACTIVE
+    from breakout import Breakout
+    random.seed(seed)
+    app = Breakout.offscreen(BenchView())
+    player = ScriptedPlayer(app)
+
+    clock = timeit.default_timer
+    times = []
+    games = 0
+    for frame in xrange(frames):
+        app.view.touch = player.touch()
+        if app.get_state() == STATE_INACTIVE and app.view.touch is not None:
+            games = games+1
+        start = clock()
+        app.update(FRAME_TIME)
+        times.append(clock()-start)
+    return (times, games)
+
+
+def measure(frames=FRAMES, repeat=REPEAT, seed=0):
+    """Returns: the statistics of repeat runs of frames frames, for the current wall
+
+    The keys are 'ops' (the most frames per second of a run), 'mean' and
+    'stdev' (of the rates of the runs), 'rsd' (stdev as a percent of mean),
+    'p50', 'p99' and 'max' (the times of one frame, in seconds, over all runs),
+    'games' (the number of games started in a run), 'number' (frames per run),
+    'repeat' (runs) and 'maxrss' (the peak memory of the process, in kilobytes).
+    The stats are in the form used by runner.py, so they can be saved and
+    compared the same way.
+
+    Precondition: frames is an int > 0; repeat is an int > 1; seed is an int"""
+    rates = []
+    times = []
+    for run in range(repeat):
+        runtimes, games = play(frames,seed)
+        rates.append(frames/max(sum(runtimes),1e-12))
+        times.extend(runtimes)
+    times.sort()
+    mean = sum(rates)/len(rates)
+    stdev = (sum((rate-mean)**2 for rate in rates)/(len(rates)-1))**0.5
+    return {'ops': max(rates), 'mean': mean, 'stdev': stdev, 'rsd': 100.0*stdev/mean,
+            'p50': times[len(times)//2], 'p99': times[min(len(times)-1,len(times)*99//100)],
+            'max': times[-1], 'games': games, 'number': frames, 'repeat': repeat,
+            'maxrss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+
+
+def measure_sizes(sizes, frames=FRAMES, repeat=REPEAT, seed=0):
+    """Returns: the statistics of each wall size, each run in a new process
+
+    Each result is named after the wall, as in 'Breakout [10x10]'.
+
+    Precondition: sizes is a list of (columns, rows) pairs of ints > 0;
+    frames is an int > 0; repeat is an int > 1; seed is an int"""
+    results = {}
+    for cols, rows in sizes:
+        env = dict(os.environ)
+        env['MACRO_OPTIONS'] = json.dumps([frames,repeat,seed])
+        out = subprocess.check_output([sys.executable,os.path.abspath(__file__),
+                                       str(cols),str(rows)],env=env)
+        results['Breakout [%dx%d]' % (cols,rows)] = json.loads(out.decode())
+    return results
+
+
+def report(results):
+    """Prints a table of the results, sorted by name
+
+    Precondition: results is a dictionary from names to the statistics of measure"""
+    print('%-22s %12s %7s %10s %10s %10s %7s %10s' %
+          ('scenario','frames/sec','rsd','p50 (ms)','p99 (ms)','max (ms)','games','peak (MB)'))
+    for name in sorted(results):
+        stats = results[name]
+        print('%-22s %12.1f %6.1f%% %10.3f %10.3f %10.1f %7d %10.1f' %
+              (name,stats['ops'],stats['rsd'],1000*stats['p50'],1000*stats['p99'],
+               1000*stats['max'],stats['games'],stats['maxrss']/1024.0))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 3 and sys.argv[1].isdigit() and sys.argv[2].isdigit():
+        # A wall size, already read by constants.py: measure one wall
+        frames, repeat, seed = json.loads(os.environ.get('MACRO_OPTIONS','[%d,%d,0]' %
+                                                         (FRAMES,REPEAT)))
+        sys.stdout.write(json.dumps(measure(frames,repeat,seed)))
+        sys.exit(0)
+
+    import argparse
+    parser = argparse.ArgumentParser(description='Play whole games of Breakout headless.')
+    parser.add_argument('--sizes',default=','.join('%dx%d' % size for size in SIZES),
+                        help='wall sizes as COLSxROWS, separated by commas')
+    parser.add_argument('--frames',type=int,default=FRAMES,help='frames in each run')
+    parser.add_argument('--repeat',type=int,default=REPEAT,help='runs of each wall size')
+    parser.add_argument('--seed',type=int,default=0)
+    parser.add_argument('--save',metavar='FILE',help='save the results as a baseline')
+    parser.add_argument('--compare',metavar='FILE',help='compare the results to a baseline')
+    parser.add_argument('--tolerance',type=float,default=runner.TOLERANCE,
+                        help='slowdown (a fraction) that counts as a regression')
+    options = parser.parse_args()
+
+    from micro import _parse_sizes
+    results = measure_sizes(_parse_sizes(options.sizes),options.frames,options.repeat,
+                            options.seed)
+    report(results)
+    if options.save:
+        runner.save_baseline(results,options.save)
+    if options.compare:
+        print('')
+        if runner.compare_baseline(results,options.compare,options.tolerance):
+            sys.exit(1)
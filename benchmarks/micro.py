@@ -0,0 +1,191 @@
+# micro.py
+"""Microbenchmarks for the game2d primitives and the Breakout hot paths
+
+The cases in CASES time single calls on game2d objects.  The cases in
+WALL_CASES depend on the size of the brick wall, so they are run once for
+each wall size, in a separate process started with the size on the command
+line (which is how constants.py picks the wall size).  Everything runs
+headless.  Run it from the repository root:
+
+    python benchmarks/micro.py
+    python benchmarks/micro.py --sizes 10x10,40x100 --save base.json
+    python benchmarks/micro.py --compare base.json
+    python benchmarks/micro.py --compare
+
+Each case is reported in operations per second, with the relative standard
+deviation of its runs (see runner.py).  With --compare, the command exits with
+status 1 if any case is slower than the baseline by more than the tolerance.
+Without a file name it compares against BASELINE, the baseline in this folder
+saved with the default options.  Rates depend on the machine, so save a new
+baseline before comparing on another one.
+
+To see what the optimized mode of game2d saves, save a baseline normally and
+compare a run with GAME2D_OPTIMIZED set against it.  That mode only skips the
+number checks in the x, y, width and height setters; the getters and contains
+run the same code in both modes.
+
+Walls of more than 48 columns do not fit in the window, so their bricks have
+no width.  They are still useful for measuring how the wall scales."""
+import os
+import sys
+import json
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0,os.path.join(HERE,'..','breakout'))
+sys.path.insert(0,HERE)
+os.environ.setdefault('GAME2D_HEADLESS','1')
+
+import runner
+
+#: the default wall sizes, as (columns, rows)
+SIZES = [(10,10),(20,40),(40,100)]
+#: the baseline used by --compare when it is given no file
+BASELINE = os.path.join(HERE,'baseline.json')
+
+#: the cases that do not depend on the wall, as (name, statement)
+CASES = [
+    ('GRectangle.contains',     'rect.contains(15.0,15.0)'),
+    ('GEllipse.contains',       'ball.contains(15.0,15.0)'),
+    ('GPolygon.contains',       'poly.contains(15.0,15.0)'),
+    ('GObject get x',           'rect.x'),
+    ('GObject get right',       'rect.right'),
+    ('GObject set x',           'rect.x = 10.0'),
+    ('GObject set width',       'rect.width = 20.0'),
+    ('GObject set center_x',    'rect.center_x = 10.0'),
+    ('GObject set fillcolor',   'rect.fillcolor = RED'),
+    ('GPoint +',                'p + q'),
+    ('GPoint -',                'p - q'),
+    ('GPoint *',                'p * 2.0'),
+    ('GPoint ==',               'p == q'),
+]
+
+#: the code that makes the objects used in CASES
+SETUP = '''from game2d import GRectangle, GEllipse, GPolygon, GPoint
+rect = GRectangle(x=0,y=0,width=30,height=30)
+ball = GEllipse(x=0,y=0,width=30,height=30)
+poly = GPolygon(points=[0,0,30,0,40,20,15,40,-10,20])
+p = GPoint(1.0,2.0)
+q = GPoint(3.0,4.0)
+RED = [1.0,0.0,0.0,1.0]'''
+
+#: the setup of a game whose ball moves sideways at the height given by %s.
+#: Any bricks in the way of the ball are taken out, so it never hits one.
+SIDEWAYS = '''from gameplay import Gameplay
+from models import BrickWall
+from constants import GAME_WIDTH, GAME_HEIGHT, BALL_DIAMETER, BRICK_Y_OFFSET
+game = Gameplay(0)
+state = list(game.getstate())
+bricks = BrickWall().getbricks()
+y = %s
+for slot in range(len(bricks)):
+    if bricks[slot].y < y+BALL_DIAMETER+1.0 and bricks[slot].top > y-1.0:
+        state[0][slot] = 0
+state[4:8] = [GAME_WIDTH/2.0,y,7.0,0.0]
+game.setstate(tuple(state))'''
+
+#: the cases that depend on the wall, as (name, statement, setup, number).  A
+#: number of None means the number of calls is calibrated.
+WALL_CASES = [
+    ('BrickWall.__init__', 'BrickWall()', 'from models import BrickWall', None),
+    # Each run removes every brick of a new wall once
+    ('BrickWall.removebrick', 'remove(next(bricks))',
+     '''from models import BrickWall
+wall = BrickWall()
+bricks = iter(wall.getbricks())
+remove = wall.removebrick''', 'bricks'),
+    # The ball goes back and forth between the sides and never hits anything,
+    # so these time the collision tests of a step without the game changing:
+    # above the wall, and in a lane cut through the wall under its top row
+    ('Gameplay.moveBall (sideways, open)', 'game.moveBall()',
+     SIDEWAYS % '(GAME_HEIGHT-BRICK_Y_OFFSET/2.0)-BALL_DIAMETER/2.0', None),
+    ('Gameplay.moveBall (sideways, in the wall)', 'game.moveBall()',
+     SIDEWAYS % 'max(brick.y for brick in bricks)-BALL_DIAMETER-1.0', None),
+    ('Gameplay.moveBall', '''game.moveBall()
+if game.get_lostlife():
+    game.resetball()
+    game.set_lostlife(False)''', 'from gameplay import Gameplay\ngame = Gameplay(0)', None),
+]
+
+
+def measure(repeat=runner.REPEAT):
+    """Returns: the results of every case in CASES
+
+    Precondition: repeat is an int > 1"""
+    results = {}
+    for name, stmt in CASES:
+        results[name] = runner.time_case(stmt,SETUP,repeat=repeat)
+    return results
+
+
+def measure_wall(repeat=runner.REPEAT):
+    """Returns: the results of every case in WALL_CASES for the current wall size
+
+    Precondition: repeat is an int > 1"""
+    from constants import BRICKS_IN_ROW, BRICK_ROWS
+    results = {}
+    for name, stmt, setup, number in WALL_CASES:
+        if number == 'bricks':
+            number = BRICKS_IN_ROW*BRICK_ROWS
+        results[name] = runner.time_case(stmt,setup,number=number,repeat=repeat)
+    return results
+
+
+def measure_sizes(sizes, repeat=runner.REPEAT):
+    """Returns: the results of WALL_CASES for each wall size, run in new processes
+
+    Each case is named after the wall, as in 'BrickWall.__init__ [10x10]'.
+
+    Precondition: sizes is a list of (columns, rows) pairs of ints > 0;
+    repeat is an int > 1"""
+    results = {}
+    for cols, rows in sizes:
+        env = dict(os.environ)
+        env['MICRO_REPEAT'] = str(repeat)
+        out = subprocess.check_output([sys.executable,os.path.abspath(__file__),
+                                       str(cols),str(rows)],env=env)
+        for name, stats in json.loads(out.decode()).items():
+            results['%s [%dx%d]' % (name,cols,rows)] = stats
+    return results
+
+
+def _parse_sizes(text):
+    """Returns: the list of (columns, rows) in text, such as '10x10,20x40'
+
+    Precondition: text is a string of sizes separated by commas"""
+    sizes = []
+    for size in text.split(','):
+        cols, rows = size.lower().split('x')
+        sizes.append((int(cols),int(rows)))
+    return sizes
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 3 and sys.argv[1].isdigit() and sys.argv[2].isdigit():
+        # A wall size, already read by constants.py: measure one wall
+        repeat = int(os.environ.get('MICRO_REPEAT',runner.REPEAT))
+        sys.stdout.write(json.dumps(measure_wall(repeat)))
+        sys.exit(0)
+
+    import argparse
+    parser = argparse.ArgumentParser(description='Run the microbenchmarks.')
+    parser.add_argument('--sizes',default=','.join('%dx%d' % size for size in SIZES),
+                        help='wall sizes as COLSxROWS, separated by commas')
+    parser.add_argument('--repeat',type=int,default=runner.REPEAT)
+    parser.add_argument('--save',metavar='FILE',help='save the results as a baseline')
+    parser.add_argument('--compare',metavar='FILE',nargs='?',const=BASELINE,
+                        help='compare the results to a baseline (default %s)' %
+                        os.path.relpath(BASELINE))
+    parser.add_argument('--tolerance',type=float,default=runner.TOLERANCE,
+                        help='slowdown (a fraction) that counts as a regression')
+    options = parser.parse_args()
+
+    results = measure(options.repeat)
+    results.update(measure_sizes(_parse_sizes(options.sizes),options.repeat))
+    runner.report(results)
+    if options.save:
+        runner.save_baseline(results,options.save)
+    if options.compare:
+        print('')
+        if runner.compare_baseline(results,options.compare,options.tolerance):
+            sys.exit(1)
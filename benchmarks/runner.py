@@ -0,0 +1,120 @@
+# runner.py
+"""Timing, statistics and baselines for the benchmarks
+
+A case is a statement timed with timeit, with the setup code it needs.
+time_case runs a case several times and returns its statistics: the best
+rate in operations per second, the mean and standard deviation of the rates,
+and the relative standard deviation (rsd), which tells how stable the
+measurement was.  A case with an rsd above UNSTABLE_RSD should be run again
+on a quieter machine before its numbers are trusted.
+
+Results are dictionaries from case names to statistics.  save_baseline writes
+them to a JSON file, and compare_baseline checks new results against such a
+file and reports the cases that got slower by more than a tolerance."""
+import json
+import math
+import platform
+import sys
+import timeit
+
+#: the shortest time (in seconds) of one timed run; shorter runs are repeated
+MIN_TIME = 0.1
+#: the default number of timed runs of each case
+REPEAT = 7
+#: the relative standard deviation (in percent) above which a case is unstable
+UNSTABLE_RSD = 5.0
+#: the default slowdown (as a fraction) that counts as a regression
+TOLERANCE = 0.10
+
+
+def calibrate(stmt, setup='pass', mintime=MIN_TIME):
+    """Returns: how many times stmt must run for one run to last mintime seconds
+
+    Precondition: stmt and setup are strings of Python code; mintime is a float > 0"""
+    timer = timeit.Timer(stmt,setup)
+    number = 1
+    while True:
+        if timer.timeit(number) >= mintime:
+            return number
+        number = number*2
+
+
+def time_case(stmt, setup='pass', number=None, repeat=REPEAT):
+    """Returns: the statistics of the rate of stmt as a dictionary
+
+    The keys are 'ops' (the best rate, in operations per second), 'mean' and
+    'stdev' (of the rates of the runs), 'rsd' (stdev as a percent of mean),
+    'number' (calls per run) and 'repeat' (runs).  The setup is run again
+    before every run.  If number is None, it is found with calibrate.
+
+    Precondition: stmt and setup are strings of Python code; number is an
+    int > 0 or None; repeat is an int > 1"""
+    if number is None:
+        number = calibrate(stmt,setup)
+    times = timeit.repeat(stmt,setup,repeat=repeat,number=number)
+    rates = [number/max(time,1e-12) for time in times]
+    mean = sum(rates)/len(rates)
+    stdev = math.sqrt(sum((rate-mean)**2 for rate in rates)/(len(rates)-1))
+    return {'ops': max(rates), 'mean': mean, 'stdev': stdev,
+            'rsd': 100.0*stdev/mean, 'number': number, 'repeat': repeat}
+
+
+def report(results):
+    """Prints a table of results, sorted by case name
+
+    Precondition: results is a dictionary from case names to statistics"""
+    print('%-44s %14s %8s' % ('case','ops/sec','rsd'))
+    for name in sorted(results):
+        stats = results[name]
+        note = '  unstable' if stats['rsd'] > UNSTABLE_RSD else ''
+        print('%-44s %14.1f %7.1f%%%s' % (name,stats['ops'],stats['rsd'],note))
+
+
+def save_baseline(results, filename):
+    """Writes results to a JSON baseline file, with the Python version and machine
+
+    Precondition: results is a dictionary from case names to statistics;
+    filename is a string"""
+    data = {'python': sys.version.split()[0], 'machine': platform.platform(),
+            'results': results}
+    with open(filename,'w') as f:
+        json.dump(data,f,indent=1,sort_keys=True)
+
+
+def compare_baseline(results, filename, tolerance=TOLERANCE):
+    """Prints how results compare to a baseline file, and returns the regressions
+
+    A case is a regression if its best rate is lower than the baseline by more
+    than tolerance (a fraction), and by more than twice the rsd of the noisier
+    of the two measurements.  A slowdown that is within the noise is marked as
+    noisy instead.  Cases that are only in one of the two are listed but never
+    count as regressions.
+
+    Returns the list of names of the cases that regressed.
+
+    Precondition: results is a dictionary from case names to statistics;
+    filename names a file written by save_baseline; tolerance is a float >= 0"""
+    with open(filename) as f:
+        baseline = json.load(f)['results']
+
+    regressions = []
+    print('%-44s %14s %14s %8s' % ('case','baseline','now','change'))
+    for name in sorted(set(results) | set(baseline)):
+        if name not in baseline:
+            print('%-44s %14s %14.1f %8s' % (name,'-',results[name]['ops'],'new'))
+            continue
+        if name not in results:
+            print('%-44s %14.1f %14s %8s' % (name,baseline[name]['ops'],'-','gone'))
+            continue
+        old = baseline[name]['ops']
+        new = results[name]['ops']
+        change = (new-old)/old
+        noise = 2*max(results[name]['rsd'],baseline[name]['rsd'])/100.0
+        note = ''
+        if change < -tolerance and change < -noise:
+            note = '  SLOWER'
+            regressions.append(name)
+        elif change < -tolerance:
+            note = '  noisy'
+        print('%-44s %14.1f %14.1f %+7.1f%%%s' % (name,old,new,100*change,note))
+    return regressions
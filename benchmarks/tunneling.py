@@ -0,0 +1,245 @@
+# tunneling.py
+"""Regression check for the swept collisions of Gameplay
+
+A ball that moves further in one step than the height of a brick (or of the
+paddle) can jump over it if only the end of each step is tested.  Gameplay
+sweeps the ball along its path to stop that.  This script checks that it does.
+
+It first runs two fixed cases: a fast ball rising straight at the bottom row of
+the wall, and a fast ball falling straight at the paddle.  Each step is long
+enough to carry the ball from one side of the brick or paddle to the other, so
+both fail if the ball is not swept.  Then it plays seeded games with random ball
+speeds of up to SPEED pixels per step and a paddle that follows the ball.  After
+every step it checks that the ball is inside the window (except below it) and
+does not overlap a brick.  After a step with no bounce, when the ball moved in a
+straight line, it also checks that the path did not cross a brick, or the paddle
+while falling.  Run it from the repository root:
+
+    python benchmarks/tunneling.py
+    python benchmarks/tunneling.py --games 200 --speed 60
+    python benchmarks/tunneling.py --jump
+
+With --jump the checks are run against games made with continuous=False, which
+use the corner test (Gameplay._jumpBall) and should fail them; this shows that
+the check can find tunneling.  The command
+exits with status 1 if any check fails, and also reports the steps checked per
+second."""
+import os
+import sys
+import random
+import timeit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0,os.path.join(HERE,'..','breakout'))
+os.environ.setdefault('GAME2D_HEADLESS','1')
+
+#: the default number of games played
+GAMES = 60
+#: the default number of steps in each game
+STEPS = 2000
+#: the default fastest speed of the ball, in pixels per step along each axis
+SPEED = 40.0
+#: how far two boxes may overlap before it counts (rounding in the sweep)
+EPSILON = 1e-6
+
+
+def overlaps(ball, box):
+    """Returns: True if the ball box overlaps box by more than EPSILON
+
+    Precondition: ball and box are (x, y, width, height) tuples of floats"""
+    return (ball[0]+EPSILON < box[0]+box[2] and box[0]+EPSILON < ball[0]+ball[2] and
+            ball[1]+EPSILON < box[1]+box[3] and box[1]+EPSILON < ball[1]+ball[3])
+
+
+def crosses(x, y, dx, dy, size, box):
+    """Returns: True if a square of side size moving by (dx,dy) from (x,y) overlaps box
+
+    The square must not overlap box where it starts.  This is the slab test of
+    the path of the corner (x,y) against box grown by size to the left and
+    below.
+
+    Precondition: x, y, dx, dy and size are floats; box is an (x, y, width,
+    height) tuple of floats"""
+    enter = 0.0
+    leave = 1.0
+    for start, move, low, high in ((x,dx,box[0]-size,box[0]+box[2]),
+                                   (y,dy,box[1]-size,box[1]+box[3])):
+        low = low+EPSILON
+        high = high-EPSILON
+        if move == 0:
+            if start <= low or start >= high:
+                return False
+            continue
+        near = (low-start)/move
+        far = (high-start)/move
+        enter = max(enter,min(near,far))
+        leave = min(leave,max(near,far))
+    return enter < leave
+
+
+class Checker(object):
+    """An instance checks the steps of games against the rules of the sweep
+
+    INSTANCE ATTRIBUTES:
+        _bricks [list of (x, y, width, height)]: the box of each slot of the wall
+        _failures [list of str]: a description of each failed check
+        _steps [int >= 0]: the number of steps checked
+    """
+
+    def __init__(self):
+        """Creates a checker with no failures, for a wall of the current size"""
+        from models import BrickWall
+        self._bricks = [(brick.x,brick.y,brick.width,brick.height)
+                        for brick in BrickWall().getbricks()]
+        self._failures = []
+        self._steps = 0
+
+    def getbricks(self):
+        """Returns the list of the boxes of the slots of the wall, in row-major order"""
+        return self._bricks
+
+    def getfailures(self):
+        """Returns the list of descriptions of the failed checks"""
+        return self._failures
+
+    def getsteps(self):
+        """Returns the number of steps checked"""
+        return self._steps
+
+    def step(self, game, name):
+        """Moves the ball of game one step and checks the step
+
+        Precondition: game is a Gameplay; name is a string naming the game"""
+        from constants import GAME_WIDTH, GAME_HEIGHT, BALL_DIAMETER, PADDLE_OFFSET
+        from constants import PADDLE_WIDTH, PADDLE_HEIGHT
+        x, y = game.get_ballx(), game.get_bally()
+        vx, vy = game.get_ballvx(), game.get_ballvy()
+        before = game.get_brickmask()
+        paddle = (game.get_paddlex(),PADDLE_OFFSET,PADDLE_WIDTH,PADDLE_HEIGHT)
+        game.moveBall()
+        self._steps = self._steps+1
+
+        ball = (game.get_ballx(),game.get_bally(),BALL_DIAMETER,BALL_DIAMETER)
+        after = game.get_brickmask()
+        where = '%s, step %d from (%.2f,%.2f) by (%.2f,%.2f)' % (name,self._steps,x,y,vx,vy)
+        if ball[0] < -EPSILON or ball[0]+BALL_DIAMETER > GAME_WIDTH+EPSILON:
+            self._failures.append('%s: ended outside the window' % where)
+        if ball[1]+BALL_DIAMETER > GAME_HEIGHT+EPSILON:
+            self._failures.append('%s: ended above the window' % where)
+        for slot in xrange(len(after)):
+            if after[slot] and overlaps(ball,self._bricks[slot]):
+                self._failures.append('%s: ended inside brick %d' % (where,slot))
+
+        if game.get_contacts() != [] or (game.get_ballvx(), game.get_ballvy()) != (vx, vy):
+            return
+        # No bounce: the ball went in a straight line and must not have met anything
+        start = (x,y,BALL_DIAMETER,BALL_DIAMETER)
+        for slot in xrange(len(before)):
+            box = self._bricks[slot]
+            if before[slot] and not overlaps(start,box) and crosses(x,y,vx,vy,BALL_DIAMETER,box):
+                self._failures.append('%s: passed through brick %d' % (where,slot))
+        if vy < 0 and not overlaps(start,paddle) and crosses(x,y,vx,vy,BALL_DIAMETER,paddle):
+            self._failures.append('%s: passed through the paddle' % where)
+
+
+def aim(game, x, y, vx, vy, paddlex=None):
+    """Puts the ball of game at (x,y) with velocity (vx,vy), and the paddle at paddlex
+
+    If paddlex is None, the paddle stays where it is.
+
+    Precondition: game is a Gameplay; x, y, vx and vy are floats; paddlex is a
+    float or None"""
+    state = list(game.getstate())
+    state[4:8] = [x,y,vx,vy]
+    if paddlex is not None:
+        state[1] = paddlex
+    game.setstate(tuple(state))
+
+
+def check_fixed(checker, continuous=True):
+    """Runs the two fixed cases with checker, each starting one step from the target
+
+    The games are made with the collision mode continuous (see Gameplay.__init__).
+
+    Precondition: checker is a Checker; continuous is a boolean"""
+    from constants import BALL_DIAMETER, PADDLE_OFFSET, PADDLE_HEIGHT, PADDLE_WIDTH
+    from gameplay import Gameplay
+    # The first brick of the bottom row
+    x, y, width, height = min(checker.getbricks(),key=lambda box: (box[1],box[0]))
+    speed = height+BALL_DIAMETER+4.0
+    game = Gameplay(0,continuous)
+    aim(game,x+(width-BALL_DIAMETER)/2.0,y-BALL_DIAMETER-2.0,0.0,speed)
+    count = game.get_bricksleft()
+    checker.step(game,'rising at a brick')
+    if game.get_bricksleft() != count-1:
+        checker.getfailures().append('rising at a brick: the brick was not hit')
+
+    speed = PADDLE_HEIGHT+BALL_DIAMETER+4.0
+    game = Gameplay(0,continuous)
+    paddlex = 100.0
+    aim(game,paddlex+(PADDLE_WIDTH-BALL_DIAMETER)/2.0,PADDLE_OFFSET+PADDLE_HEIGHT+2.0,
+        0.0,-speed,paddlex)
+    checker.step(game,'falling at the paddle')
+    if game.get_ballvy() <= 0:
+        checker.getfailures().append('falling at the paddle: the ball did not bounce')
+
+
+def check_games(checker, games=GAMES, steps=STEPS, speed=SPEED, seed=0, continuous=True):
+    """Plays games seeded games of steps steps each with checker, at random speeds
+
+    Every new ball gets a random velocity of up to speed pixels per step along
+    each axis.  The paddle follows the ball.  The games are made with the
+    collision mode continuous (see Gameplay.__init__).
+
+    Precondition: checker is a Checker; games and steps are ints > 0; speed is
+    a float > 0; seed is an int; continuous is a boolean"""
+    from constants import PADDLE_WIDTH, PADDLE_OFFSET, BALL_DIAMETER
+    from game2d import GPoint
+    from gameplay import Gameplay
+    rand = random.Random(seed)
+    for number in xrange(games):
+        game = Gameplay(seed+number,continuous)
+        game.updatePaddle(GPoint(game.get_paddlex()+PADDLE_WIDTH/2.0,PADDLE_OFFSET))
+        serve = True
+        for step in xrange(steps):
+            if serve:
+                vy = rand.choice((-1,1))*rand.uniform(speed/4.0,speed)
+                aim(game,game.get_ballx(),game.get_bally(),rand.uniform(-speed,speed),vy)
+                serve = False
+            game.updatePaddle(GPoint(game.get_ballx()+BALL_DIAMETER/2.0,PADDLE_OFFSET))
+            checker.step(game,'game %d' % number)
+            if game.get_lostlife():
+                game.resetball()
+                game.set_lostlife(False)
+                serve = True
+            if game.wall_none():
+                break
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Check that fast balls do not tunnel.')
+    parser.add_argument('--games',type=int,default=GAMES,help='games to play')
+    parser.add_argument('--steps',type=int,default=STEPS,help='steps in each game')
+    parser.add_argument('--speed',type=float,default=SPEED,
+                        help='fastest speed of the ball, in pixels per step')
+    parser.add_argument('--seed',type=int,default=0)
+    parser.add_argument('--jump',action='store_true',
+                        help='check the corner test instead of the sweep')
+    options = parser.parse_args()
+
+    checker = Checker()
+    start = timeit.default_timer()
+    check_fixed(checker,not options.jump)
+    check_games(checker,options.games,options.steps,options.speed,options.seed,not options.jump)
+    elapsed = timeit.default_timer()-start
+
+    failures = checker.getfailures()
+    for failure in failures[:20]:
+        print(failure)
+    if len(failures) > 20:
+        print('... and %d more' % (len(failures)-20))
+    print('%d steps checked (%.0f steps/sec), %d failures' %
+          (checker.getsteps(),checker.getsteps()/elapsed,len(failures)))
+    if failures:
+        sys.exit(1)
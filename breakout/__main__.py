@@ -22,4 +22,4 @@ from breakout import *
 
 # Application code
 if __name__ == '__main__':
-    Breakout(width=GAME_WIDTH,height=GAME_HEIGHT).run()
+    Breakout(width=GAME_WIDTH,height=GAME_HEIGHT,retained=True).run()
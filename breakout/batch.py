@@ -0,0 +1,311 @@
+# batch.py
+"""Vectorized simulator for many games of Breakout at once
+
+This module keeps the state of N independent games in NumPy arrays and
+advances all of them together.  It does not create any GObjects, so it needs
+neither Kivy nor the headless mode of game2d.
+
+Each step follows exactly the rules of Gameplay.moveBall in a game made with
+continuous=False, the corner test of Gameplay._jumpBall: the ball moves by its
+velocity, the four corners of its bounding box are tested (paddle first, then
+bricks, one corner at a time), a brick or the top edge negates the vertical
+velocity, the paddle negates it when the ball is falling, and the left and
+right edges negate the horizontal velocity.  The swept collisions of the
+default Gameplay are not vectorized, so a fast ball can pass through a brick
+here that it would hit there.  To check a batch against single games, make
+them with Gameplay(seed,False) or Simulation(seed=seed,continuous=False).
+Between steps, games are handled like simulation.Simulation: a lost ball is
+served again right away while there are tries left, and a game is over when it
+has no tries or no bricks left.  Paddles are moved by the same touches as in
+Simulation.stepto, and each game serves its balls from its own random.Random,
+seeded like Gameplay.  So game i of BatchSimulation(size,seed) plays exactly
+like Simulation(seed=seed+i,continuous=False) given the same targets.
+
+The bricks are stored in the same row-major order as BrickWall, so the alive
+mask of game i lines up with the slots of a BrickWall."""
+import random
+import numpy
+from constants import *
+
+
+class BatchSimulation(object):
+    """An instance plays N games of Breakout in lock-step.
+
+    Paddles follow their targets the way Simulation.stepto moves them: the
+    first target after a release only presses the paddle at its center, and
+    later targets move the center there, clamped to the window.  Games that are
+    over stop changing.
+
+    INSTANCE ATTRIBUTES:
+        _size  [int > 0]: the number of games N
+        _ballx [float array of length N]: x coordinate of the left of each ball
+        _bally [float array of length N]: y coordinate of the bottom of each ball
+        _ballvx [float array of length N]: horizontal velocity of each ball
+        _ballvy [float array of length N]: vertical velocity of each ball
+        _paddlex [float array of length N]: x coordinate of the left of each paddle
+        _held  [bool array of length N]: True for the paddles that are pressed
+        _clickdist [float array of length N]: the distance from the left of each
+            paddle to where it was pressed (as in Gameplay)
+        _alive [bool array of shape (N, BRICK_ROWS*BRICKS_IN_ROW)]:
+            the live-brick mask of each game
+        _count [int array of length N]: the number of bricks left in each game
+        _tries [int array of length N]: the number of tries left in each game
+        _over  [bool array of length N]: True for the games that are finished
+        _won   [bool array of length N]: True for the games that emptied the wall
+        _hits  [int array of length N]: the bricks removed in the last step
+        _lost  [bool array of length N]: True for games that lost a ball in the
+            last step
+        _ticks [int >= 0]: the number of steps so far
+        _randoms [list of random.Random]: the source of the serve velocities of
+            each game, as the _random of its Gameplay
+        _nextseed [int]: the seed of the next game started by reset
+        _brickx [float array of length BRICKS_IN_ROW]: left edge of each column
+        _bricky [float array of length BRICK_ROWS]: bottom edge of each row
+    """
+
+    # GETTERS
+    def getsize(self):
+        """Returns the number of games N"""
+        return self._size
+
+    def getticks(self):
+        """Returns the number of steps so far"""
+        return self._ticks
+
+    def getballx(self):
+        """Returns the array of ball x coordinates (left edges)"""
+        return self._ballx
+
+    def getbally(self):
+        """Returns the array of ball y coordinates (bottom edges)"""
+        return self._bally
+
+    def getballvx(self):
+        """Returns the array of horizontal ball velocities"""
+        return self._ballvx
+
+    def getballvy(self):
+        """Returns the array of vertical ball velocities"""
+        return self._ballvy
+
+    def getpaddlex(self):
+        """Returns the array of paddle x coordinates (left edges)"""
+        return self._paddlex
+
+    def getalive(self):
+        """Returns the (N, bricks) array of live-brick masks"""
+        return self._alive
+
+    def getcount(self):
+        """Returns the array of the number of bricks left in each game"""
+        return self._count
+
+    def gettries(self):
+        """Returns the array of the number of tries left in each game"""
+        return self._tries
+
+    def gethits(self):
+        """Returns the array of the number of bricks removed in the last step"""
+        return self._hits
+
+    def getlost(self):
+        """Returns the array that is True for games that lost a ball last step"""
+        return self._lost
+
+    def getover(self):
+        """Returns the array that is True for the games that are finished"""
+        return self._over
+
+    def getwon(self):
+        """Returns the array that is True for the games that were won"""
+        return self._won
+
+    def getnextseed(self):
+        """Returns the seed of the next game started by reset"""
+        return self._nextseed
+
+    # INITIALIZER
+    def __init__(self, size, seed=None):
+        """Creates size new games, each with a full wall and a served ball
+
+        The games use the seeds seed, seed+1, ..., seed+size-1, and every game
+        started by reset takes the next seed after that.  If seed is None, the
+        first seed is picked at random, as in Gameplay.
+
+        Precondition: size is an int > 0.  seed is an int >= 0 or None."""
+        if seed is None:
+            seed = random.randrange(2**31)
+        self._size = size
+        self._randoms = [random.Random(seed+i) for i in xrange(size)]
+        self._nextseed = seed+size
+
+        self._brickx = (BRICK_SEP_H/2 +
+                        numpy.arange(BRICKS_IN_ROW)*(BRICK_WIDTH+BRICK_SEP_H)).astype(float)
+        self._bricky = (GAME_HEIGHT-BRICK_Y_OFFSET -
+                        numpy.arange(BRICK_ROWS)*(BRICK_HEIGHT+BRICK_SEP_V)).astype(float)
+
+        self._ballx  = numpy.zeros(size)
+        self._bally  = numpy.zeros(size)
+        self._ballvx = numpy.zeros(size)
+        self._ballvy = numpy.zeros(size)
+        self._paddlex = numpy.empty(size)
+        self._paddlex.fill(GAME_WIDTH/2 - PADDLE_WIDTH/2)
+        self._held = numpy.zeros(size,dtype=bool)
+        self._clickdist = numpy.zeros(size)
+        self._alive = numpy.ones((size,BRICK_ROWS*BRICKS_IN_ROW),dtype=bool)
+        self._count = numpy.empty(size,dtype=int)
+        self._count.fill(BRICK_ROWS*BRICKS_IN_ROW)
+        self._tries = numpy.empty(size,dtype=int)
+        self._tries.fill(2)
+        self._over = numpy.zeros(size,dtype=bool)
+        self._won  = numpy.zeros(size,dtype=bool)
+        self._hits = numpy.zeros(size,dtype=int)
+        self._lost = numpy.zeros(size,dtype=bool)
+        self._ticks = 0
+        self._serve(numpy.ones(size,dtype=bool))
+
+    # STEP
+    def step(self, targets=None):
+        """Advances every game that is not over by one animation frame.
+
+        targets gives the x coordinate the center of each paddle should move to.
+        A NaN entry (or targets None) lets go of that paddle, as a target of
+        None does in Simulation.stepto.
+
+        Precondition: targets is None or a float array of length N"""
+        play = ~self._over
+        if targets is None:
+            touch = numpy.zeros(self._size,dtype=bool)
+        else:
+            touch = play & ~numpy.isnan(targets)
+        # Same touches as Simulation._touchFor and Gameplay.updatePaddle
+        press = touch & ~self._held
+        drag = touch & self._held
+        self._clickdist = numpy.where(press,(self._paddlex+PADDLE_WIDTH/2.0)-self._paddlex,
+                                      self._clickdist)
+        if drag.any():
+            newx = numpy.clip(targets[drag]-self._clickdist[drag],0,GAME_WIDTH-PADDLE_WIDTH)
+            self._paddlex[drag] = newx
+        self._held = numpy.where(play,touch,self._held)
+
+        vx = self._ballvx
+        vy = self._ballvy
+        x = numpy.where(play,self._ballx+vx,self._ballx)
+        y = numpy.where(play,self._bally+vy,self._bally)
+        self._ballx = x
+        self._bally = y
+
+        paddle, slot = self._collide(x,y)
+        brick = play & (slot >= 0)
+        paddle = play & paddle
+        rising  = play & (vy > 0)
+        falling = play & (vy < 0)
+
+        # Same tests as Gameplay.moveBall
+        flipy = (rising & ((y+BALL_DIAMETER >= GAME_HEIGHT) | brick)) | (falling & (paddle | brick))
+        flipx = play & (((vx > 0) & (x+BALL_DIAMETER >= GAME_WIDTH)) | ((vx < 0) & (x <= 0)))
+        self._ballvy = numpy.where(flipy,-vy,vy)
+        self._ballvx = numpy.where(flipx,-vx,vx)
+
+        games = numpy.nonzero(brick)[0]
+        self._alive[games,slot[games]] = False
+        self._count = self._count - brick
+        self._hits = brick.astype(int)
+
+        # Same transitions as Simulation.step
+        self._lost = falling & (y <= 0)
+        retry = self._lost & (self._tries > 0)
+        self._tries = self._tries - retry
+        self._serve(retry)
+        self._over = self._over | (self._lost & ~retry)
+        cleared = play & ~self._lost & (self._count == 0)
+        self._won = self._won | cleared
+        self._over = self._over | cleared
+        self._ticks = self._ticks + 1
+
+    def reset(self, which):
+        """Starts new games in place of the games selected by which.
+
+        Each new game has a full wall, two tries, a centered paddle that is not
+        pressed, and the next seed, from which it serves a new ball.  Nothing
+        else changes, not even the number of steps.
+
+        Precondition: which is a bool array of length N"""
+        for game in numpy.nonzero(which)[0]:
+            self._randoms[game] = random.Random(self._nextseed)
+            self._nextseed = self._nextseed+1
+        self._alive[which] = True
+        self._count[which] = BRICK_ROWS*BRICKS_IN_ROW
+        self._tries[which] = 2
+        self._over[which] = False
+        self._won[which] = False
+        self._paddlex[which] = GAME_WIDTH/2 - PADDLE_WIDTH/2
+        self._held[which] = False
+        self._serve(which)
+
+    # HELPER METHODS
+    def _serve(self, which):
+        """Puts a new ball in the center of the games selected by which.
+
+        The velocity is drawn from the generator of each game exactly as in
+        Ball.__init__, so it is the ball that Gameplay would serve.  Serves are
+        rare, so they are not vectorized.
+
+        Precondition: which is a bool array of length N"""
+        for game in numpy.nonzero(which)[0]:
+            rng = self._randoms[game]
+            speed = rng.uniform(1.0,5.0)
+            self._ballvx[game] = speed*rng.choice([-1,1])
+        self._ballx[which] = GAME_WIDTH/2 - BALL_DIAMETER/2.0
+        self._bally[which] = GAME_HEIGHT/2 - BALL_DIAMETER/2.0
+        self._ballvy[which] = -5.0
+
+    def _collide(self, x, y):
+        """Returns: (paddle, slot) for balls whose bottom left corners are at x, y
+
+        paddle is a bool array that is True where the paddle is the object hit.
+        slot is an int array with the index of the brick hit, or -1.  As in
+        Gameplay._getCollidingObject, the corners are tested one at a time and
+        the first corner to touch something decides the object.
+
+        Precondition: x and y are float arrays of length N"""
+        games = numpy.arange(self._size)
+        paddle = numpy.zeros(self._size,dtype=bool)
+        slot = numpy.empty(self._size,dtype=int)
+        slot.fill(-1)
+        found = numpy.zeros(self._size,dtype=bool)
+        for dx, dy in ((0,0),(0,BALL_DIAMETER),(BALL_DIAMETER,0),(BALL_DIAMETER,BALL_DIAMETER)):
+            cx = x+dx
+            cy = y+dy
+            onpaddle = ((self._paddlex <= cx) & (cx <= self._paddlex+PADDLE_WIDTH) &
+                        (PADDLE_OFFSET <= cy) & (cy <= PADDLE_OFFSET+PADDLE_HEIGHT))
+            hit = self._brickAt(games,cx,cy)
+            paddle = paddle | (~found & onpaddle)
+            newbrick = ~found & ~onpaddle & (hit >= 0)
+            slot = numpy.where(newbrick,hit,slot)
+            found = found | onpaddle | newbrick
+        return paddle, slot
+
+    def _brickAt(self, games, x, y):
+        """Returns: the slot of the live brick containing each point, or -1
+
+        This is the vectorized form of BrickWall.getBrickAt.
+
+        Precondition: games is numpy.arange(N); x and y are float arrays of length N"""
+        colstep = BRICK_WIDTH+BRICK_SEP_H
+        rowstep = BRICK_HEIGHT+BRICK_SEP_V
+        if colstep <= 0:
+            missing = numpy.empty(self._size,dtype=int)
+            missing.fill(-1)
+            return missing
+        col = numpy.floor((x-BRICK_SEP_H/2)/float(colstep)).astype(int)
+        row = numpy.floor((self._bricky[0]+BRICK_HEIGHT-y)/float(rowstep)).astype(int)
+        inside = (col >= 0) & (col < BRICKS_IN_ROW) & (row >= 0) & (row < BRICK_ROWS)
+        col = numpy.clip(col,0,BRICKS_IN_ROW-1)
+        row = numpy.clip(row,0,BRICK_ROWS-1)
+        left = self._brickx[col]
+        bottom = self._bricky[row]
+        slot = row*BRICKS_IN_ROW+col
+        inside = (inside & (left <= x) & (x <= left+BRICK_WIDTH) &
+                  (bottom <= y) & (y <= bottom+BRICK_HEIGHT) & self._alive[games,slot])
+        return numpy.where(inside,slot,-1)
@@ -11,6 +11,7 @@ post a question on Piazza."""
 from constants import *
 from gameplay import *
 from game2d import *
+from replay import Recorder
 
 
 # PRIMARY RULE: Breakout can only access attributes in gameplay.py via getters/setters
@@ -64,8 +65,26 @@ class Breakout(GameApp):
     INSTANCE ATTRIBUTES
         _message [GLabel, or None if the game is being played]
             the welcome message, which is displayed before the game begins
-        _time [int >= 0] the time since _state changed to STATE_COUNTDOWN
+        _time [float >= 0] the seconds since _state changed to STATE_COUNTDOWN
         _success [Boolean] True if game is won, False is game is lost
+        _accumulator [float >= 0] the frame time not yet simulated by a
+            physics step in STATE_ACTIVE
+        _labels [GLabelCache, or None before the first call to init]
+            the messages shown so far, so that each one is only laid out and
+            rendered once.  It is kept when a new game starts.
+        _recorder [Recorder, or None if the game is not being recorded]
+            the recorder writing the current game to RECORD_FILE
+        _sounds [SoundEngine, or None before the first call to init or if
+            SOUND_EFFECTS is False]
+            the collision sounds, loaded once and shared by every game
+        _hud [GGlyphLabel, or None before the first call to init or if
+            SHOW_HUD is False]
+            the lives and bricks left, shown above the wall during a game.
+            Its text is set every frame, so it is a GGlyphLabel, which does
+            not render a new texture when the text changes.
+    
+    The attributes _labels, _recorder, _sounds and _hud start as None in the
+    class, as init runs again for each new game and must not replace them.
     
     ADDITIONAL INVARIANTS
         Attribute _message is None if _state is STATE_ACTIVE,
@@ -75,6 +94,34 @@ class Breakout(GameApp):
     """
     
     # DO NOT MAKE A NEW INITIALIZER!
+    _labels = None
+    _recorder = None
+    _sounds = None
+    _hud = None
+    
+    # GETTERS AND HOOKS FOR SCRIPTS
+    @classmethod
+    def offscreen(cls, view):
+        """Returns: a new Breakout, already initialized, that uses view instead of a window
+        
+        A GameApp cannot be made without a window, so this does not call its
+        initializer.  The app never runs; a script drives it by setting the
+        touch of view and calling update (and draw, if view can draw) once per
+        frame, as GameApp would.  This is meant for benchmarks and tests.
+        
+        Precondition: view has an attribute touch, a GPoint or None"""
+        app = cls.__new__(cls)
+        app._view = view
+        app.init()
+        return app
+    
+    def get_state(self):
+        """Returns the current state of the game (one of the STATE constants)"""
+        return self._state
+    
+    def get_game(self):
+        """Returns the Gameplay of the current game, or None if there is none"""
+        return self._game
     
     # GAMEAPP METHODS
     def init(self):
@@ -89,12 +136,21 @@ class Breakout(GameApp):
         and create a message (in attribute _message) saying that the user should 
         press to play a game."""
         
+        if self._labels is None:
+            self._labels = GLabelCache()
+        if self._sounds is None and SOUND_EFFECTS:
+            self._sounds = SoundEngine()
+        if self._hud is None and SHOW_HUD:
+            self._hud = GGlyphLabel(x=HUD_X,y=HUD_Y,font_size=HUD_FONT_SIZE,
+                                    linecolor=HUD_COLOR)
+        self.__stoprecording()
         self._last = None
         self._game = None          
         self._time = 0
         self._success = False
+        self._accumulator = 0.0
         self._state = STATE_INACTIVE
-        self._message = GLabel(
+        self._message = self._labels.get(
             x=GAME_WIDTH/2,
             y=GAME_HEIGHT/2,
             halign='center',
@@ -121,7 +177,9 @@ class Breakout(GameApp):
         (re)starts the game and switches to STATE_COUNTDOWN.
         
         STATE_PAUSED is similar to STATE_INACTIVE. However, instead of 
-        restarting the game, it simply switches to STATE_COUNTDOWN.
+        restarting the game, it serves a new ball (once, on the click) and
+        switches to STATE_PAUSED_COUNTDOWN, which counts down like
+        STATE_COUNTDOWN.
         
         In STATE_COUNTDOWN, the game counts down until the ball is served.
         The player is allowed to move the paddle, but there is no ball.
@@ -142,38 +200,44 @@ class Breakout(GameApp):
         You are allowed to add more states if you wish. Should you do so,
         you should describe them here.
         
-        Precondition: dt is the time since last update (a float).  This
-        parameter can be safely ignored. It is only relevant for debugging
-        if your game is running really slowly. If dt > 0.5, you have a 
-        framerate problem because you are trying to do something too complex."""
+        The countdown is timed in seconds, and the ball moves in fixed physics
+        steps of PHYSICS_STEP seconds.  Each frame runs as many steps as fit in
+        the time that has passed (at most MAX_SUBSTEPS), so the game runs at
+        the same speed when frames are late.
+        
+        Precondition: dt is the time since last update (a float). If dt > 0.5,
+        you have a framerate problem because you are trying to do something
+        too complex."""
         
         if (self._state == STATE_INACTIVE):
             if (self._last == None and self.view.touch != None):
                 self._last = self.view.touch
                 self._state = STATE_COUNTDOWN
                 self._game = Gameplay()
+                self._game.set_sounds(self._sounds)
+                if RECORD_FILE is not None:
+                    self._recorder = Recorder(RECORD_FILE,self._game)
             self._last = self.view.touch
         
         if self._state == STATE_COUNTDOWN:
             self._game.updatePaddle(self.view.touch)
-            self.__countdownhelper()
+            self.__countdownhelper(dt)
             
         if self._state == STATE_PAUSED:
             if (self._last == None and self.view.touch != None):
                 self._state = STATE_PAUSED_COUNTDOWN
                 self._game.set_tries(self._game.get_tries()-1)
+                self._game.resetball()
+                self._game.set_lostlife(False)
             self._last = self.view.touch
         
         if self._state == STATE_PAUSED_COUNTDOWN:
-            self._game.resetball()
             self._game.updatePaddle(self.view.touch)
-            self._game.set_lostlife(False)
-            self.__countdownhelper()
+            self.__countdownhelper(dt)
         
         if self._state == STATE_ACTIVE:
             self._game.updatePaddle(self.view.touch)
-            self._game.moveBall()
-            self.__active()
+            self.__physics(dt)
             
         if self._state == STATE_GAME_OVER:
             self.__gameover()
@@ -195,19 +259,23 @@ class Breakout(GameApp):
             self._message.draw(self.view)
         if (self._game != None):
             self._game.draw(self.view)
+            if self._hud is not None:
+                self.__drawhud()
     
     # HELPER METHODS FOR THE STATES GO HERE
-    def __countdownhelper(self):
+    def __countdownhelper(self, dt):
         """Displays the countdown messages before the game begins or when paused
         
         Changes the countdown message depending on the variable _time, which
-        is incremented +1 every time the funciton is called
-        After three seconds, _state is changed to active, _message is changed
-        to None, and the game begins
+        is the number of seconds spent counting down so far.
+        After 3*COUNTDOWN_STEP seconds, _state is changed to active, _message
+        is changed to None, and the game begins
+        
+        Precondition: dt is the time since last update (a float)
         """
         
-        if self._time < 60:
-            self._message = GLabel(
+        if self._time < COUNTDOWN_STEP:
+            self._message = self._labels.get(
                 x=GAME_WIDTH/2,
                 y=GAME_HEIGHT/2 - GAME_HEIGHT/5,
                 halign='center',
@@ -215,8 +283,8 @@ class Breakout(GameApp):
                 text='3',
                 font_name='Akashi.ttf',
                 font_size=60)
-        elif self._time < 120:
-            self._message = GLabel(
+        elif self._time < 2*COUNTDOWN_STEP:
+            self._message = self._labels.get(
                 x=GAME_WIDTH/2,
                 y=GAME_HEIGHT/2 - GAME_HEIGHT/5,
                 halign='center',
@@ -224,9 +292,8 @@ class Breakout(GameApp):
                 text='2',
                 font_name='Akashi.ttf',
                 font_size=60)
-            self._message.font_size = 60
-        elif self._time < 180:
-            self._message = GLabel(
+        elif self._time < 3*COUNTDOWN_STEP:
+            self._message = self._labels.get(
                 x=GAME_WIDTH/2,
                 y=GAME_HEIGHT/2 - GAME_HEIGHT/5,
                 halign='center',
@@ -234,10 +301,33 @@ class Breakout(GameApp):
                 text='1',
                 font_name='Akashi.ttf',
                 font_size=60)
-        elif self._time >= 180:
+        else:
             self._message = None
+            self._accumulator = 0.0
             self._state = STATE_ACTIVE   
-        self._time = self._time + 1
+        self._time = self._time + dt
+    
+    def __physics(self, dt):
+        """Runs the fixed physics steps for a frame in STATE_ACTIVE
+        
+        The frame time dt is added to _accumulator, and the ball is moved one
+        PHYSICS_STEP at a time while the accumulator holds a full step.  The
+        state is checked after every step, so no step runs after a ball is lost
+        or the game ends.  If more than MAX_SUBSTEPS steps are due, the extra
+        time is dropped so that a slow machine does not fall further behind.
+        
+        Precondition: dt is the time since last update (a float)
+        """
+        self._accumulator = self._accumulator + dt
+        steps = 0
+        while (self._state == STATE_ACTIVE and steps < MAX_SUBSTEPS and
+               self._accumulator >= PHYSICS_STEP):
+            self._game.moveBall(PHYSICS_STEP/BALL_TIME_UNIT)
+            self._accumulator = self._accumulator - PHYSICS_STEP
+            steps = steps + 1
+            self.__active()
+        if self._state != STATE_ACTIVE or self._accumulator >= PHYSICS_STEP:
+            self._accumulator = 0.0
     
     def __active(self):
         """Carries out changes in _state from STATE_ACTIVE
@@ -249,7 +339,7 @@ class Breakout(GameApp):
         """
         if (self._game.get_lostlife() and self._game.get_tries()>0):
             self._state = STATE_PAUSED
-            self._message = GLabel(
+            self._message = self._labels.get(
                 x=GAME_WIDTH/2,
                 y=GAME_HEIGHT/2,
                 halign='center',
@@ -259,13 +349,34 @@ class Breakout(GameApp):
                 font_size=40)
             self._time = 0
         if (self._game.get_lostlife() and self._game.get_tries()==0):
+            self.__stoprecording()
             self._game = None
             self._state = STATE_GAME_OVER
         elif self._game.wall_none():
+            self.__stoprecording()
             self._success = True
             self._game = None
             self._state = STATE_GAME_OVER
     
+    def __drawhud(self):
+        """Draws the lives and bricks left in the current game
+        
+        The lives count the ball in play, so they match the messages: a lost
+        ball is taken off as soon as it is lost.
+        
+        Precondition: _game and _hud are not None"""
+        lives = self._game.get_tries()
+        if not self._game.get_lostlife():
+            lives = lives+1
+        self._hud.text = 'Lives: %d   Bricks: %d' % (lives,self._game.get_bricksleft())
+        self._hud.draw(self.view)
+    
+    def __stoprecording(self):
+        """Closes the recording of the current game, if there is one"""
+        if self._recorder is not None:
+            self._recorder.close()
+        self._recorder = None
+    
     def __gameover(self):
         """Displays the game over screen and gives the option to play again
         
@@ -279,7 +390,7 @@ class Breakout(GameApp):
             msgtxt = 'You win!\nClick to start over'
         else:
             msgtxt = 'Game over!\nClick to start over'
-        self._message = GLabel(
+        self._message = self._labels.get(
                 x=GAME_WIDTH/2,
                 y=GAME_HEIGHT/2,
                 halign='center',
@@ -8,6 +8,7 @@ need to be used in the model, the view, and the controller. As these
 are spread across multiple modules, we separate the constants into
 their own module. This allows all modules to access them."""
 import colormodel
+import os
 import sys
 
 ### WINDOW CONSTANTS (all coordinates are in pixels) ###
@@ -97,4 +98,61 @@ BALL_COLOR = colormodel.BLACK
 #: state when we are counting down to the ball serve after pausing
 STATE_PAUSED_COUNTDOWN = 4
 #: state after the game is finished, but before the welcome screen is displayed
-STATE_GAME_OVER = 5
\ No newline at end of file
+STATE_GAME_OVER = 5
+#: contact on the top side of an object
+SIDE_TOP    = 0
+#: contact on the bottom side of an object
+SIDE_BOTTOM = 1
+#: contact on the left side of an object
+SIDE_LEFT   = 2
+#: contact on the right side of an object
+SIDE_RIGHT  = 3
+#: True to sweep the ball along its path each step instead of only testing the
+#: corners where it ends up (the sweep cannot skip through thin objects)
+CONTINUOUS_COLLISIONS = True
+#: the most contacts the sweep resolves in one step
+MAX_CONTACTS = 4
+
+### TIMING CONSTANTS (all times are in seconds) ###
+
+#: the time simulated by one physics step
+PHYSICS_STEP   = 1.0/60
+#: the most physics steps run in one animation frame; any extra time is dropped
+MAX_SUBSTEPS   = 5
+#: the time it takes the ball to move by its velocity once
+BALL_TIME_UNIT = 1.0/60
+#: the time each number of the countdown is shown
+COUNTDOWN_STEP = 1.0
+
+### RECORDING CONSTANTS ###
+
+#: the file each game is recorded to (see replay.py), or None to not record.
+#: Set it with the environment variable BREAKOUT_RECORD.  Each new game
+#: replaces the recording of the last one.
+RECORD_FILE = os.environ.get('BREAKOUT_RECORD')
+#: the number of ticks between the snapshots of the game in a recording
+SNAPSHOT_TICKS = 600
+
+### SOUND CONSTANTS ###
+
+#: True to play a sound for each collision of the ball
+SOUND_EFFECTS = True
+#: the sound of the ball hitting the paddle (a file in the Sounds folder)
+PADDLE_SOUND = 'bounce.wav'
+#: the sounds of the ball hitting a brick, used in turn
+BRICK_SOUNDS = ('plate1.wav','plate2.wav','saucer1.wav','saucer2.wav')
+#: the volume of the collision sounds, in range 0..1
+SOUND_VOLUME = 0.8
+
+### HUD CONSTANTS ###
+
+#: True to show the lives and bricks left in the corner while a game is played
+SHOW_HUD = True
+#: the font size of the HUD
+HUD_FONT_SIZE = 14
+#: the position of the bottom left corner of the HUD, in the space above the wall
+#: (the profiler overlay of game2d is in the bottom left corner of the window)
+HUD_X = 4
+HUD_Y = GAME_HEIGHT - BRICK_Y_OFFSET/2
+#: the color of the HUD text
+HUD_COLOR = colormodel.BLACK
@@ -0,0 +1,213 @@
+# env.py
+"""Reinforcement-learning environments for Breakout
+
+These classes follow the usual reset/step interface of learning libraries,
+without depending on any of them.  An agent picks one of three actions each
+step, and gets back an observation, a reward and whether the game is done.
+
+    observation  a float32 NumPy array: ball x, ball y, ball vx, ball vy,
+                 paddle x, then one entry per slot of the wall (1.0 for a
+                 brick, 0.0 for an empty slot), in the row-major order of
+                 BrickWall
+    reward       BRICK_REWARD for each brick removed, plus LOST_REWARD for
+                 each ball lost
+    done         True once the game is won or lost (or runs out of ticks)
+
+BreakoutEnv plays one game with simulation.Simulation, and VectorBreakoutEnv
+plays many games at once with batch.BatchSimulation, which is much faster.
+Both have the same dynamics: the corner test of Gameplay made with
+continuous=False (batch.py does not vectorize the sweep), the paddle moved by
+touches as in Simulation.stepto, and the balls served from a random.Random
+seeded with the seed of each game.  So BreakoutEnv(seed) and
+VectorBreakoutEnv(1,seed) return the same observations for the same actions,
+and benchmarks/envmatch.py checks that they do.  Neither one opens a window,
+so a training script can set GAME2D_HEADLESS before importing this module."""
+import numpy
+from constants import *
+from simulation import *
+from batch import BatchSimulation
+
+
+#: the action that leaves the paddle where it is
+ACTION_STAY  = 0
+#: the action that moves the paddle left
+ACTION_LEFT  = 1
+#: the action that moves the paddle right
+ACTION_RIGHT = 2
+#: the number of actions
+ACTION_COUNT = 3
+#: how far the paddle moves in one step of ACTION_LEFT or ACTION_RIGHT
+PADDLE_STEP  = 8.0
+#: the reward for each brick removed
+BRICK_REWARD = 1.0
+#: the reward for each ball lost
+LOST_REWARD  = -5.0
+#: the size of an observation
+OBSERVATION_SIZE = 5+BRICKS_IN_ROW*BRICK_ROWS
+
+# The paddle movement of each action
+_MOVES = numpy.array([0.0,-PADDLE_STEP,PADDLE_STEP])
+
+
+class BreakoutEnv(object):
+    """An instance is an environment with a single game.
+
+    The game runs in a Simulation with the corner test (continuous=False), so
+    it plays like VectorBreakoutEnv.  A lost ball is served again right away.
+    The paddle is held the whole time; the first step only presses it.
+
+    INSTANCE ATTRIBUTES:
+        _seed  [int >= 0 or None]: the seed of the next game (None for random)
+        _maxticks [int > 0]: the most steps in a game
+        _sim   [Simulation, or None before the first reset]: the game being played
+        _bricks [int >= 0]: the number of bricks left after the last step
+        _tries [int >= 0]: the number of tries left after the last step
+    """
+
+    # INITIALIZER
+    def __init__(self, seed=None, maxticks=100000):
+        """Creates an environment.  Call reset to start the first game.
+
+        If seed is not None, the games use the seeds seed, seed+1, and so on,
+        so a run of the environment can be repeated.
+
+        Precondition: seed is an int >= 0 or None; maxticks is an int > 0"""
+        self._seed = seed
+        self._maxticks = maxticks
+        self._sim = None
+        self._bricks = 0
+        self._tries = 0
+
+    # ENVIRONMENT METHODS
+    def reset(self):
+        """Starts a new game.
+
+        Returns the first observation."""
+        self._sim = Simulation(seed=self._seed,continuous=False)
+        if self._seed is not None:
+            self._seed = self._seed+1
+        game = self._sim.getgame()
+        self._bricks = game.get_bricksleft()
+        self._tries = game.get_tries()
+        return self._observe()
+
+    def step(self, action):
+        """Plays one animation frame with the given action.
+
+        Returns a tuple (observation, reward, done, info), where info is a
+        dictionary with the number of bricks and tries left.
+
+        Precondition: action is one of the ACTION constants, and the game is
+        not done (call reset after it is)."""
+        game = self._sim.getgame()
+        self._sim.stepto(game.get_paddlex()+PADDLE_WIDTH/2.0+_MOVES[action])
+
+        bricks = game.get_bricksleft()
+        tries = game.get_tries()
+        reward = BRICK_REWARD*(self._bricks-bricks)
+        if tries < self._tries or (self._sim.isover() and not self._sim.iswon()):
+            reward = reward+LOST_REWARD
+        self._bricks = bricks
+        self._tries = tries
+
+        done = self._sim.isover() or self._sim.getticks() >= self._maxticks
+        return (self._observe(), reward, done, {'bricks': bricks, 'tries': tries})
+
+    # HELPER METHODS
+    def _observe(self):
+        """Returns: the observation of the game as it is now"""
+        game = self._sim.getgame()
+        observation = numpy.empty(OBSERVATION_SIZE,dtype=numpy.float32)
+        observation[0] = game.get_ballx()
+        observation[1] = game.get_bally()
+        observation[2] = game.get_ballvx()
+        observation[3] = game.get_ballvy()
+        observation[4] = game.get_paddlex()
+        observation[5:] = numpy.frombuffer(game.get_brickmask(),dtype=numpy.uint8)
+        return observation
+
+
+class VectorBreakoutEnv(object):
+    """An instance is an environment with N games played in lock-step.
+
+    Every call works on all of the games at once: step takes an array of N
+    actions and returns an (N, OBSERVATION_SIZE) array of observations and
+    arrays of N rewards and done flags.  A game that is done is replaced by a
+    new game right away, so the observation returned for it is the first one
+    of the new game.
+
+    INSTANCE ATTRIBUTES:
+        _size  [int > 0]: the number of games N
+        _seed  [int >= 0 or None]: the seed of the first game of the next reset
+            (None for random)
+        _batch [BatchSimulation, or None before the first reset]: the games
+            being played
+        _ticks [int array of length N]: the number of steps in each current game
+        _maxticks [int > 0]: the most steps in a game
+    """
+
+    # GETTERS
+    def getsize(self):
+        """Returns the number of games N"""
+        return self._size
+
+    # INITIALIZER
+    def __init__(self, size, seed=None, maxticks=100000):
+        """Creates an environment with size games.  Call reset to start them.
+
+        If seed is not None, the first games use the seeds seed, seed+1, ...,
+        seed+size-1, and each later game takes the next seed (see
+        BatchSimulation), so a run of the environment can be repeated.
+
+        Precondition: size is an int > 0; seed is an int >= 0 or None (for a
+        random seed); maxticks is an int > 0"""
+        self._size = size
+        self._seed = seed
+        self._batch = None
+        self._ticks = numpy.zeros(size,dtype=int)
+        self._maxticks = maxticks
+
+    # ENVIRONMENT METHODS
+    def reset(self):
+        """Starts a new game in every slot.
+
+        Returns the (N, OBSERVATION_SIZE) array of first observations."""
+        if self._batch is not None:
+            self._seed = self._batch.getnextseed()
+        self._batch = BatchSimulation(self._size,self._seed)
+        self._ticks[:] = 0
+        return self._observe()
+
+    def step(self, actions):
+        """Plays one animation frame of every game with the given actions.
+
+        Returns a tuple (observations, rewards, dones, info), where info is a
+        dictionary with the arrays of the bricks and tries left in each game
+        before any game was replaced.
+
+        Precondition: actions is an int array of length N of ACTION constants,
+        and reset has been called"""
+        batch = self._batch
+        batch.step(batch.getpaddlex()+PADDLE_WIDTH/2.0+_MOVES[actions])
+        self._ticks = self._ticks+1
+
+        rewards = BRICK_REWARD*batch.gethits()+LOST_REWARD*batch.getlost()
+        dones = batch.getover() | (self._ticks >= self._maxticks)
+        info = {'bricks': batch.getcount().copy(), 'tries': batch.gettries().copy()}
+        if dones.any():
+            batch.reset(dones)
+            self._ticks[dones] = 0
+        return (self._observe(), rewards.astype(numpy.float32), dones, info)
+
+    # HELPER METHODS
+    def _observe(self):
+        """Returns: the (N, OBSERVATION_SIZE) array of observations as they are now"""
+        batch = self._batch
+        observations = numpy.empty((batch.getsize(),OBSERVATION_SIZE),dtype=numpy.float32)
+        observations[:,0] = batch.getballx()
+        observations[:,1] = batch.getbally()
+        observations[:,2] = batch.getballvx()
+        observations[:,3] = batch.getballvy()
+        observations[:,4] = batch.getpaddlex()
+        observations[:,5:] = batch.getalive()
+        return observations
@@ -8,47 +8,132 @@ to create your game. DO NOT MODIFY THE CODE IN THIS FILE.  See the
 online documentation in Assignment 6 for more guidance.  It includes
 information not displayed in this module."""
 
-# Basic Kivy Modules
-import kivy
-import kivy.app
-import kivy.uix.label
-
-# Lower-level kivy modules to support animation
-from kivy.config import *
-from kivy.clock import Clock
-from kivy.graphics import *
-from kivy.graphics.instructions import *
-from kivy.config import Config
-
-# Widgets necessary for some technical workarounds
-from kivy.uix.floatlayout import FloatLayout
-from kivy.uix.label import Label
-
 # Additional miscellaneous modules
 import os
 import os.path
-import numpy
+import copy
+import math
 import random
-import colormodel
-import pygame.mixer
 import sys
+import timeit
+
+# Set the environment variable GAME2D_IMPORT_REPORT to print to stderr how long
+# game2d took to import, and how long each subsystem took to load (see
+# get_load_times).  Subsystems that are loaded on first use are reported then.
+IMPORT_REPORT = bool(os.environ.get('GAME2D_IMPORT_REPORT'))
+
+# The time game2d started to import, and the load time of each subsystem
+_IMPORT_START = timeit.default_timer()
+_LOAD_TIMES = []
+
+def _loaded(name,start):
+    """Records that the subsystem name is loaded, having started at time start"""
+    seconds = timeit.default_timer()-start
+    _LOAD_TIMES.append((name,seconds))
+    if IMPORT_REPORT:
+        sys.stderr.write('game2d: loaded %-14s %8.1f ms\n' % (name,1000*seconds))
+
+_start = timeit.default_timer()
+import colormodel
+_loaded('colormodel',_start)
+
+# Set the environment variable GAME2D_HEADLESS to run without Kivy or pygame.
+# The geometry classes still work, but nothing can be drawn and no sound played.
+HEADLESS = bool(os.environ.get('GAME2D_HEADLESS'))
+
+# Set the environment variable GAME2D_OPTIMIZED (or run python -O) to skip the
+# number checks in the x, y, width and height setters.  Nothing else changes.
+OPTIMIZED = bool(os.environ.get('GAME2D_OPTIMIZED')) or not __debug__
+
+# Set the environment variable GAME2D_PROFILE to 1 (or true, yes, on) to time
+# every frame of a GameApp (see FrameProfiler).  If it is a file name instead,
+# the timings are also written to that file when the game closes.  Unset, empty,
+# 0, false, no and off all leave profiling off.
+def _parse_profile(value):
+    """Returns: the value of GAME2D_PROFILE as a bool, or as a file name
+    
+        :param value: the value of the environment variable
+        **Precondition**: a string, or None if it is not set"""
+    if value is None or value.strip().lower() in ('','0','false','no','off'):
+        return False
+    if value.strip().lower() in ('1','true','yes','on'):
+        return True
+    return value
+
+PROFILE = _parse_profile(os.environ.get('GAME2D_PROFILE'))
 
 # User-defined resources
 FONT_PATH  = str(os.path.join(os.path.dirname(__file__), 'Fonts'))
 SOUND_PATH = str(os.path.join(os.path.dirname(__file__), 'Sounds'))
 IMAGE_PATH = str(os.path.join(os.path.dirname(__file__), 'Images'))
 
-import kivy.resources
-kivy.resources.resource_add_path(FONT_PATH)
-kivy.resources.resource_add_path(SOUND_PATH)
-kivy.resources.resource_add_path(IMAGE_PATH)
-
-# Initialize the sound engine.
+# The settings of the sound engine, which is initialized by the first Sound
 FREQUENCY = 44100
 BITSIZE   = -16
 CHANNELS  = 2
 BUFFER    = 1024
-pygame.mixer.init(FREQUENCY,BITSIZE,CHANNELS,BUFFER)
+
+if not HEADLESS:
+    _start = timeit.default_timer()
+    # Basic Kivy Modules
+    import kivy
+    import kivy.app
+    
+    # Lower-level kivy modules to support animation
+    from kivy.config import *
+    from kivy.clock import Clock
+    from kivy.graphics import *
+    from kivy.graphics.instructions import *
+    from kivy.config import Config
+    
+    # Widgets necessary for some technical workarounds
+    from kivy.uix.floatlayout import FloatLayout
+    
+    # The Kivy Label loads the text renderer, so it is imported by _load_label
+    # when the first GLabel is made
+    Label = None
+    
+    _LayoutBase = FloatLayout
+    _AppBase = kivy.app.App
+    _loaded('kivy',_start)
+else:
+    class Color(object):
+        """Stand-in for the Kivy Color instruction when running headless.
+        
+        It only remembers the color, so that the `fillcolor` and `linecolor`
+        attributes of a `GObject` still work."""
+        
+        def __init__(self,r,g,b,a=1.0):
+            """**Constructor**: creates a new color (r,g,b,a)"""
+            self.rgba = [r,g,b,a]
+
+    class Label(object):
+        """Stand-in for the Kivy Label widget when running headless.
+
+        It only remembers the text properties, so that a `GLabel` can be made
+        and read.  Text is never laid out, so its texture has no size."""
+
+        def __init__(self,**keywords):
+            """**Constructor**: creates a new label with the given properties"""
+            self.text = keywords['text'] if 'text' in keywords else ''
+            self.font_size = keywords['font_size'] if 'font_size' in keywords else 15
+            self.font_name = keywords['font_name'] if 'font_name' in keywords else 'Roboto'
+            self.bold = keywords['bold'] if 'bold' in keywords else False
+            self.halign = keywords['halign'] if 'halign' in keywords else 'left'
+            self.valign = keywords['valign'] if 'valign' in keywords else 'bottom'
+            self.texture_size = (0,0)
+
+        def bind(self,**keywords):
+            """Does nothing, as the texture never changes"""
+            pass
+
+        def texture_update(self):
+            """Does nothing, as there is no texture to lay out"""
+            pass
+
+    # Nothing can be displayed, so the application classes have no Kivy base
+    _LayoutBase = object
+    _AppBase = object
 
 #### CONSTANTS ####
 
@@ -59,14 +144,143 @@ CACHE_SIZE   = 2
 CACHE_COLOR  = 3
 CACHE_SOURCE = 4
 
+# Changes to a GObject that have not been cached yet (bits of GObject._stale)
+STALE_POS    = 1
+STALE_SIZE   = 2
+STALE_COLOR  = 4
+STALE_SOURCE = 8
+STALE_ALL    = 16
+
+# The types that count as numbers
+_NUMBERS = (int, float)
+
 # LINE SIZE
 LINE_SIZE = 1
 
+# The most rectangles in one mesh of a GBatch (Kivy meshes index at most 65535 vertices)
+BATCH_SIZE = 16383
+
+# The number of sounds a SoundEngine can play at once
+SOUND_CHANNELS = 8
+
+# The file extensions of the sounds a SoundEngine loads
+SOUND_EXTENSIONS = ('.wav','.ogg')
+
+# The width and height of each texture of a TextureAtlas
+ATLAS_SIZE = 1024
+
+# The pixels left empty around each image in a TextureAtlas, so that
+# filtering never blends in a neighbor
+ATLAS_PADDING = 2
+
+# The file extensions of the images a TextureAtlas packs from the Images folder
+IMAGE_EXTENSIONS = ('.png','.jpg','.jpeg','.gif')
+
+# The GObjects with changes that have not been cached yet.  Objects are only
+# added while _SYNCING is True, which a running GameApp sets, as only it empties
+# the list.  Otherwise each object catches up when it is next drawn.
+_PENDING = []
+_SYNCING = False
+
+# The columns of a FrameProfiler: the time since the last frame, the time of
+# the whole frame, and the time of each phase
+PROFILE_DT        = 0
+PROFILE_FRAME     = 1
+PROFILE_REDRAW    = 2
+PROFILE_UPDATE    = 3
+PROFILE_SYNC      = 4
+PROFILE_DRAW      = 5
+PROFILE_COLLISION = 6
+PROFILE_LABEL     = 7
+PROFILE_OVERLAY   = 8
+PROFILE_COLUMNS   = ('dt','frame','redraw','update','sync','draw','collision','label',
+                     'overlay')
+
+# The number of frames a FrameProfiler keeps
+PROFILE_FRAMES = 3600
+
+# The number of frames between changes to the profiler overlay
+PROFILE_OVERLAY_FRAMES = 30
+
+# The FrameProfiler recording the current frame, or None
+_PROFILER = None
+
+# The TextureAtlas shared by every GImage, made by get_atlas when first needed
+_ATLAS = None
+
+# The GlyphAtlas shared by every GGlyphLabel, made by get_glyphs when first needed
+_GLYPHS = None
+
+# The subsystems loaded on first use: the numpy module, the initialized
+# pygame.mixer module, and whether the resource folders were given to Kivy
+_NUMPY = None
+_MIXER = None
+_RESOURCES = False
+
 #### HIDDEN HELPER FUNCTIONS ####
+def _load_numpy():
+    """Returns: the numpy module, importing it the first time it is needed"""
+    global _NUMPY
+    if _NUMPY is None:
+        start = timeit.default_timer()
+        import numpy
+        _NUMPY = numpy
+        _loaded('numpy',start)
+    return _NUMPY
+
+
+def _load_mixer():
+    """Returns: the pygame.mixer module, initializing the sound engine the first time"""
+    global _MIXER
+    if _MIXER is None:
+        start = timeit.default_timer()
+        import pygame.mixer
+        pygame.mixer.init(FREQUENCY,BITSIZE,CHANNELS,BUFFER)
+        _MIXER = pygame.mixer
+        _loaded('pygame.mixer',start)
+    return _MIXER
+
+
+def _load_label():
+    """Returns: the Label class of GLabel, importing the Kivy Label the first time"""
+    global Label
+    if Label is None:
+        _add_resources()
+        start = timeit.default_timer()
+        from kivy.uix.label import Label as KivyLabel
+        Label = KivyLabel
+        _loaded('kivy.uix.label',start)
+    return Label
+
+
+def _add_resources():
+    """Adds the Fonts, Sounds and Images folders to the Kivy resource paths, once.
+    
+    This must happen before Kivy looks up a font or an image."""
+    global _RESOURCES
+    if not _RESOURCES and not HEADLESS:
+        import kivy.resources
+        kivy.resources.resource_add_path(FONT_PATH)
+        kivy.resources.resource_add_path(SOUND_PATH)
+        kivy.resources.resource_add_path(IMAGE_PATH)
+        _RESOURCES = True
+
+
+def _sync_pending():
+    """Brings the cache of every changed GObject up to date.
+    
+    GameApp calls this once per frame, before drawing."""
+    for obj in _PENDING:
+        if obj._stale:
+            obj._sync()
+    del _PENDING[:]
+
+
 def  _same_side(p1, p2, a, b):
     """Return: True is p1, p2 are on the same side of segment ba.
     
     Precondition: p1, p2, a, b are all 2d tuples of int or float."""
+    numpy = _load_numpy()
     ba = numpy.append(numpy.subtract(b,a),[0])
     cp1 = numpy.cross(ba,numpy.subtract(p1,a))
     cp2 = numpy.cross(ba,numpy.subtract(p2,a))
@@ -137,13 +351,15 @@ def Sound(filename):
     some finicky initialization in order to work properly.  In order to hide that from
     you, we have given you this function to use instead.  Treat this function just
     like a constructor (except that the object type is pygame.mixer.Sound, not Sound).
+    The sound engine is started the first time this function is called.
     
         :param filename: string providing the name of a sound file
     
     See the online documentation for more information."""
+    assert not HEADLESS, 'sound is not available in headless mode'
     assert _is_sound_file(filename), `filename`+' is not a sound file'
     absname = filename if os.path.isabs(filename) else str(os.path.join(SOUND_PATH, filename))
-    return pygame.mixer.Sound(absname)
+    return _load_mixer().Sound(absname)
 
 
 class SoundLibrary(object):
@@ -166,8 +382,6 @@ class SoundLibrary(object):
     
     def __init__(self):
         """**Constructor**: Create a new, empty sound library."""
-        if not _INITIALIZED:
-            init()
         self._data = {}
     
     def __len__(self):
@@ -192,7 +406,7 @@ class SoundLibrary(object):
             **Precondition**:: filename is the name of a valid sound file.
         
         """
-        assert is_sound_file(filename), `filename`+' is not a sound file'
+        assert _is_sound_file(filename), `filename`+' is not a sound file'
         self._data[key] = Sound(filename)
     
     def __delitem__(self, key):
@@ -212,6 +426,155 @@ class SoundLibrary(object):
         return self._data.iterkeys()
 
 
+class SoundEngine(object):
+    """Instances play short sound effects through a fixed pool of channels.
+    
+    Every sound file in the Sounds folder is loaded and decoded once, when the
+    engine is made.  After that, `play` only hands a sound that is already in
+    memory to the mixer, which plays it in the background.  It never touches
+    a file and never waits, so it can be called from the physics step.
+    
+    The engine plays at most `channels` sounds at once.  If every channel is
+    busy, the sound that has been playing the longest is cut off to make
+    room for the new one (voice stealing), so a fast chain of collisions
+    never drops the latest sound.
+    
+    In headless mode there is no mixer, so the engine loads nothing and
+    `play` does nothing.
+    
+    Instance Attributes (Hidden):
+        _sounds: Dictionary mapping file names to Sound objects
+        _channels: List of the pygame Channel objects in the pool
+        _started: List of the number of the play on each channel, 0 if none
+        _plays: The number of calls to play that found their sound
+    """
+    
+    def __init__(self,channels=SOUND_CHANNELS):
+        """**Constructor**: creates an engine with every sound in the Sounds folder.
+        
+            :param channels: the number of sounds that can play at once
+            **Precondition**: an int > 0"""
+        assert type(channels) == int and channels > 0, `channels`+' is not a positive int'
+        self._sounds = {}
+        self._channels = []
+        self._started = [0]*channels
+        self._plays = 0
+        if HEADLESS:
+            return
+        
+        mixer = _load_mixer()
+        mixer.set_num_channels(channels)
+        self._channels = [mixer.Channel(number) for number in range(channels)]
+        for name in sorted(os.listdir(SOUND_PATH)):
+            if os.path.splitext(name)[1].lower() in SOUND_EXTENSIONS:
+                self._sounds[name] = Sound(name)
+    
+    def __len__(self):
+        """**Returns**: The number of sounds loaded in this engine."""
+        return len(self._sounds)
+    
+    def __contains__(self,name):
+        """**Returns**: True if the sound with the given file name is loaded.
+        
+            :param name: the file name of a sound, such as 'bounce.wav'
+            **Precondition**: a string"""
+        return name in self._sounds
+    
+    def play(self,name,volume=1.0):
+        """Starts playing the sound with the given file name, and returns at once.
+        
+        **Returns**: The number of the channel playing the sound, or None if
+        the sound is not loaded (as always in headless mode).
+        
+            :param name: the file name of a sound, such as 'bounce.wav'
+            **Precondition**: a string
+        
+            :param volume: the volume of the sound
+            **Precondition**: a number in 0..1"""
+        sound = self._sounds.get(name)
+        if sound is None:
+            return None
+        
+        # Use a free channel, or else steal the one that started the earliest
+        number = None
+        for channel in xrange(len(self._channels)):
+            if not self._channels[channel].get_busy():
+                number = channel
+                break
+        if number is None:
+            number = self._started.index(min(self._started))
+        
+        self._plays = self._plays+1
+        self._started[number] = self._plays
+        channel = self._channels[number]
+        channel.set_volume(volume)
+        channel.play(sound)
+        return number
+    
+    def stop(self):
+        """Stops every sound that is playing."""
+        for channel in self._channels:
+            channel.stop()
+
+
+def get_load_times():
+    """**Returns**: The list of (name, seconds) for each subsystem loaded so far.
+    
+    The names are 'colormodel', 'kivy' and 'game2d' (the whole import of this
+    module), and then 'numpy', 'kivy.uix.label' and 'pygame.mixer' when they
+    are first needed.  Set the environment variable GAME2D_IMPORT_REPORT to
+    print each one as it happens."""
+    return list(_LOAD_TIMES)
+
+
+def get_atlas():
+    """**Returns**: The `TextureAtlas` shared by every `GImage` in this process.
+    
+    The atlas is made the first time it is needed, which must be after the
+    game window is open.  The first image it is asked for makes it pack every
+    image in the Images folder."""
+    global _ATLAS
+    if _ATLAS is None:
+        _ATLAS = TextureAtlas()
+    return _ATLAS
+
+
+def get_glyphs():
+    """**Returns**: The `GlyphAtlas` shared by every `GGlyphLabel` in this process.
+    
+    The atlas is made the first time it is needed, which must be after the
+    game window is open."""
+    global _GLYPHS
+    if _GLYPHS is None:
+        _GLYPHS = GlyphAtlas()
+    return _GLYPHS
+
+
+def get_profiler():
+    """**Returns**: The `FrameProfiler` recording frames, or None if there is none.
+    
+    Code outside of game2d can time its own phases with this, as in
+    
+        profiler = get_profiler()
+        if not profiler is None:
+            profiler.begin(PROFILE_COLLISION)
+        ...
+        if not profiler is None:
+            profiler.end(PROFILE_COLLISION)"""
+    return _PROFILER
+
+
+def set_profiler(profiler):
+    """Sets the `FrameProfiler` recording frames.
+    
+    A `GameApp` that is profiled does this itself.
+    
+        :param profiler: the profiler to use
+        **Precondition**: a `FrameProfiler`, or None to stop profiling"""
+    global _PROFILER
+    _PROFILER = profiler
+
+
 #### GEOMETRY CLASSES ####
 
 class GPoint(object):
@@ -264,10 +627,11 @@ class GPoint(object):
         
         This method uses numpy to test whether the coordinates are 
         "close enough".  It does not require exact equality for floats.
+        NumPy is only imported the first time two points are compared.
         
             :param other: value to compare against
         """        
-        return (type(other) == GPoint and numpy.allclose(self.list(),other.list()))
+        return (type(other) == GPoint and _load_numpy().allclose(self.list(),other.list()))
     
     def __ne__(self, other):
         """**Returns**: True if self and other are not equivalent GPoint. 
@@ -331,7 +695,6 @@ class GPoint(object):
         result = copy.copy(self)
         result.x *= scalar
         result.y *= scalar
-        result.z *= scalar
         return result
     
     def __rmul__(self, scalar):
@@ -372,8 +735,8 @@ class GPoint(object):
             :param other: value to compare against
             **Precondition**: value is a Tuple3D object.
         """
-        return numpy.sqrt((self.x-other.x)*(self.x-other.x)+
-                          (self.y-other.y)*(self.y-other.y))
+        return math.sqrt((self.x-other.x)*(self.x-other.x)+
+                         (self.y-other.y)*(self.y-other.y))
 
 
 class GObject(object):
@@ -381,7 +744,20 @@ class GObject(object):
     
     You should never make a GObject directly.  Instead, you should use one 
     of the subclasses: GRectangle, GEllipse, GLine, GTriangle, GPolygon, GImage, 
-    and GLabel."""
+    and GLabel.
+    
+    The geometry of every object is stored in slots, which makes objects
+    smaller.  Subclasses that do not declare their own `__slots__` get an
+    ordinary instance dictionary as well.
+    
+    Once an object has been drawn, changing an attribute does not touch its
+    drawing instructions right away.  It only marks the object as stale.  In a
+    running `GameApp` all stale objects are brought up to date once per frame,
+    just before drawing, so moving an object several times in a frame costs a
+    single update.  Anywhere else, a stale object is brought up to date when it
+    is next drawn."""
+    
+    __slots__ = ('_x','_y','_width','_height','_fillcolor','_linecolor','_cache_on','_stale')
     
     # PROPERTIES 
     @property
@@ -393,10 +769,13 @@ class GObject(object):
     
     @x.setter
     def x(self,value):
-        assert type(value) in [int, float], `value`+' is not a number'
+        if not OPTIMIZED:
+            assert type(value) in _NUMBERS, `value`+' is not a number'
         self._x = float(value)
         if self._cache_on:
-            self._cache(CACHE_POS)
+            if not self._stale and _SYNCING:
+                _PENDING.append(self)
+            self._stale |= STALE_POS
     
     @property
     def y(self):
@@ -407,10 +786,13 @@ class GObject(object):
     
     @y.setter
     def y(self,value):
-        assert type(value) in [int, float], `value`+' is not a number'
-        self._y = float(value)  
+        if not OPTIMIZED:
+            assert type(value) in _NUMBERS, `value`+' is not a number'
+        self._y = float(value)
         if self._cache_on:
-            self._cache(CACHE_POS)
+            if not self._stale and _SYNCING:
+                _PENDING.append(self)
+            self._stale |= STALE_POS
     
     @property
     def width(self):
@@ -421,10 +803,13 @@ class GObject(object):
     
     @width.setter
     def width(self,value):
-        assert type(value) in [int, float], `value`+' is not a number'
+        if not OPTIMIZED:
+            assert type(value) in _NUMBERS, `value`+' is not a number'
         self._width = float(value)
         if self._cache_on:
-            self._cache(CACHE_SIZE)
+            if not self._stale and _SYNCING:
+                _PENDING.append(self)
+            self._stale |= STALE_SIZE
     
     @property
     def height(self):
@@ -435,10 +820,13 @@ class GObject(object):
     
     @height.setter
     def height(self,value):
-        assert type(value) in [int, float], `value`+' is not a number'
+        if not OPTIMIZED:
+            assert type(value) in _NUMBERS, `value`+' is not a number'
         self._height = float(value)
         if self._cache_on:
-            self._cache(CACHE_SIZE)
+            if not self._stale and _SYNCING:
+                _PENDING.append(self)
+            self._stale |= STALE_SIZE
     
     @property
     def center_x(self):
@@ -530,7 +918,7 @@ class GObject(object):
         
         self._fillcolor = Color(value[0],value[1],value[2],value[3])
         if self._cache_on:
-            self._cache(CACHE_COLOR)
+            self._mark(STALE_COLOR)
         
     @property
     def linecolor(self):
@@ -554,7 +942,7 @@ class GObject(object):
         
         self._linecolor = Color(value[0],value[1],value[2],value[3])
         if self._cache_on:
-            self._cache(CACHE_COLOR)
+            self._mark(STALE_COLOR)
     
     def __init__(self,**keywords):
         """**Constructor**: creates a new GObject to support drawing.
@@ -578,6 +966,7 @@ class GObject(object):
         # Set the properties.
         # Set cache check to correct value
         self._cache_on = False
+        self._stale = 0
         
         # Have to initialize size first
         self.width  = keywords['width']  if  'width' in keywords else 0.0
@@ -633,10 +1022,46 @@ class GObject(object):
             **Precondition**: an *instance of* `GView`
         
         Ideally view should be the one provided by `Game`."""
-        # No drawing, but turn on the cache
+        assert not HEADLESS, 'cannot draw in headless mode'
+        # Turn on the cache before handing the instructions to the view
         if not self._cache_on:
             self._cache()
             self._cache_on = True
+        elif self._stale:
+            self._sync()
+        view._drawObject(self,self._instructions())
+    
+    def _instructions(self):
+        """Returns: the tuple of Kivy instructions that draw this shape
+        
+        These are the instructions created by `_cache`, in drawing order.  This
+        method should be overridden for specific drawing instructions."""
+        return ()
+    
+    def _mark(self,change):
+        """Helper to record a change (one of the STALE constants) to cache later."""
+        if not self._stale and _SYNCING:
+            _PENDING.append(self)
+        self._stale |= change
+    
+    def _sync(self):
+        """Helper to bring the cache up to date with the changes in `_stale`.
+        
+        Each kind of change is cached once, no matter how many times it was
+        made.  Rebuilding everything covers all of the other changes."""
+        stale = self._stale
+        self._stale = 0
+        if stale & STALE_ALL:
+            self._cache(CACHE_ALL)
+            return
+        if stale & STALE_SIZE:
+            self._cache(CACHE_SIZE)
+        if stale & STALE_POS:
+            self._cache(CACHE_POS)
+        if stale & STALE_COLOR:
+            self._cache(CACHE_COLOR)
+        if stale & STALE_SOURCE:
+            self._cache(CACHE_SOURCE)
 
 
 class GLine(GObject):
@@ -758,6 +1183,7 @@ class GLine(GObject):
         Therefore `point` and `linecolor` are the two primary keywords
         used by this constructor."""
         self._cache_on = False
+        self._stale = 0
         self.points = keywords['points'] if 'points' in keywords else ()
         self.fillcolor = keywords['fillcolor'] if 'fillcolor' in keywords else (1,1,1,1)
         self.linecolor = keywords['linecolor'] if 'linecolor' in keywords else (0,0,0,1)
@@ -802,17 +1228,9 @@ class GLine(GObject):
         This method always returns `False` as a `GLine` has no interior."""
         return False
     
-    def draw(self,view):
-        """Draw this shape in the provide view.
-        
-            :param view: view to draw to
-            **Precondition**: an *instance of* `GView`
-        
-        Ideally view should be the one provided by `Game`."""
-        # Invoke the cache
-        GObject.draw(self,view)
-        view.draw(self._linecolor)
-        view.draw(self._lcache)
+    def _instructions(self):
+        """Returns: the tuple of Kivy instructions that draw this shape"""
+        return (self._linecolor,self._lcache)
 
 
 class GTriangle(GLine):
@@ -881,18 +1299,9 @@ class GTriangle(GLine):
         This method uses a standard test for triangle inclusion."""
         return _in_triangle((x,y),self._points)
     
-    def draw(self,view):
-        """Draw this shape in the provide view.
-        
-            :param view: view to draw to
-            **Precondition**: an *instance of* `GView`
-        
-        Ideally view should be the one provided by `Game`."""
-        GObject.draw(self,view)
-        view.draw(self._fillcolor)
-        view.draw(self._mcache)
-        view.draw(self._linecolor)
-        view.draw(self._lcache)
+    def _instructions(self):
+        """Returns: the tuple of Kivy instructions that draw this shape"""
+        return (self._fillcolor,self._mcache,self._linecolor,self._lcache)
 
 
 class GPolygon(GLine):
@@ -924,7 +1333,8 @@ class GPolygon(GLine):
         assert len(value) == 2, `value`+' does not have 2 elements'
         assert reduce(lambda x, y: x and y, map(_is_num,value)), `value`+' is not a list of numbers'
         self._centroid = tuple(value)
-        self._cache()
+        if self._cache_on:
+            self._mark(STALE_ALL)
         
     def __init__(self,**keywords):
         """**Constructor**: creates a new solid polyon
@@ -986,18 +1396,9 @@ class GPolygon(GLine):
         
         return found
     
-    def draw(self,view):
-        """Draw this shape in the provide view.
-        
-            :param view: view to draw to
-            **Precondition**: an *instance of* `GView`
-        
-        Ideally view should be the one provided by `Game`."""
-        GObject.draw(self,view)
-        view.draw(self._fillcolor)
-        view.draw(self._mcache)
-        view.draw(self._linecolor)
-        view.draw(self._lcache)
+    def _instructions(self):
+        """Returns: the tuple of Kivy instructions that draw this shape"""
+        return (self._fillcolor,self._mcache,self._linecolor,self._lcache)
 
 
 class GRectangle(GObject):
@@ -1011,6 +1412,7 @@ class GRectangle(GObject):
     `center_x`, `center_y`, `right`, and `top`, all inherited from `GObject`.  
     See that class for more information."""
     
+    __slots__ = ('_scache','_lcache')
     
     def __init__(self,**keywords):
         """**Constructor**: creates a new solid rectangle
@@ -1041,7 +1443,8 @@ class GRectangle(GObject):
         elif style == CACHE_SIZE:
             self._scache.size=(self.width, self.height)
             self._lcache.size=(self.width+2*LINE_SIZE, self.height+2*LINE_SIZE)
-        else:
+        elif style != CACHE_COLOR:
+            # The colors are separate instructions, so a color change needs no work
             self._scache = Rectangle(pos=(self.x, self.y), size=(self.width, self.height))
             self._lcache = Rectangle(pos=(self.x-LINE_SIZE,self.y-LINE_SIZE),size=(self.width+2*LINE_SIZE,self.height+2*LINE_SIZE))
     
@@ -1055,21 +1458,12 @@ class GRectangle(GObject):
             **Precondition**: an int or float
         
         This method uses a standard test for rectangle inclusion."""
-        return (self.left <= x and x <= self.right and self.bottom <= y and y <= self.top)
+        return (self._x <= x <= self._x+self._width and
+                self._y <= y <= self._y+self._height)
     
-    def draw(self,view):
-        """Draw this shape in the provide view.
-        
-            :param view: view to draw to
-            **Precondition**: an *instance of* `GView`
-        
-        Ideally view should be the one provided by `Game`."""
-        # Invoke the cache
-        GObject.draw(self,view)
-        view.draw(self._linecolor)
-        view.draw(self._lcache)
-        view.draw(self._fillcolor)
-        view.draw(self._scache)
+    def _instructions(self):
+        """Returns: the tuple of Kivy instructions that draw this shape"""
+        return (self._linecolor,self._lcache,self._fillcolor,self._scache)
 
 
 class GEllipse(GRectangle):
@@ -1084,6 +1478,8 @@ class GEllipse(GRectangle):
     `center_x`, `center_y`, `right`, and `top`, all inherited from `GObject`.  
     See that class for more information."""
     
+    __slots__ = ()
+    
     def __init__(self,**keywords):
         """**Constructor**: creates a new solid ellipse
         
@@ -1105,13 +1501,13 @@ class GEllipse(GRectangle):
         if self._scache is None:
             self._scache = Ellipse(pos=(self.x, self.y), size=(self.width, self.height))
             self._lcache = Ellipse(pos=(self.x-LINE_SIZE,self.y-LINE_SIZE),size=(self.width+2*LINE_SIZE,self.height+2*LINE_SIZE))
-        if style == CACHE_POS:
+        elif style == CACHE_POS:
             self._scache.pos=(self.x, self.y)
             self._lcache.pos=(self.x-LINE_SIZE, self.y-LINE_SIZE) 
         elif style == CACHE_SIZE:
             self._scache.size=(self.width, self.height)
             self._lcache.size=(self.width+2*LINE_SIZE, self.height+2*LINE_SIZE)
-        else:
+        elif style != CACHE_COLOR:
             self._scache = Ellipse(pos=(self.x, self.y), size=(self.width, self.height))
             self._lcache = Ellipse(pos=(self.x-LINE_SIZE,self.y-LINE_SIZE),size=(self.width+2*LINE_SIZE,self.height+2*LINE_SIZE))
     
@@ -1129,10 +1525,10 @@ class GEllipse(GRectangle):
         if not GRectangle.contains(self,x,y):
             return False
         
-        cx = self.center_x
-        cy = self.center_y
-        rx = self.width/2.0
-        ry = self.height/2.0
+        rx = self._width/2.0
+        ry = self._height/2.0
+        cx = self._x+rx
+        cy = self._y+ry
         
         dx = (x-cx)*(x-cx)/(rx*rx)
         dy = (y-cy)*(y-cy)/(ry*ry)
@@ -1140,6 +1536,175 @@ class GEllipse(GRectangle):
         return (dx+dy) <= 1.0
 
 
+class TextureAtlas(object):
+    """Instances pack images into a few large textures, shared by every `GImage`.
+    
+    Each image is loaded once, copied into a page (a texture of ATLAS_SIZE by
+    ATLAS_SIZE pixels), and handed out as a region of that page.  Objects
+    with the same source share one region, and objects with different
+    sources share one page, so drawing many images binds only a few
+    textures.  An image too large for a page keeps a texture of its own.
+    
+    Images are placed on shelves: rows as tall as the tallest image in them,
+    filled from left to right.  A new shelf starts above the last one, and a
+    new page starts when a page is full.  The first call to `get` packs
+    every image in the Images folder, tallest first, which fills the shelves
+    best.  Sources that are not in that folder are packed when first asked for.
+    
+    Textures that do not come from a file (such as the glyphs of a
+    `GlyphAtlas`) can be packed with `add`.  An atlas made with images=False
+    never packs the Images folder.
+    
+    This class uses Kivy, so it cannot be used in headless mode.
+    
+    Instance Attributes (Hidden):
+        _size: The width and height of each page
+        _pages: List of the page textures
+        _shelves: List for each page of its shelves, each a list [y, height, next x]
+        _tops: List for each page of the height taken by its shelves
+        _regions: Dictionary mapping sources to the textures to draw them with
+        _images: Whether the first call to get packs the Images folder
+        _folder: Whether the Images folder has been packed (or never will be)
+    """
+    
+    def __init__(self,size=ATLAS_SIZE,images=True):
+        """**Constructor**: creates a new, empty atlas.
+        
+            :param size: the width and height of each page
+            **Precondition**: an int > 0
+        
+            :param images: whether to pack the Images folder on the first `get`
+            **Precondition**: a bool"""
+        assert not HEADLESS, 'cannot make textures in headless mode'
+        assert type(size) == int and size > 0, `size`+' is not a positive int'
+        self._size = size
+        self._pages = []
+        self._shelves = []
+        self._tops = []
+        self._regions = {}
+        self._images = images
+        self._folder = not images
+    
+    def __len__(self):
+        """**Returns**: The number of images in this atlas."""
+        return len(self._regions)
+    
+    def __contains__(self,source):
+        """**Returns**: True if the image with the given source has been loaded.
+        
+            :param source: the file name of an image
+            **Precondition**: a string"""
+        return source in self._regions
+    
+    def getpages(self):
+        """**Returns**: The number of page textures in this atlas."""
+        return len(self._pages)
+    
+    def get(self,source):
+        """**Returns**: The texture (usually a region of a page) for the given image.
+        
+        The image is loaded and packed the first time it is asked for.
+        
+            :param source: the file name of an image
+            **Precondition**: a string naming a valid image file"""
+        if not self._folder:
+            self._folder = True
+            self.pack([name for name in sorted(os.listdir(IMAGE_PATH))
+                       if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS])
+        region = self._regions.get(source)
+        if region is None:
+            self.pack([source])
+            region = self._regions[source]
+        return region
+    
+    def pack(self,sources):
+        """Loads and packs the given images, tallest first.
+        
+        Images that are already in this atlas are skipped.
+        
+            :param sources: the file names of the images
+            **Precondition**: a list of strings naming valid image files"""
+        from kivy.core.image import Image as CoreImage
+        _add_resources()
+        textures = {}
+        for source in sources:
+            if not source in self._regions and not source in textures:
+                textures[source] = CoreImage(source,nocache=True).texture
+        for source, texture in sorted(textures.iteritems(),key=lambda item: -item[1].height):
+            self._regions[source] = self._place(texture)
+    
+    def clear(self):
+        """Removes every image and page from this atlas.
+        
+        A `GImage` that has been drawn keeps the texture it has."""
+        self._pages = []
+        self._shelves = []
+        self._tops = []
+        self._regions.clear()
+        self._folder = not self._images
+    
+    def add(self,key,texture):
+        """**Returns**: The region of a page that texture is copied to.
+        
+        The region is stored under key, and can then be found with `get`.  If
+        key is already in this atlas, its region is returned and texture is
+        ignored.
+        
+            :param key: the name of the texture
+            **Precondition**: a hashable value
+        
+            :param texture: the texture to copy
+            **Precondition**: a Kivy Texture"""
+        region = self._regions.get(key)
+        if region is None:
+            region = self._place(texture)
+            self._regions[key] = region
+        return region
+    
+    def _place(self,texture):
+        """Returns: the region of a page that texture is copied to
+        
+        If texture does not fit in a page, it is returned as is."""
+        width, height = texture.size
+        if width+ATLAS_PADDING > self._size or height+ATLAS_PADDING > self._size:
+            return texture
+        
+        spot = None
+        for page in xrange(len(self._pages)):
+            spot = self._find(page,width+ATLAS_PADDING,height+ATLAS_PADDING)
+            if not spot is None:
+                break
+        if spot is None:
+            from kivy.graphics.texture import Texture
+            self._pages.append(Texture.create(size=(self._size,self._size),colorfmt='rgba'))
+            self._shelves.append([])
+            self._tops.append(0)
+            page = len(self._pages)-1
+            spot = self._find(page,width+ATLAS_PADDING,height+ATLAS_PADDING)
+        
+        x, y = spot
+        self._pages[page].blit_buffer(texture.pixels,size=(width,height),pos=(x,y),
+                                      colorfmt='rgba',bufferfmt='ubyte')
+        return self._pages[page].get_region(x,y,width,height)
+    
+    def _find(self,page,width,height):
+        """Returns: the (x,y) of a free spot of the given size in a page, or None
+        
+        The spot is taken; a new shelf is started if no shelf has room."""
+        for shelf in self._shelves[page]:
+            if height <= shelf[1] and shelf[2]+width <= self._size:
+                x = shelf[2]
+                shelf[2] = x+width
+                return (x,shelf[0])
+        
+        y = self._tops[page]
+        if y+height > self._size or width > self._size:
+            return None
+        self._shelves[page].append([y,height,width])
+        self._tops[page] = y+height
+        return (0,y)
+
+
 class GImage(GRectangle):
     """Instance represents a rectangular image.
     
@@ -1157,6 +1722,9 @@ class GImage(GRectangle):
     If the image supports transparency, then this object can be used to
     represent irregular shapes.  However, the `contains` method still
     treats this shape as a rectangle.
+    
+    The image is drawn from the `TextureAtlas` shared by every `GImage` (see
+    `get_atlas`), so it is only loaded once, however many objects show it.
     """
     @property
     def source(self):
@@ -1169,7 +1737,8 @@ class GImage(GRectangle):
     def source(self,value):
         assert value is None or _is_image_file(value), `value`+' is not an image file'
         self._source = value
-        self._cache()
+        if self._cache_on:
+            self._mark(STALE_SOURCE)
         
     def __init__(self,**keywords):
         """**Constructor**: creates a new rectangle image
@@ -1198,27 +1767,29 @@ class GImage(GRectangle):
         """Helper method to cache data to speed drawing. This method should be  
         overridden for specific drawing instructions."""
         if self._scache is None:
-            self._scache = Rectangle(pos=(self.x, self.y), size=(self.width, self.height), source=self._source)        
+            self._scache = Rectangle(pos=(self.x, self.y), size=(self.width, self.height),
+                                     texture=self._texture())
         elif style == CACHE_POS:
             self._scache.pos=(self.x, self.y)
         elif style == CACHE_SIZE:
             self._scache.size=(self.width, self.height)
         elif style == CACHE_SOURCE:
-            self._scache.source = self._source
-        else:
-            self._scache = Rectangle(pos=(self.x, self.y), size=(self.width, self.height), source=self._source)        
+            self._scache.texture = self._texture()
+        elif style != CACHE_COLOR:
+            # Update the rectangle in place, so that the view can keep it
+            self._scache.pos=(self.x, self.y)
+            self._scache.size=(self.width, self.height)
+            self._scache.texture = self._texture()
     
-    def draw(self,view):
-        """Draw this shape in the provide view.
-        
-            :param view: view to draw to
-            **Precondition**: an *instance of* `GView`
-        
-        Ideally view should be the one provided by `Game`."""
-        # Invoke the cache
-        GObject.draw(self,view)
-        view.draw(self._fillcolor)
-        view.draw(self._scache)
+    def _texture(self):
+        """Returns: the texture of the source from the shared atlas, or None if no source"""
+        if self._source is None:
+            return None
+        return get_atlas().get(self._source)
+    
+    def _instructions(self):
+        """Returns: the tuple of Kivy instructions that draw this shape"""
+        return (self._fillcolor,self._scache)
 
 
 class GLabel(GRectangle):
@@ -1256,7 +1827,7 @@ class GLabel(GRectangle):
     def font_size(self,value):
         assert type(value) in (int,float), `value`+' is not a number'
         self._label.font_size = value
-        self._label.texture_update()
+        self._layout()
 
     @property
     def font_name(self):
@@ -1269,7 +1840,7 @@ class GLabel(GRectangle):
     def font_name(self,value):
         assert _is_font_file(value), `value`+' is not a font name'
         self._label.font_name = value
-        self._label.texture_update()
+        self._layout()
 
     @property
     def bold(self):
@@ -1287,7 +1858,7 @@ class GLabel(GRectangle):
     def bold(self,value):
         assert type(value) == bool, `value`+' is not a bool'
         self._label.bold = value
-        self._label.texture_update()
+        self._layout()
 
     @property
     def text(self):
@@ -1305,7 +1876,7 @@ class GLabel(GRectangle):
     def text(self,value):
         assert type(value) == str, `value`+' is not a string'
         self._label.text = value
-        self._label.texture_update()
+        self._layout()
 
     @property
     def halign(self):
@@ -1365,7 +1936,7 @@ class GLabel(GRectangle):
             keywords['fillcolor'] = [0.0,0.0,0.0,0.0]
         
         GRectangle.__init__(self,**keywords)
-        self._label = Label(**keywords)
+        self._label = _load_label()(**keywords)
         self._label.size_hint = (None,None)
         
         if 'halign' in keywords:
@@ -1386,6 +1957,15 @@ class GLabel(GRectangle):
         """Workaround to deal with parameter requirements for callbacks"""
         self._cache()
     
+    def _layout(self):
+        """Helper to lay out the text again after a change to it"""
+        if _PROFILER is None:
+            self._label.texture_update()
+            return
+        _PROFILER.begin(PROFILE_LABEL)
+        self._label.texture_update()
+        _PROFILER.end(PROFILE_LABEL)
+    
     def _cache(self,style=CACHE_ALL):
         """Helper method to cache data to speed drawing. This method should be  
         overridden for specific drawing instructions."""
@@ -1444,29 +2024,472 @@ class GLabel(GRectangle):
         
         self._scache = Rectangle(pos=(self.x, self.y), size=(self.width, self.height))
     
-    def draw(self,view):
-        """Draw this shape in the provide view.
+    def _instructions(self):
+        """Returns: the tuple of Kivy instructions that draw this shape"""
+        return (self._fillcolor,self._scache,self._label.canvas)
+
+
+class GLabelCache(object):
+    """Instances make `GLabel` objects and keep them to be used again.
+    
+    Making a `GLabel` lays out its text and renders a texture for it, which is
+    slow.  A message that is shown for many frames (such as a countdown) should
+    be made once and drawn many times.  The method `get` takes the same
+    keywords as the `GLabel` constructor.  It returns the label made earlier
+    with the same keywords, if any, and otherwise makes a new one.
+    
+    The labels returned are shared, so they should not be modified.
+    
+    Instance Attributes (Hidden):
+        _labels: Dictionary mapping keyword tuples to GLabel objects
+    """
+    
+    def __init__(self):
+        """**Constructor**: creates a new, empty label cache."""
+        self._labels = {}
+    
+    def __len__(self):
+        """**Returns**: The number of labels in this cache."""
+        return len(self._labels)
+    
+    def get(self,**keywords):
+        """**Returns**: The GLabel for the given keywords.
         
-            :param view: view to draw to
-            **Precondition**: an *instance of* `GView`
+            :param keywords: dictionary of keyword arguments 
+            **Precondition**: See the `GLabel` constructor."""
+        key = tuple(sorted((k, tuple(v) if type(v) == list else v)
+                           for (k, v) in keywords.iteritems()))
+        label = self._labels.get(key)
+        if label is None:
+            label = GLabel(**keywords)
+            self._labels[key] = label
+        return label
+    
+    def clear(self):
+        """Removes every label from this cache."""
+        self._labels.clear()
+
+
+class GlyphAtlas(object):
+    """Instances render each character of a font once, into a shared `TextureAtlas`.
+    
+    A font is a tuple (font_name, font_size, bold), where font_name is None
+    for the default Kivy font.  The first time a character is asked for in a
+    font, Kivy renders it on its own and the result is copied into the atlas.
+    After that, the character is only looked up, so text made of characters
+    seen before costs no rendering and no texture upload.
+    
+    This class uses Kivy, so it cannot be used in headless mode.
+    
+    Instance Attributes (Hidden):
+        _atlas: The TextureAtlas holding the glyphs (it never packs the Images folder)
+        _glyphs: Dictionary mapping (font_name, font_size, bold, character) to regions
+        _heights: Dictionary mapping fonts to the height of their lines
+    """
+    
+    def __init__(self,size=ATLAS_SIZE):
+        """**Constructor**: creates a new, empty glyph atlas.
         
-        Ideally view should be the one provided by `Game`."""
-        # Invoke the cache
-        GObject.draw(self,view)
-        view.draw(self._fillcolor)
-        view.draw(self._scache)
-        view.draw(self._label.canvas)
+            :param size: the width and height of each page of the atlas
+            **Precondition**: an int > 0"""
+        self._atlas = TextureAtlas(size,images=False)
+        self._glyphs = {}
+        self._heights = {}
+    
+    def __len__(self):
+        """**Returns**: The number of glyphs rendered so far, over all fonts."""
+        return len(self._glyphs)
+    
+    def getpages(self):
+        """**Returns**: The number of page textures holding the glyphs."""
+        return self._atlas.getpages()
+    
+    def getglyph(self,font,char):
+        """**Returns**: The texture region of a character in the given font.
+        
+            :param font: the font, as (font_name, font_size, bold)
+            **Precondition**: a tuple of a font file name or None, a number and a bool
+        
+            :param char: the character
+            **Precondition**: a string of length 1"""
+        key = font+(char,)
+        region = self._glyphs.get(key)
+        if region is None:
+            texture = self._render(font,char)
+            region = self._atlas.add(key,texture)
+            self._glyphs[key] = region
+            if not font in self._heights:
+                self._heights[font] = texture.height
+        return region
+    
+    def getheight(self,font):
+        """**Returns**: The height of a line of text in the given font.
+        
+            :param font: the font, as (font_name, font_size, bold)
+            **Precondition**: a tuple of a font file name or None, a number and a bool"""
+        height = self._heights.get(font)
+        if height is None:
+            self.getglyph(font,' ')
+            height = self._heights[font]
+        return height
+    
+    def _render(self,font,char):
+        """Returns: a new texture of char rendered by Kivy in white"""
+        from kivy.core.text import Label as CoreLabel
+        _add_resources()
+        options = {'text': char, 'font_size': font[1], 'bold': font[2]}
+        if not font[0] is None:
+            options['font_name'] = font[0]
+        label = CoreLabel(**options)
+        label.refresh()
+        return label.texture
+
+
+class GGlyphLabel(GObject):
+    """Instances represent a text label drawn from a shared atlas of glyphs.
+    
+    This label is meant for text that changes often, such as a score, a
+    timer or a frame rate.  A `GLabel` has Kivy lay out and render its whole
+    text into a new texture whenever the text changes.  This label instead
+    draws each character as a quad cut from the `GlyphAtlas` (see
+    `get_glyphs`), so changing the text only rebuilds the list of quads.
+    A texture is uploaded only the first time a character is seen in a font.
+    
+    The price is that the text is set character by character: there is no
+    kerning, wrapping or markup.  The escape character '\\n' starts a new
+    line, and the attribute `halign` aligns the lines with each other.
+    
+    The bottom left corner of the text is at (`x`, `y`).  The `width` and
+    `height` of the label are set to fit the text whenever it is drawn, so
+    they are only meaningful after the first draw.  The background of the
+    label is `fillcolor` (transparent by default) and the text is
+    `linecolor`.
+    
+    Instance Attributes (Hidden):
+        _text: The text of the label
+        _font_name: The .ttf file of the font, or None for the default font
+        _font_size: The size of the font in points
+        _bold: Whether the default font is bold
+        _halign: The alignment of the lines
+        _backdrop: The Rectangle behind the text, or None before the first draw
+        _meshes: The tuple of Meshes of the glyph quads, one per atlas page
+        _pages: The list of the ids of the atlas pages of the meshes, in order
+    """
+    
+    @property
+    def text(self):
+        """Text for this label.
+        
+        **Invariant**: string"""
+        return self._text
+    
+    @text.setter
+    def text(self,value):
+        assert type(value) == str, `value`+' is not a string'
+        if value != self._text:
+            self._text = value
+            if self._cache_on:
+                self._mark(STALE_SOURCE)
+    
+    @property
+    def font_name(self):
+        """File name for the .ttf file to use as a font
+        
+        **Invariant**: string referring to a .ttf file in folder Fonts, or
+        None for the default Kivy font"""
+        return self._font_name
+    
+    @font_name.setter
+    def font_name(self,value):
+        assert value is None or _is_font_file(value), `value`+' is not a font name'
+        self._font_name = value
+        if self._cache_on:
+            self._mark(STALE_ALL)
+    
+    @property
+    def font_size(self):
+        """Size of the text font in points.
+        
+        **Invariant**: A positive number (int or float)"""
+        return self._font_size
+    
+    @font_size.setter
+    def font_size(self,value):
+        assert type(value) in (int,float) and value > 0, `value`+' is not a positive number'
+        self._font_size = value
+        if self._cache_on:
+            self._mark(STALE_ALL)
+    
+    @property
+    def bold(self):
+        """Boolean indicating whether or not the text should be bold.
+        
+        Only works on the default Kivy font, as in `GLabel`.
+        
+        **Invariant**: boolean"""
+        return self._bold
+    
+    @bold.setter
+    def bold(self,value):
+        assert type(value) == bool, `value`+' is not a bool'
+        self._bold = value
+        if self._cache_on:
+            self._mark(STALE_ALL)
+    
+    @property
+    def halign(self):
+        """Horizontal alignment of the lines of this label.
+        
+        **Invariant**: one of 'left', 'right', or 'center'"""
+        return self._halign
+    
+    @halign.setter
+    def halign(self,value):
+        assert value in ('left','right','center'), `value`+' is not a valid horizontal alignment'
+        self._halign = value
+        if self._cache_on:
+            self._mark(STALE_POS)
+    
+    def __init__(self,**keywords):
+        """**Constructor**: creates a new glyph label.
+        
+            :param keywords: dictionary of keyword arguments 
+            **Precondition**: See below.
+        
+        This class supports the same keywords as `GObject`, as well as
+        text, font_name, font_size, bold and halign.  For example
+        
+            GGlyphLabel(x=10,y=10,text='Score: 0',font_size=20)"""
+        if not 'fillcolor' in keywords:
+            keywords['fillcolor'] = [0.0,0.0,0.0,0.0]
+        GObject.__init__(self,**keywords)
+        self._text = ''
+        self._font_name = None
+        self._font_size = 15
+        self._bold = False
+        self._halign = 'left'
+        self._backdrop = None
+        self._meshes = ()
+        self._pages = []
+        for name in ('text','font_name','font_size','bold','halign'):
+            if name in keywords:
+                setattr(self,name,keywords[name])
+    
+    def _cache(self,style=CACHE_ALL):
+        """Helper method to cache data to speed drawing. This method should be  
+        overridden for specific drawing instructions."""
+        if style == CACHE_COLOR:
+            return
+        
+        font = (self._font_name,self._font_size,self._bold)
+        groups = self._layout(font)
+        if self._backdrop is None:
+            self._backdrop = Rectangle(pos=(self.x,self.y),size=(self.width,self.height))
+        else:
+            self._backdrop.pos = (self.x,self.y)
+            self._backdrop.size = (self.width,self.height)
+        
+        # Keep the meshes if the text still uses the same pages
+        pages = sorted(groups)
+        if pages == self._pages:
+            for mesh, page in zip(self._meshes,pages):
+                mesh.vertices = groups[page][1]
+                mesh.indices = groups[page][2]
+            return
+        self._pages = pages
+        self._meshes = tuple(Mesh(vertices=groups[page][1],indices=groups[page][2],
+                                  mode='triangles',texture=groups[page][0])
+                             for page in pages)
+    
+    def _layout(self,font):
+        """Returns: the glyph quads of the text, grouped by atlas page
+        
+        The result maps the id of each page to a list [region, vertices,
+        indices] for a mesh.  This also sets the width and height to fit the
+        text.
+        
+        Precondition: font is a tuple (font_name, font_size, bold)"""
+        glyphs = get_glyphs()
+        height = glyphs.getheight(font)
+        lines = []
+        width = 0
+        for line in self._text.split('\n'):
+            regions = [glyphs.getglyph(font,char) for char in line]
+            linewidth = sum(region.width for region in regions)
+            lines.append((regions,linewidth))
+            width = max(width,linewidth)
+        self._width = float(width)
+        self._height = float(height*len(lines))
+        
+        groups = {}
+        y = self._y+self._height
+        for regions, linewidth in lines:
+            y = y-height
+            x = self._x
+            if self._halign == 'center':
+                x = x+(width-linewidth)/2.0
+            elif self._halign == 'right':
+                x = x+width-linewidth
+            for region in regions:
+                group = groups.get(region.id)
+                if group is None:
+                    group = [region,[],[]]
+                    groups[region.id] = group
+                u0, v0, u1, v1, u2, v2, u3, v3 = region.tex_coords
+                right = x+region.width
+                top = y+region.height
+                base = len(group[1])/4
+                group[1].extend((x,y,u0,v0, right,y,u1,v1, right,top,u2,v2, x,top,u3,v3))
+                group[2].extend((base,base+1,base+2,base+2,base+3,base))
+                x = right
+        return groups
+    
+    def _instructions(self):
+        """Returns: the tuple of Kivy instructions that draw this shape"""
+        return (self._fillcolor,self._backdrop,self._linecolor)+self._meshes
+
+
+class GBatch(GObject):
+    """Instances draw many solid rectangles as a handful of Kivy meshes.
+    
+    Drawing a `GRectangle` takes four instructions, so drawing a few hundred of
+    them fills the canvas with instructions.  A batch instead puts all of its
+    rectangles of the same color into one `Mesh` (or a few, since a mesh can hold
+    at most BATCH_SIZE rectangles).  The number of instructions depends only on
+    the number of colors, not on the number of rectangles.
+    
+    Rectangles are added with `add`, which returns a handle, and can later be
+    hidden with `hide`.  Rectangles have no border; the attributes `fillcolor`
+    and `linecolor` are ignored, as are the position and size attributes.
+    
+    Hiding a rectangle changes only its own four vertices in the vertex list
+    of its mesh.  But a Kivy `Mesh` can only be given a whole new vertex list,
+    which it copies and uploads in full, so the mesh is updated once per frame
+    in which any of its rectangles were hidden.  That update costs time in
+    proportion to the size of the mesh (at most BATCH_SIZE rectangles), no
+    matter how many of its rectangles were hidden."""
+    
+    def __init__(self):
+        """**Constructor**: creates a new, empty batch"""
+        GObject.__init__(self)
+        # Each mesh is [color, vertices, indices, Mesh or None]
+        self._meshes = []
+        # Each handle is the pair (mesh number, rectangle number in that mesh)
+        self._handles = []
+        # The last mesh used for each color
+        self._open = {}
+        # The numbers of the meshes with hidden rectangles not yet sent to Kivy
+        self._dirty = set()
+        self._mcache = ()
+    
+    def add(self,x,y,width,height,color):
+        """Adds a solid rectangle to this batch and returns its handle.
+        
+        The handles are ints, counting up from 0 in the order rectangles are
+        added.
+        
+            :param x: the horizontal coordinate of the left side
+            **Precondition**: an int or float
+        
+            :param y: the vertical coordinate of the bottom
+            **Precondition**: an int or float
+        
+            :param width: the width of the rectangle
+            **Precondition**: an int or float
+        
+            :param height: the height of the rectangle
+            **Precondition**: an int or float
+        
+            :param color: the color of the rectangle
+            **Precondition**: a valid color (see `GObject.fillcolor`)"""
+        assert _is_num(x) and _is_num(y), `(x,y)`+' is not a pair of numbers'
+        assert _is_num(width) and _is_num(height), `(width,height)`+' is not a pair of numbers'
+        assert _is_color(color), `color`+' is not a valid color'
+        if type(color) in [colormodel.RGB, colormodel.HSV]:
+            color = color.glColor()
+        key = tuple(color)+(1.0,)*(4-len(color))
+        
+        mesh = self._open.get(key)
+        if mesh is None or len(self._meshes[mesh][2]) == 6*BATCH_SIZE:
+            mesh = len(self._meshes)
+            self._meshes.append([key,[],[],None])
+            self._open[key] = mesh
+        
+        entry = self._meshes[mesh]
+        quad = len(entry[2])/6
+        base = 4*quad
+        entry[1].extend(self._quad(x,y,width,height))
+        entry[2].extend((base,base+1,base+2,base+2,base+3,base))
+        self._handles.append((mesh,quad))
+        if self._cache_on:
+            self._cache(CACHE_ALL)
+        return len(self._handles)-1
+    
+    def hide(self,handle):
+        """Hides the rectangle with the given handle.
+        
+        The rectangle collapses to a point.  Only its own vertices change, in
+        place, but the whole mesh holding it is sent to Kivy again the next
+        time this batch is brought up to date (see the class docstring).
+        
+            :param handle: the handle returned by `add`
+            **Precondition**: an int"""
+        mesh, quad = self._handles[handle]
+        entry = self._meshes[mesh]
+        vertices = entry[1]
+        start = 16*quad
+        vertices[start+4:start+16] = [vertices[start],vertices[start+1],0,0]*3
+        if self._cache_on:
+            self._dirty.add(mesh)
+            self._mark(STALE_SOURCE)
+    
+    def _quad(self,x,y,width,height):
+        """Returns: the vertices (x,y,u,v) of the given rectangle, counterclockwise"""
+        return [x,y,0,0, x+width,y,0,0, x+width,y+height,0,0, x,y+height,0,0]
+    
+    def _cache(self,style=CACHE_ALL):
+        """Helper method to cache data to speed drawing. This method should be  
+        overridden for specific drawing instructions.
+        
+        CACHE_SOURCE only sends the vertices of the meshes with newly hidden
+        rectangles."""
+        if style == CACHE_SOURCE:
+            for mesh in self._dirty:
+                entry = self._meshes[mesh]
+                entry[3].vertices = entry[1]
+            self._dirty.clear()
+            return
+        
+        self._dirty.clear()
+        cache = []
+        for entry in self._meshes:
+            entry[3] = Mesh(vertices=entry[1],indices=entry[2],mode='triangles')
+            cache.append(Color(*entry[0]))
+            cache.append(entry[3])
+        self._mcache = tuple(cache)
+    
+    def _instructions(self):
+        """Returns: the tuple of Kivy instructions that draw this shape"""
+        return self._mcache
 
 
 #### APPLICATION CLASSES ####
 
-class GView(FloatLayout):
+class GView(_LayoutBase):
     """The view class for a `Game` application.
     
     You may need to access an instance of this class to draw `GObject` 
     instances.  However, you will never need to construct one.
     You should only use the one provided in the `view` attribute of
-    `Game`. See class `Game` for more information."""
+    `Game`. See class `Game` for more information.
+    
+    A view draws in one of two modes.  In immediate mode (the default) the
+    canvas is rebuilt from scratch every frame.  In retained mode each `GObject`
+    adds its instructions to the canvas the first time it is drawn, and they
+    stay there.  Changes to the position or size of an object update those
+    instructions in place.  The objects are kept in the order they were drawn
+    in the last frame, and an object that is not drawn in a frame is taken off
+    the canvas at the start of the next frame."""
     
     @property
     def touch(self):
@@ -1485,15 +2508,40 @@ class GView(FloatLayout):
         
         return GPoint(self._touch.x,self._touch.y)
     
-    def __init__(self):
-        """**Initializer**: creates a new GView"""
-        FloatLayout.__init__(self)
+    @property
+    def retained(self):
+        """Whether this view keeps the instructions of objects between frames.
+        
+        **Invariant**: Immutable bool."""
+        return self._retained
+    
+    def __init__(self,retained=False):
+        """**Initializer**: creates a new GView
+        
+            :param retained: whether to draw in retained mode
+            **Precondition**: a bool"""
+        _LayoutBase.__init__(self)
         self.bind(on_touch_down=self._capture_touch)
         self.bind(on_touch_move=self._capture_touch)
         self.bind(on_touch_up=self._release_touch)
+        self._touch = None
+        self._retained = retained
+        
+        # Retained objects, mapping id to [object, group, instructions, frame]
+        self._objects = {}
+        # The groups of the retained objects, in the order they are on the canvas
+        self._order = []
+        self._frameno = 0
+        self._drawn = 0
+        self._scene = InstructionGroup()
+        self._backcolor = Color(1,1,1)
+        self._background = Rectangle(pos=self.pos,size=self.size)
+        if retained:
+            self._scene.add(self._backcolor)
+            self._scene.add(self._background)
+        self.canvas.add(self._scene)
         self._frame = InstructionGroup()
         self.canvas.add(self._frame)
-        self._touch = None
     
     def _capture_touch(self,view,touch):
         """Helper method to respond (and grap) a mouse press"""
@@ -1512,17 +2560,281 @@ class GView(FloatLayout):
         """
         self._frame.add(cmd)
     
+    def _drawObject(self,obj,cmds):
+        """Helper to draw the instructions cmds belonging to the GObject obj.
+        
+        In immediate mode the instructions are added to this frame.  In retained
+        mode they are added to the canvas only if obj is new or has replaced
+        some of its instructions (e.g. after a change of color).  Otherwise the
+        instructions already on the canvas are left alone.
+        
+        Retained objects stay on the canvas in the order they are drawn in this
+        frame, so they overlap exactly as in immediate mode.  The first objects
+        on the canvas are the ones drawn so far this frame; an object drawn out
+        of its old place is moved to the end of those."""
+        if not self._retained:
+            for cmd in cmds:
+                self._frame.add(cmd)
+            return
+        
+        entry = self._objects.get(id(obj))
+        if entry is not None and entry[0] is not obj:
+            # A new object has the id of one that is gone
+            self._remove(entry[1])
+            entry[1].clear()
+            entry = None
+        new = entry is None
+        if new:
+            group = InstructionGroup()
+            for cmd in cmds:
+                group.add(cmd)
+            entry = [obj,group,cmds,self._frameno-1]
+            self._objects[id(obj)] = entry
+        elif cmds != entry[2]:
+            group = entry[1]
+            group.clear()
+            for cmd in cmds:
+                group.add(cmd)
+            entry[2] = cmds
+        
+        if entry[3] == self._frameno:
+            # Drawn twice this frame; it keeps the place of the first time
+            return
+        entry[3] = self._frameno
+        group = entry[1]
+        place = self._drawn
+        self._drawn += 1
+        if place < len(self._order) and self._order[place] is group:
+            return
+        if not new:
+            self._remove(group)
+        self._order.insert(place,group)
+        # The background color and rectangle come before the objects
+        self._scene.insert(place+2,group)
+    
+    def _remove(self,group):
+        """Helper to take the retained group off the canvas"""
+        self._order.remove(group)
+        self._scene.remove(group)
+    
     def _redraw(self):
         """Helper called to refresh the screen each animation frame"""
+        if self._retained:
+            self._sweep()
+            return
+        
         self.canvas.remove(self._frame)
         self._frame.clear()
         self._frame = InstructionGroup()
         self.canvas.add(self._frame)
         self._frame.add(Color(1,1,1))
         self._frame.add(Rectangle(pos=self.pos,size=self.size))
-
-
-class GameApp(kivy.app.App):
+    
+    def _sweep(self):
+        """Helper to start a new frame in retained mode.
+        
+        Removes the objects that were not drawn in the last frame from the
+        canvas.  These are the ones after the objects that were drawn, so if
+        every object was drawn, nothing needs to be checked."""
+        if self._drawn < len(self._objects):
+            for key in [key for key, entry in self._objects.iteritems()
+                        if entry[3] != self._frameno]:
+                group = self._objects[key][1]
+                self._scene.remove(group)
+                group.clear()
+                del self._objects[key]
+            del self._order[self._drawn:]
+        
+        if tuple(self._background.pos) != tuple(self.pos):
+            self._background.pos = self.pos
+        if tuple(self._background.size) != tuple(self.size):
+            self._background.size = self.size
+        self._frameno += 1
+        self._drawn = 0
+
+
+class FrameProfiler(object):
+    """Instances record how long each part of the frames of a game takes.
+    
+    A profiler keeps the timings of the last `PROFILE_FRAMES` frames in a ring
+    buffer, one row per frame, with a column for each of `PROFILE_COLUMNS`:
+    the time since the last frame, the time of the whole frame, and the time
+    of each phase.  `GameApp` times the phases redraw, update, sync (bringing
+    changed objects up to date), draw, and overlay (drawing the numbers of
+    this profiler), all of which are part of the frame.  The phases collision
+    and label are timed by the code that does them (see `get_profiler`), and
+    are also part of the phase they happen in.
+    
+    A profiler costs nothing unless it is in use.  Profile a game with the
+    keyword profile of `GameApp` or the environment variable GAME2D_PROFILE.
+    
+    Instance Attributes (Hidden):
+        _times: array of shape (capacity, len(PROFILE_COLUMNS)); the ring buffer
+        _count: the number of frames recorded so far
+        _row:   the row of the frame being recorded, or None between frames
+        _start: the time the frame being recorded started
+        _starts: the time each phase being timed started
+        _budget: the time one frame should take at most
+        _overlay: the `GGlyphLabel` showing the latest numbers, or None
+    """
+    
+    def __init__(self,capacity=PROFILE_FRAMES,budget=1.0/60):
+        """**Constructor**: creates a new profiler with no frames.
+        
+            :param capacity: the number of frames to keep
+            **Precondition**: an int > 0
+        
+            :param budget: the time one frame should take, in seconds
+            **Precondition**: a number > 0"""
+        self._times = _load_numpy().zeros((capacity,len(PROFILE_COLUMNS)))
+        self._count = 0
+        self._row = None
+        self._start = 0.0
+        self._starts = [0.0]*len(PROFILE_COLUMNS)
+        self._budget = budget
+        self._overlay = None
+    
+    def getcount(self):
+        """**Returns**: The number of frames recorded (at most the capacity)."""
+        return min(self._count,len(self._times))
+    
+    def getframes(self):
+        """**Returns**: A new array with one row per frame kept, oldest first.
+        
+        The columns are those of `PROFILE_COLUMNS`, in seconds."""
+        capacity = len(self._times)
+        if self._count <= capacity:
+            return self._times[:self._count].copy()
+        split = self._count % capacity
+        return _load_numpy().concatenate((self._times[split:],self._times[:split]))
+    
+    def getfps(self):
+        """**Returns**: The average frames per second over the frames kept."""
+        dt = self.getframes()[:,PROFILE_DT]
+        dt = dt[dt > 0]
+        if len(dt) == 0:
+            return 0.0
+        return 1.0/dt.mean()
+    
+    def getpercentile(self,column,q):
+        """**Returns**: The q-th percentile of a column over the frames kept, in seconds.
+        
+            :param column: the column to look at
+            **Precondition**: one of the PROFILE constants
+            
+            :param q: the percentile
+            **Precondition**: a number in 0..100"""
+        if self.getcount() == 0:
+            return 0.0
+        return float(_load_numpy().percentile(self.getframes()[:,column],q))
+    
+    def getsummary(self):
+        """**Returns**: A dictionary from each column name to a dictionary of its statistics.
+        
+        The statistics are mean, p50, p90, p99 and max, in milliseconds."""
+        numpy = _load_numpy()
+        frames = self.getframes()*1000.0
+        summary = {}
+        for column in range(len(PROFILE_COLUMNS)):
+            values = frames[:,column]
+            if len(values) == 0:
+                values = numpy.zeros(1)
+            summary[PROFILE_COLUMNS[column]] = {
+                'mean': float(values.mean()),
+                'p50': float(numpy.percentile(values,50)),
+                'p90': float(numpy.percentile(values,90)),
+                'p99': float(numpy.percentile(values,99)),
+                'max': float(values.max())}
+        return summary
+    
+    def startframe(self,dt):
+        """Starts recording a new frame.
+        
+            :param dt: the time since the last frame, in seconds
+            **Precondition**: a number (int or float)"""
+        self._row = self._times[self._count % len(self._times)]
+        self._row[:] = 0.0
+        self._row[PROFILE_DT] = dt
+        self._start = timeit.default_timer()
+    
+    def begin(self,column):
+        """Starts timing a phase of the current frame.
+        
+            :param column: the phase
+            **Precondition**: one of the PROFILE constants for a phase"""
+        self._starts[column] = timeit.default_timer()
+    
+    def end(self,column):
+        """Stops timing a phase, adding the time to the current frame.
+        
+        A phase can be timed several times in a frame; the times add up.
+        Does nothing between frames.
+        
+            :param column: the phase
+            **Precondition**: one of the PROFILE constants, after `begin`"""
+        if not self._row is None:
+            self._row[column] += timeit.default_timer()-self._starts[column]
+    
+    def endframe(self):
+        """Finishes recording the current frame."""
+        self._row[PROFILE_FRAME] = timeit.default_timer()-self._start
+        self._row = None
+        self._count += 1
+    
+    def export(self,filename):
+        """Writes the frames kept to a file.
+        
+        A file name ending in .json gets the columns, the frames, the budget and
+        the summary as JSON.  Any other file gets the frames as CSV, with a
+        header row.  All times are in milliseconds.
+        
+            :param filename: the file to write
+            **Precondition**: a string"""
+        frames = self.getframes()*1000.0
+        if filename.endswith('.json'):
+            import json
+            data = {'columns': list(PROFILE_COLUMNS), 'budget': self._budget*1000.0,
+                    'frames': frames.tolist(), 'summary': self.getsummary()}
+            with open(filename,'w') as f:
+                json.dump(data,f)
+        else:
+            with open(filename,'w') as f:
+                f.write(','.join(name+'_ms' for name in PROFILE_COLUMNS)+'\n')
+                for row in frames:
+                    f.write(','.join('%.4f' % value for value in row)+'\n')
+    
+    def draw(self,view):
+        """Draws an overlay with the frame rate and the slowest phase.
+        
+        The overlay only changes every `PROFILE_OVERLAY_FRAMES` frames, so that
+        working out its numbers does not slow the game down.
+        
+            :param view: view to draw to
+            **Precondition**: an instance of `GView`"""
+        if self._overlay is None or self._count % PROFILE_OVERLAY_FRAMES == 0:
+            text = self._text()
+            if self._overlay is None:
+                self._overlay = GGlyphLabel(x=4,y=4,text=text,font_size=14,
+                                            fillcolor=[1,1,1,0.75],linecolor=[0,0,0,1])
+            else:
+                self._overlay.text = text
+        self._overlay.draw(view)
+    
+    def _text(self):
+        """**Returns**: the text of the overlay"""
+        if self.getcount() == 0:
+            return 'profiling...'
+        numpy = _load_numpy()
+        frames = self.getframes()
+        phases = (PROFILE_REDRAW,PROFILE_UPDATE,PROFILE_SYNC,PROFILE_DRAW,PROFILE_OVERLAY)
+        slowest = max(phases,key=lambda column: numpy.percentile(frames[:,column],99))
+        over = (frames[:,PROFILE_FRAME] > self._budget).mean()*100
+        return ('%.1f fps   frame p50 %.1f ms  p99 %.1f ms   %.1f%% over budget   slowest: %s' %
+                (self.getfps(),self.getpercentile(PROFILE_FRAME,50)*1000,
+                 self.getpercentile(PROFILE_FRAME,99)*1000,over,PROFILE_COLUMNS[slowest]))
+
+
+class GameApp(_AppBase):
     """Primary controller class for a simple game application."""
     
     @property
@@ -1573,19 +2885,37 @@ class GameApp(kivy.app.App):
         
             Game(width=400,height=400)
         
+        Add the keyword retained=True to draw the view in retained mode (see
+        `GView`), which is faster when most objects are drawn every frame.
+        
+        Add the keyword profile=True to time every frame with a `FrameProfiler`
+        and show its numbers in the corner of the window.  If profile is a file
+        name instead, the timings are also written to that file when the game
+        closes.  Without the keyword, the environment variable GAME2D_PROFILE
+        is used the same way.
+        
         The game window will not show until you start the game.
         To start the game, use the method `run()`."""
+        assert not HEADLESS, 'cannot open a game window in headless mode'
         w = keywords['width']  if  'width' in keywords else 0.0
         h = keywords['height'] if 'height' in keywords else 0.0
         f = keywords['fps']    if 'fps'    in keywords else 60.0
+        r = keywords['retained'] if 'retained' in keywords else False
+        p = keywords['profile'] if 'profile' in keywords else PROFILE
 
         assert type(w) in [int, float], `w`+' is not a number'
         assert type(h) in [int, float], `h`+' is not a number'
         assert type(f) in [int, float], `f`+' is not a number'
         assert f > 0.0, `f`+' is not positive'
+        assert type(r) == bool, `r`+' is not a bool'
+        assert p is None or type(p) in [bool, str], `p`+' is not a bool or file name'
         self._wwidth = w
         self._wheight = h
         self._fps = f
+        self._retained = r
+        self._profiler = FrameProfiler(budget=1.0/f) if p else None
+        self._profilefile = p if type(p) == str else None
+        _add_resources()
         Config.set('graphics', 'width', str(self.width))
         Config.set('graphics', 'height', str(self.height))
         
@@ -1594,7 +2924,7 @@ class GameApp(kivy.app.App):
     
     def build(self):
         """Special Kivy method to initialize the graphics window"""
-        self._view = GView()
+        self._view = GView(self._retained)
         self._view.size_hint = (1,1)
         return self.view
     
@@ -1603,6 +2933,10 @@ class GameApp(kivy.app.App):
         
         This is a callback-proxy for method init().  It handles
         important issues behind the scenes."""
+        global _SYNCING
+        if not self._profiler is None:
+            set_profiler(self._profiler)
+        _SYNCING = True
         Clock.schedule_interval(self._refresh,1.0/self._fps)
         self.init()
     
@@ -1614,15 +2948,44 @@ class GameApp(kivy.app.App):
         
         This is a callback-proxy for method update().  It handles
         important issues behind the scenes."""
+        profiler = self._profiler
+        if profiler is None:
+            self.view._redraw()
+            self.update(dt)
+            _sync_pending()
+            self.draw()
+            return
+        
+        profiler.startframe(dt)
+        profiler.begin(PROFILE_REDRAW)
         self.view._redraw()
+        profiler.end(PROFILE_REDRAW)
+        profiler.begin(PROFILE_UPDATE)
         self.update(dt)
+        profiler.end(PROFILE_UPDATE)
+        profiler.begin(PROFILE_SYNC)
+        _sync_pending()
+        profiler.end(PROFILE_SYNC)
+        profiler.begin(PROFILE_DRAW)
         self.draw()
+        profiler.end(PROFILE_DRAW)
+        profiler.begin(PROFILE_OVERLAY)
+        profiler.draw(self.view)
+        profiler.end(PROFILE_OVERLAY)
+        profiler.endframe()
     
     def run(self):
         """Display the game window and start the game"""
         Clock.schedule_once(self._startup,-1)
         kivy.app.App.run(self)
     
+    def on_stop(self):
+        """Special Kivy method called when the window closes.
+        
+        Writes the frame timings to a file, if a file was given to profile."""
+        if not self._profilefile is None:
+            self._profiler.export(self._profilefile)
+    
     def stop(self):
         """Close the game window and exit Python.
         
@@ -1652,3 +3015,7 @@ class GameApp(kivy.app.App):
     
     def draw(self):
         pass
+
+
+# The import is done
+_loaded('game2d',_IMPORT_START)
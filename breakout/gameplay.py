@@ -15,6 +15,7 @@ of GRectangle provided by game2d.py.
 Most of your work on this assignment will be in either this module or models.py.
 Whether a helper method belongs in this module or models.py is often a complicated
 issue.  If you do not know, ask on Piazza and we will answer."""
+import random
 from constants import *
 from game2d import *
 from models import *
@@ -65,6 +66,21 @@ class Gameplay(object):
         _lostlife [boolean]
             False during regular game play
             True when the ball hits the bottom; pauses the game.
+        _contacts [list of Contact, can be empty]
+            the collisions with the paddle and bricks found by the last call to
+            moveBall, in the order that they happened
+        _seed [int >= 0]
+            the seed of _random
+        _continuous [boolean]
+            True if moveBall sweeps the ball along its path (_sweepBall), False
+            if it only tests the corners where the ball ends up (_jumpBall)
+        _random [random.Random]
+            the generator for every random choice in this game, so that the
+            same seed and the same input always play the same game
+        _recorder [replay.Recorder, or None if the game is not recorded]
+            the recorder told about every call that changes the game
+        _sounds [SoundEngine, or None if the game is silent]
+            the engine that plays a sound for each contact found by moveBall
     """
     
     # GETTERS AND SETTERS (ONLY ADD IF YOU NEED THEM)
@@ -76,27 +92,114 @@ class Gameplay(object):
         """Returns True if the player lost a life, False otherwise."""
         return self._lostlife
     
+    def get_contact(self):
+        """Returns the first Contact from the last call to moveBall, or None if
+        the ball did not hit the paddle or a brick in that step."""
+        if self._contacts == []:
+            return None
+        return self._contacts[0]
+    
+    def get_contacts(self):
+        """Returns the list of every Contact from the last call to moveBall,
+        in the order that they happened."""
+        return self._contacts
+    
+    def get_ballx(self):
+        """Returns the x coordinate of the left edge of the ball"""
+        return self._ball.x
+    
+    def get_bally(self):
+        """Returns the y coordinate of the bottom edge of the ball"""
+        return self._ball.y
+    
+    def get_ballvx(self):
+        """Returns the horizontal velocity of the ball"""
+        return self._ball.get_vx()
+    
+    def get_ballvy(self):
+        """Returns the vertical velocity of the ball"""
+        return self._ball.get_vy()
+    
+    def get_paddlex(self):
+        """Returns the x coordinate of the left edge of the paddle"""
+        return self._paddle.x
+    
+    def get_bricksleft(self):
+        """Returns the number of bricks still in the wall"""
+        return self._wall.getcount()
+    
+    def get_brickmask(self):
+        """Returns a bytearray with a 1 for each slot of the wall that has a brick
+        
+        The slots are in row-major order, as in BrickWall.  The bytearray is a
+        copy, so changing it does not change the wall."""
+        return self._wall.getmask()
+    
+    def get_seed(self):
+        """Returns the seed of the random choices in this game"""
+        return self._seed
+    
+    def get_continuous(self):
+        """Returns True if the ball is swept along its path, False for the corner test"""
+        return self._continuous
+    
     def set_tries(self,lives):
         """Sets the number of tries the value lives
         
         Precondition: lives >= 0"""
+        if self._recorder is not None:
+            self._recorder.settries(lives)
         self._tries = lives
     
     def set_lostlife(self,lostlife):
         """Sets _lostlife
         
         Precondition: lostlife is a Boolean"""
+        if self._recorder is not None:
+            self._recorder.setlostlife(lostlife)
         self._lostlife = lostlife
     
+    def set_recorder(self,recorder):
+        """Sets the recorder to tell about every call that changes the game
+        
+        Precondition: recorder is a replay.Recorder, or None to stop recording"""
+        self._recorder = recorder
+    
+    def set_sounds(self,sounds):
+        """Sets the engine that plays the collision sounds
+        
+        Precondition: sounds is a SoundEngine, or None for a silent game"""
+        self._sounds = sounds
+    
     # INITIALIZER (standard form) TO CREATE PADDLES AND BRICKS
-    def __init__(self):
+    def __init__(self, seed=None, continuous=None):
         """Creates the necessary objects and conditions for playing the game
         
         The brickwall is created as a BrickWall object, and the paddle is a
         GRectangle object. The ball is created as a Ball object.
         Since the player has not lost a life yet (the game hasn't started),
         _lost life is False and _tries is 2.
-        """
+        
+        Every random choice in the game comes from a generator seeded with
+        seed.  If seed is None, a seed is picked at random (and can be read
+        with get_seed).
+        
+        continuous picks how moveBall finds collisions: True sweeps the ball
+        along its path, and False only tests the corners where it ends up (the
+        rules that BatchSimulation follows).  If it is None, the game uses
+        CONTINUOUS_COLLISIONS.
+        
+        Precondition: seed is an int >= 0 or None; continuous is a boolean
+        or None"""
+        if seed is None:
+            seed = random.randrange(2**31)
+        if continuous is None:
+            continuous = CONTINUOUS_COLLISIONS
+        self._seed = seed
+        self._continuous = continuous
+        self._random = random.Random(seed)
+        self._recorder = None
+        self._sounds = None
         
         self._wall = BrickWall()  
         self._paddle = GRectangle(
@@ -106,10 +209,11 @@ class Gameplay(object):
             height=PADDLE_HEIGHT,
             fillcolor = PADDLE_COLOR)
         self._clickdist = 0
-        self._ball = Ball()  
+        self._ball = Ball(self._random)
         self._last = None
         self._tries = 2
         self._lostlife = False
+        self._contacts = []
     
     # DRAW METHOD TO DRAW THE PADDLES, BALL, AND BRICKS
     def draw(self, view):
@@ -138,6 +242,9 @@ class Gameplay(object):
         
         Precondition: touch is a GPoint or None
         """
+        if self._recorder is not None:
+            self._recorder.touch(touch)
+        
         #first click
         if (touch != None and self._last == None):
             self._clickdist = touch.x - self._paddle.x
@@ -155,38 +262,93 @@ class Gameplay(object):
                 self._paddle.x = 0
         self._last = touch
     
-    def moveBall(self):
+    def moveBall(self, scale=1.0):
         """Moves the ball one step and checks for ball collisions.
         
+        The ball moves by scale times its velocity.  The velocity is how far
+        the ball moves in BALL_TIME_UNIT seconds, so a physics step of dt
+        seconds should use scale dt/BALL_TIME_UNIT.
+        
+        If this game is continuous (see __init__), the ball is swept along its
+        path (see _sweepBall).  Otherwise it jumps to the end of the step and only
+        the corners where it lands are tested (see _jumpBall).  Either way the
+        collisions are stored in _contacts so that they can be read with
+        get_contact and get_contacts after the step.
+        
+        Precondition: scale is an int or float > 0"""
+        if self._recorder is not None:
+            self._recorder.move(scale)
+        profiler = get_profiler()
+        if profiler is not None:
+            profiler.begin(PROFILE_COLLISION)
+        self._contacts = []
+        if self._continuous:
+            self._sweepBall(scale)
+        else:
+            self._jumpBall(scale)
+        if profiler is not None:
+            profiler.end(PROFILE_COLLISION)
+        if self._sounds is not None and self._contacts != []:
+            self._playSounds()
+    
+    # HELPER METHODS FOR PHYSICS AND COLLISION DETECTION
+    def _playSounds(self):
+        """Plays a sound for each contact found by the last step.
+        
+        The paddle plays PADDLE_SOUND.  Bricks play BRICK_SOUNDS in turn, picked
+        by the number of bricks left, so that the sounds never use _random and a
+        game plays the same with or without sound.  The sounds are already in
+        memory, so this does not wait on anything.
+        
+        Precondition: _sounds is not None"""
+        for contact in self._contacts:
+            if contact.getobject() == self._paddle:
+                self._sounds.play(PADDLE_SOUND,SOUND_VOLUME)
+            else:
+                count = self._wall.getcount()
+                self._sounds.play(BRICK_SOUNDS[count % len(BRICK_SOUNDS)],SOUND_VOLUME)
+    
+    def _jumpBall(self, scale):
+        """Moves the ball to the end of the step, then checks for collisions.
+        
         Collisions with bricks, the top of the paddle, or the top edge negates
         the vertical velocity of the ball. Collisions with the left/right edge
-        negates the horizontal velocity of the ball."""
+        negates the horizontal velocity of the ball.  The collision test runs
+        once per step.
+        
+        A fast ball can skip through a brick or the paddle this way.
+        
+        Precondition: scale is an int or float > 0"""
         
         #move ball one step
         vx = self._ball.get_vx()
         vy = self._ball.get_vy()
-        self._ball.x = self._ball.x + vx
-        self._ball.y = self._ball.y + vy
+        self._ball.x = self._ball.x + vx*scale
+        self._ball.y = self._ball.y + vy*scale
         
         #COLLISIONS
+        contact = self._getContact()
+        if contact is None:
+            hit = None
+        else:
+            hit = contact.getobject()
+            self._contacts.append(contact)
         if vy > 0:
             balltop = self._ball.y + BALL_DIAMETER
             if balltop >= GAME_HEIGHT:
                 self._ball.set_vy(-vy)
-            if (self._getCollidingObject() != None and
-                self._getCollidingObject() != self._paddle):
+            if hit != None and hit != self._paddle:
                 self._ball.set_vy(-vy)
-                self._wall.removebrick(self._getCollidingObject())
+                self._wall.removebrick(hit)
         if vy < 0:
             ballbottom = self._ball.y
             if ballbottom <= 0:
                 self._lostlife = True
-            if self._getCollidingObject() == self._paddle:
+            if hit == self._paddle:
                 self._ball.set_vy(-vy)
-            if (self._getCollidingObject() != None and
-                self._getCollidingObject() != self._paddle):
+            if hit != None and hit != self._paddle:
                 self._ball.set_vy(-vy)
-                self._wall.removebrick(self._getCollidingObject())
+                self._wall.removebrick(hit)
         if vx > 0:
             ballright = self._ball.x + BALL_DIAMETER
             if ballright >= GAME_WIDTH:
@@ -195,8 +357,147 @@ class Gameplay(object):
             ballleft = self._ball.x
             if ballleft <= 0:
                 self._ball.set_vx(-vx)
-
-    # HELPER METHODS FOR PHYSICS AND COLLISION DETECTION
+    
+    def _sweepBall(self, scale):
+        """Moves the ball along its path, bouncing at the earliest impact each time.
+        
+        The ball box is swept from where it starts toward where the step would
+        take it.  It stops at the first thing it would touch (the paddle, a
+        brick or the top/left/right edge), bounces off the side it touched,
+        and continues with what is left of the step.  A brick that is touched
+        is removed.  At most MAX_CONTACTS impacts are resolved; anything left
+        of the step after that is dropped.
+        
+        A ball that is falling and at or below the bottom edge at the end of
+        the step is lost, exactly as in _jumpBall.
+        
+        Precondition: scale is an int or float > 0"""
+        remaining = 1.0
+        impacts = 0
+        while remaining > 0 and impacts < MAX_CONTACTS:
+            dx = self._ball.get_vx()*scale*remaining
+            dy = self._ball.get_vy()*scale*remaining
+            impact = self._getEarliestImpact(dx,dy)
+            if impact is None:
+                self._ball.x = self._ball.x + dx
+                self._ball.y = self._ball.y + dy
+                break
+            
+            time, hit, side = impact
+            self._ball.x = self._ball.x + dx*time
+            self._ball.y = self._ball.y + dy*time
+            if side == SIDE_TOP or side == SIDE_BOTTOM:
+                self._ball.set_vy(-self._ball.get_vy())
+            else:
+                self._ball.set_vx(-self._ball.get_vx())
+            if hit is not None:
+                self._contacts.append(Contact(self._ball,hit,side,1.0-remaining*(1.0-time)))
+                if hit != self._paddle:
+                    self._wall.removebrick(hit)
+            remaining = remaining*(1.0-time)
+            impacts = impacts + 1
+        
+        if self._ball.get_vy() < 0 and self._ball.y <= 0:
+            self._lostlife = True
+    
+    def _getEarliestImpact(self, dx, dy):
+        """Returns: (time, object, side) for the first impact of the ball moving by (dx,dy)
+        
+        time is the fraction of the move before the impact.  object is the
+        paddle or brick hit, or None for an edge of the window.  side is the
+        side of the object that the ball touches (for an edge of the window,
+        the side that faces the ball).  Returns None if the ball can move the
+        whole way.
+        
+        Only the bricks in the grid cells under the path are tested.
+        
+        Precondition: dx and dy are ints or floats"""
+        x = self._ball.x
+        y = self._ball.y
+        best = None
+        
+        candidates = [self._paddle]
+        candidates.extend(self._wall.getBricksIn(min(x,x+dx),min(y,y+dy),
+                                                 max(x,x+dx)+BALL_DIAMETER,
+                                                 max(y,y+dy)+BALL_DIAMETER))
+        for obj in candidates:
+            impact = self._getImpact(obj,dx,dy)
+            if impact is not None and (best is None or impact[0] < best[0]):
+                best = (impact[0],obj,impact[1])
+        
+        # The edges of the window
+        if dy > 0:
+            time = max((GAME_HEIGHT-(y+BALL_DIAMETER))/dy,0.0)
+            if time <= 1 and (best is None or time < best[0]):
+                best = (time,None,SIDE_BOTTOM)
+        if dx > 0:
+            time = max((GAME_WIDTH-(x+BALL_DIAMETER))/dx,0.0)
+            if time <= 1 and (best is None or time < best[0]):
+                best = (time,None,SIDE_LEFT)
+        elif dx < 0:
+            time = max(-x/dx,0.0)
+            if time <= 1 and (best is None or time < best[0]):
+                best = (time,None,SIDE_RIGHT)
+        return best
+    
+    def _getImpact(self, obj, dx, dy):
+        """Returns: (time, side) when the ball moving by (dx,dy) first touches obj
+        
+        This is the standard swept test for two boxes: the move enters obj on
+        each axis at some time, and the ball touches obj once it has entered
+        on both.  side is the side of obj on the axis that was entered last.
+        Returns None if the ball does not touch obj during the move.
+        
+        If the ball already overlaps obj, the time is 0 and the side is found as
+        in Contact, but only if the ball is moving into obj through that side.
+        
+        Precondition: obj is a GObject; dx and dy are ints or floats"""
+        x = self._ball.x
+        y = self._ball.y
+        inf = float('inf')
+        
+        if dx > 0:
+            enterx = (obj.left-(x+BALL_DIAMETER))/dx
+            leavex = (obj.right-x)/dx
+        elif dx < 0:
+            enterx = (obj.right-x)/dx
+            leavex = (obj.left-(x+BALL_DIAMETER))/dx
+        elif obj.left < x+BALL_DIAMETER and x < obj.right:
+            enterx = -inf
+            leavex = inf
+        else:
+            return None
+        
+        if dy > 0:
+            entery = (obj.bottom-(y+BALL_DIAMETER))/dy
+            leavey = (obj.top-y)/dy
+        elif dy < 0:
+            entery = (obj.top-y)/dy
+            leavey = (obj.bottom-(y+BALL_DIAMETER))/dy
+        elif obj.bottom < y+BALL_DIAMETER and y < obj.top:
+            entery = -inf
+            leavey = inf
+        else:
+            return None
+        
+        enter = max(enterx,entery)
+        leave = min(leavex,leavey)
+        if enter >= leave or leave <= 0 or enter > 1:
+            return None
+        
+        if enter < 0:
+            side = Contact(self._ball,obj).getside()
+            if ((side == SIDE_TOP and dy < 0) or (side == SIDE_BOTTOM and dy > 0) or
+                (side == SIDE_LEFT and dx > 0) or (side == SIDE_RIGHT and dx < 0)):
+                return (0.0,side)
+            return None
+        
+        if enterx > entery:
+            side = SIDE_LEFT if dx > 0 else SIDE_RIGHT
+        else:
+            side = SIDE_BOTTOM if dy > 0 else SIDE_TOP
+        return (enter,side)
+    
     def _getCollidingObject(self):
         """Returns: GObject that has collided with the ball
         
@@ -204,7 +505,10 @@ class Gameplay(object):
         time. If one of these points collides with either the paddle 
         or a brick, it stops the checking immediately and returns the 
         object involved in the collision. It returns None if no 
-        collision occurred."""
+        collision occurred.
+        
+        Bricks are found with BrickWall.getBrickAt, which only looks in
+        the grid cell under each corner instead of scanning every brick."""
         corners = [[self._ball.x,self._ball.y],
                 [self._ball.x,self._ball.y+BALL_DIAMETER],
                 [self._ball.x+BALL_DIAMETER,self._ball.y],
@@ -213,24 +517,71 @@ class Gameplay(object):
         for point in corners:
             if self._paddle.contains(point[0],point[1]):
                 return self._paddle
-            for brick in self._wall.getbricks():
-                if brick.contains(point[0],point[1]):
-                    return brick
+            brick = self._wall.getBrickAt(point[0],point[1])
+            if brick is not None:
+                return brick
         return None
     
+    def _getContact(self):
+        """Returns: Contact for the object that has collided with the ball
+        
+        This method finds the colliding object with _getCollidingObject and
+        measures the collision.  It returns None if no collision occurred."""
+        hit = self._getCollidingObject()
+        if hit is None:
+            return None
+        return Contact(self._ball,hit)
+    
     # ADD ANY ADDITIONAL METHODS (FULLY SPECIFIED) HERE
+    def getstate(self):
+        """Returns: a tuple with everything needed to put the game back as it is now
+        
+        The tuple is (mask, paddlex, clickdist, last, ballx, bally, ballvx,
+        ballvy, tries, lostlife, rngstate).  mask is the live-brick bitmap of
+        BrickWall.getmask, last is the last touch as a pair (x,y) or None, and
+        rngstate is the state of the random generator.  The contacts of the
+        last step are not part of the state."""
+        last = None if self._last is None else (self._last.x,self._last.y)
+        return (self._wall.getmask(), self._paddle.x, self._clickdist, last,
+                self._ball.x, self._ball.y, self._ball.get_vx(), self._ball.get_vy(),
+                self._tries, self._lostlife, self._random.getstate())
+    
+    def setstate(self, state):
+        """Puts the game back to a state returned by getstate
+        
+        The game must have a wall of the same size as the game the state came
+        from.  If the state has no random generator state (None), the
+        generator is left as it is.  This call is not recorded.
+        
+        Precondition: state is a tuple returned by getstate"""
+        (mask, paddlex, clickdist, last, ballx, bally, ballvx, ballvy,
+         tries, lostlife, rngstate) = state
+        self._wall.setmask(mask)
+        self._paddle.x = paddlex
+        self._clickdist = clickdist
+        self._last = None if last is None else GPoint(last[0],last[1])
+        self._ball.x = ballx
+        self._ball.y = bally
+        self._ball.set_vx(ballvx)
+        self._ball.set_vy(ballvy)
+        self._tries = tries
+        self._lostlife = lostlife
+        if rngstate is not None:
+            self._random.setstate(rngstate)
+        self._contacts = []
+    
     def resetball(self):
         """Resets the ball object.
         
-        This method is used in the Breakout class in the STATE_PAUSED_COUNTDOWN
-        after the player has clicked in STATE_PAUSED"""
-        self._ball = Ball()
+        This method is used in the Breakout class once, when the player
+        clicks in STATE_PAUSED to start STATE_PAUSED_COUNTDOWN"""
+        if self._recorder is not None:
+            self._recorder.resetball()
+        self._ball = Ball(self._random)
         
     def wall_none(self):
         """Returns: True if the brickwall is empy, False otherwise.
         
         Used to check to see if the game has been won or not"""
-        if self._wall.getbricks()==[]:
-            return True
-        else: return False
+        return self._wall.isempty()
     
@@ -20,6 +20,7 @@ You are free to add new models to this module.  You may wish to do this when you
 new features to your game.  If you are unsure about whether to make a new class or 
 not, please ask on Piazza."""
 
+import array
 import random # To randomly generate the ball velocity
 from constants import *
 from game2d import *
@@ -31,17 +32,71 @@ from game2d import *
 # calls the method.
 
 
+# The layout of every wall made so far, keyed by the constants it depends on
+_LAYOUTS = {}
+
+
+def _getLayout():
+    """Returns: the layout of a wall with the current constants
+    
+    The layout is the tuple (left, top, colstep, rowstep, xs, ys, colors, full).
+    left is the x coordinate of the left edge of column 0, top the y coordinate
+    of the top edge of row 0, and colstep and rowstep the distances between
+    columns and rows.  xs is an array of the left edge of each column, ys an
+    array of the bottom edge of each row, colors the tuple of the color of each
+    row, and full a mask with a 1 for every slot.
+    
+    It is computed the first time it is asked for, and the same tuple is
+    returned after that.  Nothing in it may be changed."""
+    key = (BRICKS_IN_ROW, BRICK_ROWS, BRICK_WIDTH, BRICK_HEIGHT, BRICK_SEP_H,
+           BRICK_SEP_V, BRICK_Y_OFFSET, GAME_HEIGHT)
+    layout = _LAYOUTS.get(key)
+    if layout is None:
+        left = BRICK_SEP_H/2
+        top  = GAME_HEIGHT - BRICK_Y_OFFSET + BRICK_HEIGHT
+        colstep = BRICK_WIDTH + BRICK_SEP_H
+        rowstep = BRICK_HEIGHT + BRICK_SEP_V
+        xs = array.array('d',[left+col*colstep for col in range(BRICKS_IN_ROW)])
+        ys = array.array('d',[top-BRICK_HEIGHT-row*rowstep for row in range(BRICK_ROWS)])
+        colors = tuple(ROW_COLORS[row % 10] for row in range(BRICK_ROWS))
+        full = bytearray([1])*(BRICKS_IN_ROW*BRICK_ROWS)
+        layout = (left, top, colstep, rowstep, xs, ys, colors, full)
+        _LAYOUTS[key] = layout
+    return layout
+
+
 class BrickWall(object):
     """An instance represents the layer of bricks in the game.  When the wall is
     empty, the game is over and the player has won. This model class keeps track of
     all of the bricks in the game, allowing them to be added or removed.
     
     INSTANCE ATTRIBUTES:
-        _bricks [list of GRectangle, can be empty]:
-            This is the list of currently active bricks in the game.  When a brick
-            is destroyed, it is removed from the list.
+        _mask [bytearray of 0 or 1]:
+            The live-brick bitmap, stored row by row.  The brick in row r and
+            column c is at position (slot) r*BRICKS_IN_ROW+c.  _mask[slot] is 1
+            if that brick is still in the wall, and 0 if it was destroyed.  The
+            bytearray never changes length.
+        _bricks [dict of int to GRectangle]:
+            The bricks made so far, by slot.  A brick is only made when it is
+            first asked for (e.g. near the ball), so a new wall makes none.
+            Every key is a slot whose _mask entry is 1.
+        _alive [int >= 0]: the number of bricks still in the wall (the number of 1s
+            in _mask)
+        _left [int or float]: the x coordinate of the left edge of column 0
+        _top  [int or float]: the y coordinate of the top edge of row 0
+        _colstep [int or float >= 0]: the horizontal distance between columns
+        _rowstep [int or float > 0]:  the vertical distance between rows
+        _xs [array of float]: the x coordinate of the left edge of each column
+        _ys [array of float]: the y coordinate of the bottom edge of each row
+        _colors [tuple of colors]: the color of each row
+        _batch [GBatch, or None if the wall has not been drawn]:
+            the meshes that draw the wall.  The handle of the rectangle for the
+            brick in slot i is i.
     
-    As you can see, this attribute is hidden.  You may find that you want to access 
+    The positions and colors are shared by every wall of the same size (see
+    _getLayout), so they must not be changed.
+    
+    As you can see, these attributes are hidden.  You may find that you want to access 
     a brick from class Gameplay. It is okay if you do that,  but you MAY NOT 
     ACCESS THE ATTRIBUTE DIRECTLY. You must use a getter and/or setter for any 
     attribute that you need to access in GameController.  Only add the getters and 
@@ -59,57 +114,180 @@ class BrickWall(object):
     
     # GETTERS AND SETTERS (ONLY ADD IF YOU NEED THEM)
     def getbricks(self):
-        """Returns the list of GRectangle in _bricks"""
-        return self._bricks
+        """Returns a new list of the GRectangle objects still in the wall
+        
+        This list is built on each call, and makes every brick that was not
+        made yet, so it should only be used when every brick is needed."""
+        mask = self._mask
+        return [self._getBrick(slot) for slot in xrange(len(mask)) if mask[slot]]
+    
+    def getcount(self):
+        """Returns the number of bricks still in the wall"""
+        return self._alive
+    
+    def isempty(self):
+        """Returns True if every brick has been destroyed, False otherwise"""
+        return self._alive == 0
+    
+    def getBricksIn(self, left, bottom, right, top):
+        """Returns: a list of the bricks whose grid cells meet the given rectangle
+        
+        Only the cells under the rectangle are looked at, so this is fast for
+        small rectangles (like the path of the ball in one step).  The bricks
+        are not guaranteed to overlap the rectangle; only their cells are.
+        
+        Precondition: left <= right and bottom <= top are ints or floats"""
+        if self._colstep <= 0:
+            return []
+        col0 = max(int((left - self._left) // self._colstep),0)
+        col1 = min(int((right - self._left) // self._colstep),BRICKS_IN_ROW-1)
+        row0 = max(int((self._top - top) // self._rowstep),0)
+        row1 = min(int((self._top - bottom) // self._rowstep),BRICK_ROWS-1)
+        
+        result = []
+        for row in range(row0,row1+1):
+            for slot in range(row*BRICKS_IN_ROW+col0,row*BRICKS_IN_ROW+col1+1):
+                if self._mask[slot]:
+                    result.append(self._getBrick(slot))
+        return result
+    
+    def getBrickAt(self, x, y):
+        """Returns: the brick that contains the point (x,y), or None if there is none
+        
+        The bricks sit on a regular grid, so this method only needs to look in
+        the one slot that could hold the point.  It does not search the whole
+        wall.
+        
+        Precondition: x and y are ints or floats"""
+        slot = self._getSlot(x,y)
+        if slot is None or not self._mask[slot]:
+            return None
+        brick = self._getBrick(slot)
+        if brick.contains(x,y):
+            return brick
+        return None
     
     # INITIALIZER TO LAYOUT BRICKS ON THE SCREEN
     def __init__(self):
         """Creates the bricks for the game
         
         The bricks are centered horizontally and are styled according to the
-        values given in constants.py."""
-        
-        self._bricks = []
-        
-        vertpos = GAME_HEIGHT - BRICK_Y_OFFSET
-        bricknum = 0
-        
-        for col in range(BRICK_ROWS):
-            horizpos = BRICK_SEP_H/2
-            colnum = col
-            while colnum > 9:
-                colnum = colnum - 10
-            for row in range(BRICKS_IN_ROW):
-                brick = GRectangle(
-                    x=horizpos,
-                    y=vertpos,
-                    width=BRICK_WIDTH,
-                    height=BRICK_HEIGHT,
-                    linecolor=ROW_COLORS[colnum],
-                    fillcolor=ROW_COLORS[colnum])
-                self._bricks.append(brick)
-                horizpos = horizpos + BRICK_WIDTH + BRICK_SEP_H
-                bricknum = bricknum + 1
-            vertpos = vertpos - BRICK_HEIGHT - BRICK_SEP_V
+        values given in constants.py.  The layout is only worked out for the
+        first wall (see _getLayout); every later wall copies the mask of a
+        full wall and nothing else."""
+        (self._left, self._top, self._colstep, self._rowstep,
+         self._xs, self._ys, self._colors, full) = _getLayout()
+        self._mask  = bytearray(full)
+        self._alive = len(full)
+        self._bricks = {}
+        self._batch = None
   
  
     # ADD MORE METHODS (PROPERLY SPECIFIED) AS NECESSARY
+    def getmask(self):
+        """Returns a copy of the live-brick bitmap (one byte per slot, 1 for a brick)"""
+        return bytearray(self._mask)
+    
+    def setmask(self, mask):
+        """Puts back exactly the bricks marked in mask, and removes all others
+        
+        Bricks that come back are new GRectangle objects.  The wall is drawn
+        again from scratch the next time it is drawn.
+        
+        Precondition: mask is a bytearray (or str) of 0s and 1s, one for each
+        slot, as returned by getmask"""
+        mask = bytearray(mask)
+        assert len(mask) == len(self._mask), 'mask has the wrong length'
+        for slot in self._bricks.keys():
+            if not mask[slot]:
+                del self._bricks[slot]
+        self._mask  = mask
+        self._alive = sum(mask)
+        self._batch = None
+    
     def draw(self, view):
         """Draws the brick objects to the view.
         
         This is the draw method necessary for the wall to be drawn in breakout.
-        This method draws each individual GRectangle object in _bricks
+        The whole wall is drawn as a GBatch, which has one mesh per color, so
+        the bricks are not drawn one at a time.  The batch is made on the
+        first call, from the layout, so no bricks need to be made for it.
         
         Precondition: view is an instance of GView
         """
-        for thebrick in self._bricks:
-            thebrick.draw(view)
+        if self._batch is None:
+            self._batch = GBatch()
+            for slot in range(len(self._mask)):
+                row = slot // BRICKS_IN_ROW
+                col = slot % BRICKS_IN_ROW
+                # Bricks have a border of the same color, so draw one rectangle
+                self._batch.add(self._xs[col]-LINE_SIZE,self._ys[row]-LINE_SIZE,
+                                BRICK_WIDTH+2*LINE_SIZE,BRICK_HEIGHT+2*LINE_SIZE,
+                                self._colors[row])
+                if self._mask[slot] == 0:
+                    self._batch.hide(slot)
+        self._batch.draw(view)
     
     def removebrick (self, brick):
         """Deletes brick object
         
-        Precondition: brick is a GRectangle"""
-        self._bricks.remove(brick)
+        The slot of the brick is computed from its position, so this takes
+        constant time no matter how many bricks are in the wall.
+        
+        Precondition: brick is a GRectangle in this wall"""
+        slot = self._getSlot(brick.center_x,brick.center_y)
+        if slot is None or self._bricks.get(slot) is not brick:
+            # Only happens when the bricks are too narrow to lay out on a grid
+            for slot in self._bricks:
+                if self._bricks[slot] is brick:
+                    break
+            else:
+                raise ValueError('brick is not in the wall')
+        del self._bricks[slot]
+        self._mask[slot] = 0
+        self._alive = self._alive - 1
+        if self._batch is not None:
+            self._batch.hide(slot)
+    
+    # HELPER METHODS FOR THE SPATIAL INDEX
+    def _getBrick(self, slot):
+        """Returns: the brick in the given slot, making it if it was not made yet
+        
+        Precondition: slot is an int in 0..len(_mask)-1, and _mask[slot] is 1"""
+        brick = self._bricks.get(slot)
+        if brick is None:
+            brick = self._makeBrick(slot)
+            self._bricks[slot] = brick
+        return brick
+    
+    def _makeBrick(self, slot):
+        """Returns: a new brick for the given slot
+        
+        Precondition: slot is an int in 0..len(_mask)-1"""
+        row = slot // BRICKS_IN_ROW
+        return GRectangle(
+            x=self._xs[slot % BRICKS_IN_ROW],
+            y=self._ys[row],
+            width=BRICK_WIDTH,
+            height=BRICK_HEIGHT,
+            linecolor=self._colors[row],
+            fillcolor=self._colors[row])
+    
+    def _getSlot(self, x, y):
+        """Returns: the slot of the grid cell holding (x,y), or None
+        
+        The cell of a brick includes the separation to its right and below it,
+        so a point in a gap maps to the cell of a neighboring brick.  Returns
+        None if the point is outside of the wall.
+        
+        Precondition: x and y are ints or floats"""
+        if self._colstep <= 0:
+            return None
+        col = int((x - self._left) // self._colstep)
+        row = int((self._top - y) // self._rowstep)
+        if col < 0 or col >= BRICKS_IN_ROW or row < 0 or row >= BRICK_ROWS:
+            return None
+        return row*BRICKS_IN_ROW+col
 
 
 class Ball(GEllipse):
@@ -164,11 +342,15 @@ class Ball(GEllipse):
         self._vy = vy
     
     # INITIALIZER TO SET RANDOM VELOCITY
-    def __init__(self):
+    def __init__(self, rng=random):
         """Creates the ball for the game and gives it an intial velocity
         
         The ball is centered horizontally and vertically. The initial vertical
-        velocity is negative, but the initial horizontal velocity is random"""
+        velocity is negative, but the initial horizontal velocity is random.
+        It is drawn from rng, so a game with its own seeded generator serves
+        the same balls every time.
+        
+        Precondition: rng is a random.Random or the module random"""
         
         GEllipse.__init__(self,
             center_x = GAME_WIDTH / 2,
@@ -177,8 +359,8 @@ class Ball(GEllipse):
             width = BALL_DIAMETER,
             height = BALL_DIAMETER)
         self._vy = -5.0
-        self._vx = random.uniform(1.0,5.0) 
-        self._vx = self._vx * random.choice([-1, 1])
+        self._vx = rng.uniform(1.0,5.0) 
+        self._vx = self._vx * rng.choice([-1, 1])
     
     # METHODS TO MOVE AND/OR BOUNCE THE BALL
     
@@ -186,4 +368,68 @@ class Ball(GEllipse):
     
 
 
-# IF YOU NEED ADDITIONAL MODEL CLASSES, THEY GO HERE
\ No newline at end of file
+# IF YOU NEED ADDITIONAL MODEL CLASSES, THEY GO HERE
+class Contact(object):
+    """Instance is the result of one collision test between the ball and an object.
+    
+    Gameplay computes a contact once per step, and every part of the game that
+    cares about the collision (bouncing, removing bricks, scoring) reads it from
+    here instead of testing for the collision again.
+    
+    INSTANCE ATTRIBUTES:
+        _object [GObject]: the paddle or brick that the ball hit
+        _side [one of SIDE_TOP, SIDE_BOTTOM, SIDE_LEFT, SIDE_RIGHT]:
+            the side of _object that the ball hit
+        _penetration [float >= 0]: how far the ball overlaps _object, measured
+            perpendicular to _side
+        _time [float in 0..1]: when the contact happened, as a fraction of the step
+    """
+    
+    # GETTERS (CONTACTS ARE IMMUTABLE)
+    def getobject(self):
+        """Returns the object that the ball hit"""
+        return self._object
+    
+    def getside(self):
+        """Returns the side of the object that the ball hit"""
+        return self._side
+    
+    def getpenetration(self):
+        """Returns how far the ball overlaps the object it hit"""
+        return self._penetration
+    
+    def gettime(self):
+        """Returns when the contact happened, as a fraction of the step"""
+        return self._time
+    
+    # INITIALIZER
+    def __init__(self, ball, obj, side=None, time=1.0):
+        """Creates the contact between ball and obj
+        
+        If side is None, the side is the one with the smallest overlap between
+        the two bounding boxes, which is the side the ball most likely came
+        through.  Otherwise the ball is just touching obj on that side, and the
+        penetration is 0.
+        
+        Precondition: ball is a Ball, obj is a GObject that overlaps or touches
+        ball.  side is None or one of the SIDE constants.  time is a float in 0..1"""
+        self._object = obj
+        self._time = time
+        if side is not None:
+            self._side = side
+            self._penetration = 0.0
+            return
+        overlap_x = min(ball.right,obj.right)-max(ball.left,obj.left)
+        overlap_y = min(ball.top,obj.top)-max(ball.bottom,obj.bottom)
+        if overlap_y <= overlap_x:
+            if ball.center_y >= obj.center_y:
+                self._side = SIDE_TOP
+            else:
+                self._side = SIDE_BOTTOM
+            self._penetration = max(overlap_y,0.0)
+        else:
+            if ball.center_x >= obj.center_x:
+                self._side = SIDE_RIGHT
+            else:
+                self._side = SIDE_LEFT
+            self._penetration = max(overlap_x,0.0)
\ No newline at end of file
@@ -0,0 +1,394 @@
+# replay.py
+"""Recording and replay of games of Breakout
+
+A game is fully decided by the seed of its Gameplay and by the calls made to
+it.  A Recorder writes those calls to a small binary file as they happen, and
+a Replayer makes a new Gameplay with the same seed and makes the same calls
+again.  The replayed game ends up in exactly the same state, and since it is
+never drawn, it runs as fast as the physics allows.
+
+Replaying never draws, so a script that only replays games can set
+GAME2D_HEADLESS, as for simulation.py, and never load Kivy.
+
+A recording is a header followed by one record per call.  Each record is an
+opcode byte and, for some opcodes, a payload:
+
+    OP_TOUCH    updatePaddle with a new touch      x, y as doubles
+    OP_HOLD     updatePaddle with the last touch   (none)
+    OP_RELEASE  updatePaddle with None             (none)
+    OP_MOVE     moveBall with a new scale          scale as a double
+    OP_STEP     moveBall with the last scale       (none)
+    OP_RESET    resetball                          (none)
+    OP_TRIES    set_tries                          tries as an int
+    OP_LOST     set_lostlife(True)                 (none)
+    OP_FOUND    set_lostlife(False)                (none)
+    OP_SNAPSHOT the whole state of the game        tick and size as ints,
+                                                   then the state
+
+Most frames are a held (or released) touch and a step at the usual scale, so
+they take two bytes.  Touches and scales are stored as doubles, as anything
+less precise would make the replay drift away from the original game.
+
+A tick is one call to updatePaddle together with the calls that follow it,
+which is one frame of Breakout.
+
+Every SNAPSHOT_TICKS ticks, the recorder writes a snapshot of the game (the
+state of Gameplay.getstate, in the format of state.py) before the next tick.  Replayer.seek restores the
+last snapshot before the tick it is asked for and only replays the ticks
+after it, so any point of a long game can be reached quickly.  The first
+touch and step after a snapshot are always written in full, so replaying can
+start at any snapshot."""
+import bisect
+import struct
+from constants import *
+from game2d import *
+from gameplay import *
+from state import pack_state, unpack_state
+
+
+#: the first bytes of every recording
+REPLAY_MAGIC   = 'BKRP'
+#: the version of the recording format
+REPLAY_VERSION = 1
+#: the header: magic, version, flags, seed, BRICKS_IN_ROW, BRICK_ROWS
+REPLAY_HEADER  = struct.Struct('<4sBBqHH')
+#: header flag for a game that sweeps the ball (see Gameplay.get_continuous)
+FLAG_CONTINUOUS = 1
+
+# The opcodes
+OP_TOUCH   = 1
+OP_HOLD    = 2
+OP_RELEASE = 3
+OP_MOVE    = 4
+OP_STEP    = 5
+OP_RESET   = 6
+OP_TRIES   = 7
+OP_LOST    = 8
+OP_FOUND   = 9
+OP_SNAPSHOT = 10
+
+# The payloads
+_POINT = struct.Struct('<dd')
+_FLOAT = struct.Struct('<d')
+_INT   = struct.Struct('<i')
+# The tick and size of a snapshot
+_SNAPSHOT = struct.Struct('<II')
+
+
+class Recorder(object):
+    """An instance writes the calls made to one Gameplay to a file.
+
+    The recorder attaches itself to the game when it is created, and detaches
+    itself when it is closed.  The game calls it from each method that changes
+    the game; nothing else should call the recording methods.
+
+    INSTANCE ATTRIBUTES:
+        _game  [Gameplay, or None once closed]: the game being recorded
+        _file  [file, or None once closed]: the file the records are written to
+        _touch [tuple (x,y), or None if the last touch was None]:
+            the last touch recorded
+        _scale [float, or None if there was no step yet]: the last scale recorded
+        _ticks [int >= 0]: the number of ticks recorded
+        _interval [int > 0]: the number of ticks between snapshots
+    """
+
+    # GETTERS
+    def getticks(self):
+        """Returns the number of ticks recorded so far"""
+        return self._ticks
+
+    # INITIALIZER
+    def __init__(self, path, game, interval=SNAPSHOT_TICKS):
+        """Creates a recorder that writes the calls made to game to the file path
+
+        The file is replaced if it exists.  The game should not have been
+        changed yet, as only the calls made from now on are recorded.  A
+        snapshot of the game is written every interval ticks.
+
+        Precondition: path is a string; game is a Gameplay; interval is an int > 0"""
+        self._file = open(path,'wb')
+        self._game = game
+        self._touch = None
+        self._scale = None
+        self._ticks = 0
+        self._interval = interval
+
+        flags = FLAG_CONTINUOUS if game.get_continuous() else 0
+        self._file.write(REPLAY_HEADER.pack(REPLAY_MAGIC,REPLAY_VERSION,flags,
+                                            game.get_seed(),BRICKS_IN_ROW,BRICK_ROWS))
+        game.set_recorder(self)
+
+    def close(self):
+        """Detaches the recorder from the game and closes the file
+
+        Does nothing if the recorder is already closed."""
+        if self._file is None:
+            return
+        self._game.set_recorder(None)
+        self._file.close()
+        self._game = None
+        self._file = None
+
+    # RECORDING METHODS (CALLED BY GAMEPLAY)
+    def touch(self, touch):
+        """Records a call to updatePaddle
+
+        Precondition: touch is a GPoint or None"""
+        if self._ticks > 0 and self._ticks % self._interval == 0:
+            self._snapshot()
+        self._ticks = self._ticks + 1
+        if touch is None:
+            self._touch = None
+            self._file.write(chr(OP_RELEASE))
+            return
+
+        point = (touch.x,touch.y)
+        if point == self._touch:
+            self._file.write(chr(OP_HOLD))
+        else:
+            self._touch = point
+            self._file.write(chr(OP_TOUCH)+_POINT.pack(touch.x,touch.y))
+
+    def move(self, scale):
+        """Records a call to moveBall
+
+        Precondition: scale is an int or float > 0"""
+        if scale == self._scale:
+            self._file.write(chr(OP_STEP))
+        else:
+            self._scale = scale
+            self._file.write(chr(OP_MOVE)+_FLOAT.pack(scale))
+
+    def resetball(self):
+        """Records a call to resetball"""
+        self._file.write(chr(OP_RESET))
+
+    def settries(self, lives):
+        """Records a call to set_tries
+
+        Precondition: lives is an int >= 0"""
+        self._file.write(chr(OP_TRIES)+_INT.pack(lives))
+
+    def setlostlife(self, lostlife):
+        """Records a call to set_lostlife
+
+        Precondition: lostlife is a bool"""
+        self._file.write(chr(OP_LOST if lostlife else OP_FOUND))
+
+    # HELPER METHODS
+    def _snapshot(self):
+        """Writes a snapshot of the game as it is after _ticks ticks
+
+        The next touch and step are written in full, so that they do not
+        depend on anything before the snapshot."""
+        data = pack_state(self._game.getstate(),True)
+        self._file.write(chr(OP_SNAPSHOT)+_SNAPSHOT.pack(self._ticks,len(data))+data)
+        self._touch = None
+        self._scale = None
+
+
+class Replayer(object):
+    """An instance plays a recording back into a new Gameplay.
+
+    The game is created with the seed and the collision mode in the recording,
+    and is never drawn.  The recording must have been made with the same wall
+    size as the current constants, or the replay would not match.
+
+    A recording that ends in the middle of a record (because the game that
+    wrote it crashed) is replayed up to the last complete record.
+
+    INSTANCE ATTRIBUTES:
+        _game  [Gameplay]: the game being replayed
+        _seed  [int >= 0]: the seed of the recorded game
+        _continuous [bool]: True if the recorded game swept the ball
+        _data  [str]: the whole recording
+        _pos   [int >= 0]: the offset of the next record in _data
+        _touch [GPoint, or None if the last touch was None]: the last touch replayed
+        _scale [float]: the last scale replayed
+        _ticks [int >= 0]: the number of ticks replayed
+        _snapticks [list of int]: the tick of each snapshot, in increasing order
+        _snappos   [list of int]: the offset in _data of each snapshot record
+        _length [int >= 0]: the number of ticks in the recording
+    """
+
+    # GETTERS
+    def getgame(self):
+        """Returns the Gameplay object being replayed"""
+        return self._game
+
+    def getticks(self):
+        """Returns the number of ticks replayed so far"""
+        return self._ticks
+
+    def isdone(self):
+        """Returns True if every record has been replayed"""
+        return self._next() is None
+
+    def getlength(self):
+        """Returns the number of ticks in the recording"""
+        return self._length
+
+    # INITIALIZER
+    def __init__(self, path):
+        """Opens the recording in the file path
+
+        Raises ValueError if the file is not a recording, or if it was made
+        with a different wall size.
+
+        Precondition: path is a string"""
+        f = open(path,'rb')
+        try:
+            self._data = f.read()
+        finally:
+            f.close()
+
+        if len(self._data) < REPLAY_HEADER.size:
+            raise ValueError(`path`+' is not a Breakout recording')
+        magic, version, flags, seed, cols, rows = REPLAY_HEADER.unpack_from(self._data)
+        if magic != REPLAY_MAGIC:
+            raise ValueError(`path`+' is not a Breakout recording')
+        if version != REPLAY_VERSION:
+            raise ValueError(`path`+' has unsupported version '+`version`)
+        if (cols, rows) != (BRICKS_IN_ROW, BRICK_ROWS):
+            raise ValueError(`path`+' was recorded with a '+`cols`+'x'+`rows`+' wall')
+
+        self._seed = seed
+        self._continuous = bool(flags & FLAG_CONTINUOUS)
+        self._index()
+        self._restart()
+
+    # REPLAY LOOP
+    def step(self):
+        """Replays one tick.
+
+        Returns True if a tick was replayed, False at the end of the recording."""
+        op = self._next()
+        if op is None:
+            return False
+        self._apply(op)
+        op = self._next()
+        while op is not None and op not in (OP_TOUCH,OP_HOLD,OP_RELEASE):
+            self._apply(op)
+            op = self._next()
+        return True
+
+    def run(self):
+        """Replays the rest of the recording.
+
+        Returns the number of ticks replayed in total."""
+        while self.step():
+            pass
+        return self._ticks
+
+    def seek(self, tick):
+        """Puts the game in the state it had after the given number of ticks
+
+        The game is restored from the last snapshot at or before tick (or
+        started over if there is none) unless it can get there sooner by
+        replaying from where it is.  Seeking past the end of the recording
+        stops at the end.
+
+        Returns the number of ticks replayed in total.
+
+        Precondition: tick is an int >= 0"""
+        which = bisect.bisect_right(self._snapticks,tick)-1
+        if which >= 0 and (tick < self._ticks or self._snapticks[which] > self._ticks):
+            pos = self._snappos[which]
+            self._game.setstate(unpack_state(self._data,pos+1+_SNAPSHOT.size))
+            self._ticks = self._snapticks[which]
+            self._pos = pos+1+_SNAPSHOT.size+_SNAPSHOT.unpack_from(self._data,pos+1)[1]
+        elif tick < self._ticks:
+            self._restart()
+        while self._ticks < tick and self.step():
+            pass
+        return self._ticks
+
+    # HELPER METHODS
+    def _restart(self):
+        """Starts the replay over with a new game"""
+        self._game = Gameplay(self._seed,self._continuous)
+        self._pos = REPLAY_HEADER.size
+        self._touch = None
+        self._scale = 1.0
+        self._ticks = 0
+
+    def _index(self):
+        """Finds the snapshots and the number of ticks in the recording"""
+        self._snapticks = []
+        self._snappos = []
+        self._length = 0
+        pos = REPLAY_HEADER.size
+        size = self._size(pos)
+        while size is not None:
+            op = ord(self._data[pos])
+            if op in (OP_TOUCH,OP_HOLD,OP_RELEASE):
+                self._length = self._length + 1
+            elif op == OP_SNAPSHOT:
+                self._snapticks.append(_SNAPSHOT.unpack_from(self._data,pos+1)[0])
+                self._snappos.append(pos)
+            pos = pos+size
+            size = self._size(pos)
+
+    def _size(self, pos):
+        """Returns: the size of the complete record at pos, or None if there is none
+
+        Precondition: pos is an int >= 0"""
+        if pos >= len(self._data):
+            return None
+        op = ord(self._data[pos])
+        size = 1
+        if op == OP_TOUCH:
+            size = size+_POINT.size
+        elif op == OP_MOVE:
+            size = size+_FLOAT.size
+        elif op == OP_TRIES:
+            size = size+_INT.size
+        elif op == OP_SNAPSHOT:
+            if pos+1+_SNAPSHOT.size > len(self._data):
+                return None
+            size = size+_SNAPSHOT.size+_SNAPSHOT.unpack_from(self._data,pos+1)[1]
+        elif op < OP_TOUCH or op > OP_SNAPSHOT:
+            raise ValueError('unknown record '+`op`+' at offset '+`pos`)
+        if pos+size > len(self._data):
+            return None
+        return size
+
+    def _next(self):
+        """Returns: the opcode of the next complete record, or None if there is none"""
+        if self._size(self._pos) is None:
+            return None
+        return ord(self._data[self._pos])
+
+    def _apply(self, op):
+        """Makes the call in the record at _pos and moves past the record
+
+        Precondition: op is the opcode of a complete record at _pos"""
+        pos = self._pos+1
+        if op == OP_TOUCH:
+            x, y = _POINT.unpack_from(self._data,pos)
+            pos = pos+_POINT.size
+            self._touch = GPoint(x,y)
+        elif op == OP_RELEASE:
+            self._touch = None
+        elif op == OP_MOVE:
+            self._scale = _FLOAT.unpack_from(self._data,pos)[0]
+            pos = pos+_FLOAT.size
+        elif op == OP_TRIES:
+            lives = _INT.unpack_from(self._data,pos)[0]
+            pos = pos+_INT.size
+        elif op == OP_SNAPSHOT:
+            # Only needed for seeking
+            pos = pos+_SNAPSHOT.size+_SNAPSHOT.unpack_from(self._data,pos)[1]
+        self._pos = pos
+
+        if op in (OP_TOUCH,OP_HOLD,OP_RELEASE):
+            self._game.updatePaddle(self._touch)
+            self._ticks = self._ticks + 1
+        elif op in (OP_MOVE,OP_STEP):
+            self._game.moveBall(self._scale)
+        elif op == OP_RESET:
+            self._game.resetball()
+        elif op == OP_TRIES:
+            self._game.set_tries(lives)
+        elif op != OP_SNAPSHOT:
+            self._game.set_lostlife(op == OP_LOST)
@@ -0,0 +1,131 @@
+# simulation.py
+"""Headless driver for Breakout
+
+This module plays games of Breakout without a window or sound.  Nothing here
+draws, so it works whether or not game2d is headless.  A script that only runs
+simulations should set the environment variable GAME2D_HEADLESS before it
+imports this module, so that Kivy and pygame are never loaded:
+
+    GAME2D_HEADLESS=1 python myscript.py
+
+The class Simulation follows the same rules as Breakout in the STATE_ACTIVE
+state, but with no countdowns or pauses: when the ball is lost, the next ball
+is served immediately.  It is driven by a plain loop, one call to step per
+animation frame."""
+from constants import *
+from game2d import *
+from gameplay import *
+
+
+class Simulation(object):
+    """An instance plays a single game of Breakout without a view.
+    
+    A controller is any callable that takes the Gameplay object and returns the
+    x coordinate the center of the paddle should move to, or None to let go of
+    the paddle.  It may only look at the game through the getters of Gameplay.
+    The simulation turns these targets into the touches that Breakout would get
+    from the mouse.
+    
+    INSTANCE ATTRIBUTES:
+        _game  [Gameplay]: the game being played
+        _last  [GPoint, or None if the paddle is not held]:
+            the touch passed to the game in the last step
+        _ticks [int >= 0]: the number of calls to step so far
+        _over  [bool]: True if the game has been won or lost
+        _won   [bool]: True if the game ended with an empty wall
+    """
+    
+    # GETTERS
+    def getgame(self):
+        """Returns the Gameplay object being simulated"""
+        return self._game
+    
+    def getticks(self):
+        """Returns the number of steps simulated so far"""
+        return self._ticks
+    
+    def isover(self):
+        """Returns True if the game is finished, False otherwise"""
+        return self._over
+    
+    def iswon(self):
+        """Returns True if the game finished with an empty wall"""
+        return self._won
+    
+    # INITIALIZER
+    def __init__(self, game=None, seed=None, continuous=None):
+        """Creates a simulation of game
+        
+        If game is None, a new Gameplay is created with the given seed and
+        collision mode (see Gameplay.__init__).
+        
+        Precondition: game is a Gameplay or None; seed is an int >= 0 or None;
+        continuous is a boolean or None"""
+        self._game = Gameplay(seed,continuous) if game is None else game
+        self._last = None
+        self._ticks = 0
+        self._over = False
+        self._won = False
+    
+    # STEP LOOP
+    def step(self, touch):
+        """Simulates one animation frame with the given touch.
+        
+        This is the work Breakout does in STATE_ACTIVE.  If the ball is lost and
+        there are tries left, a new ball is served right away.  Does nothing
+        once the game is over.
+        
+        Precondition: touch is a GPoint or None"""
+        if self._over:
+            return
+        
+        self._game.updatePaddle(touch)
+        self._game.moveBall()
+        self._last = touch
+        self._ticks = self._ticks + 1
+        
+        if self._game.get_lostlife():
+            if self._game.get_tries() > 0:
+                self._game.set_tries(self._game.get_tries()-1)
+                self._game.resetball()
+                self._game.set_lostlife(False)
+            else:
+                self._over = True
+        elif self._game.wall_none():
+            self._over = True
+            self._won = True
+    
+    def stepto(self, target):
+        """Simulates one animation frame, moving the paddle center toward target.
+        
+        This turns target into the touch Breakout would get from the mouse.  If
+        target is None, the paddle is let go.
+        
+        Precondition: target is an int, float or None"""
+        self.step(self._touchFor(target))
+    
+    def run(self, controller, maxticks=100000):
+        """Plays the game with controller until it is over or maxticks steps pass.
+        
+        Returns True if the game was won, False otherwise.
+        
+        Precondition: controller is a callable from Gameplay to a number or None.
+        maxticks is an int >= 0."""
+        while not self._over and self._ticks < maxticks:
+            self.stepto(controller(self._game))
+        return self._won
+    
+    # HELPER METHODS
+    def _touchFor(self, target):
+        """Returns: the touch that moves the paddle center toward target
+        
+        Gameplay.updatePaddle keeps the paddle at a fixed distance from where
+        it was first pressed.  So the first touch presses the center of the
+        paddle, and later touches are at the target itself.
+        
+        Precondition: target is an int, float or None"""
+        if target is None:
+            return None
+        if self._last is None:
+            return GPoint(self._game.get_paddlex()+PADDLE_WIDTH/2.0,PADDLE_OFFSET)
+        return GPoint(float(target),PADDLE_OFFSET)
@@ -0,0 +1,339 @@
+# state.py
+"""Compact binary format for the state of a game of Breakout
+
+Gameplay cannot be pickled usefully: every GObject in it drags along its
+drawing instructions.  This module writes the state returned by
+Gameplay.getstate in a small, fixed layout instead.  All numbers are little
+endian.
+
+    header   magic 'BKST', version (byte), flags (byte),
+             BRICKS_IN_ROW and BRICK_ROWS of the wall (unsigned shorts)
+    numbers  paddlex, clickdist, touch x, touch y, ballx, bally,
+             ballvx, ballvy (doubles), tries (int), lostlife (byte)
+    random   (only with FLAG_RANDOM) the state of the random generator:
+             version (int), 625 words (unsigned ints), has gauss (byte),
+             gauss (double)
+    bricks   one bit per slot of the wall, row by row, with the first slot
+             in the highest bit of the first byte
+
+The touch is only meaningful with FLAG_TOUCH.  Without the random block, a
+state is under 100 bytes for the usual wall.  Every state of the same wall
+and flags has the same size, so many states can be stored back to back in
+one file and found by position.
+
+A StateView reads a state in place, from any buffer: a string, a bytearray,
+a memoryview, or an mmap of a file.  Nothing is copied until a value is asked
+for, so a large file of states can be mapped and scanned without loading it."""
+import mmap
+import struct
+from constants import *
+
+
+#: the first bytes of every state
+STATE_MAGIC   = 'BKST'
+#: the version of the state format
+STATE_VERSION = 1
+#: the header: magic, version, flags, BRICKS_IN_ROW, BRICK_ROWS
+STATE_HEADER  = struct.Struct('<4sBBHH')
+#: flag for a state that holds the state of the random generator
+FLAG_RANDOM = 1
+#: flag for a state of a game whose paddle is held
+FLAG_TOUCH  = 2
+
+# The numbers: paddlex, clickdist, touch x, touch y, ballx, bally, ballvx,
+# ballvy, tries, lostlife
+_NUMBERS = struct.Struct('<ddddddddiB')
+# The random generator: version, 625 words, has gauss, gauss
+_RANDOM  = struct.Struct('<i625IBd')
+_FLOAT   = struct.Struct('<d')
+_BYTE    = struct.Struct('<B')
+
+# Each byte of the bitset as 8 bytes of the mask, and back
+_UNPACKED = [bytearray((value >> (7-bit)) & 1 for bit in range(8)) for value in range(256)]
+_PACKED   = dict((str(_UNPACKED[value]),value) for value in range(256))
+# The number of bricks in each byte of the bitset
+_COUNTS   = [bin(value).count('1') for value in range(256)]
+
+
+#### PUBLIC FUNCTIONS ####
+def state_size(cols=BRICKS_IN_ROW, rows=BRICK_ROWS, random=False):
+    """Returns: the size in bytes of a state of a wall with the given size
+
+    Precondition: cols and rows are ints > 0; random is a bool (True if the
+    state has the random generator)"""
+    size = STATE_HEADER.size+_NUMBERS.size+(cols*rows+7)//8
+    if random:
+        size = size+_RANDOM.size
+    return size
+
+
+def pack_state(state, random=False):
+    """Returns: the bytes (a string) for the state of a game
+
+    The state is in the form returned by Gameplay.getstate.  The state of the
+    random generator is left out unless random is True.  It is over 2500
+    bytes, and only a game that is played on from the state needs it.
+
+    Precondition: state is a tuple returned by Gameplay.getstate, for a wall of
+    the current size; random is a bool"""
+    (mask, paddlex, clickdist, last, ballx, bally, ballvx, ballvy,
+     tries, lostlife, rngstate) = state
+    assert len(mask) == BRICKS_IN_ROW*BRICK_ROWS, 'mask has the wrong length'
+
+    flags = 0
+    if last is None:
+        last = (0.0,0.0)
+    else:
+        flags = flags | FLAG_TOUCH
+    if random:
+        flags = flags | FLAG_RANDOM
+
+    data = [STATE_HEADER.pack(STATE_MAGIC,STATE_VERSION,flags,BRICKS_IN_ROW,BRICK_ROWS),
+            _NUMBERS.pack(paddlex,clickdist,last[0],last[1],ballx,bally,ballvx,ballvy,
+                          tries,int(lostlife))]
+    if random:
+        version, words, gauss = rngstate
+        data.append(_RANDOM.pack(*((version,)+tuple(words)+(gauss is not None,gauss or 0.0))))
+    data.append(_pack_bits(mask))
+    return ''.join(data)
+
+
+def unpack_state(buffer, offset=0):
+    """Returns: the state in buffer at offset, in the form of Gameplay.getstate
+
+    If the state does not have the random generator, the last value of the
+    tuple is None.  Raises ValueError if there is no valid state at offset.
+
+    Precondition: buffer is a string, bytearray, memoryview or mmap; offset is
+    an int >= 0"""
+    return StateView(buffer,offset).tostate()
+
+
+def append_state(path, state, random=False):
+    """Adds a state to the end of the file at path, creating it if needed
+
+    Precondition: state is a tuple returned by Gameplay.getstate; random is a
+    bool (True to store the random generator)"""
+    f = open(path,'ab')
+    try:
+        f.write(pack_state(state,random))
+    finally:
+        f.close()
+
+
+#### HIDDEN HELPER FUNCTIONS ####
+def _pack_bits(mask):
+    """Returns: the bitset (a string) of a mask of 0s and 1s
+
+    Precondition: mask is a bytearray of 0s and 1s"""
+    mask = mask+bytearray(-len(mask) % 8)
+    return ''.join(chr(_PACKED[str(mask[pos:pos+8])]) for pos in range(0,len(mask),8))
+
+
+class StateView(object):
+    """An instance reads one state in place from a buffer.
+
+    The header is checked when the view is made.  Every other value is read
+    from the buffer when it is asked for, so a view costs almost nothing to
+    make.  The buffer must not change while the view is in use.
+
+    INSTANCE ATTRIBUTES:
+        _buffer [string, bytearray, memoryview or mmap]: the bytes of the state
+        _offset [int >= 0]: the position of the state in _buffer
+        _flags  [int]: the flags of the state
+        _cols   [int > 0]: the number of bricks in each row of the wall
+        _rows   [int > 0]: the number of rows of the wall
+        _bits   [int >= 0]: the position of the bitset in _buffer
+    """
+
+    # GETTERS
+    def getsize(self):
+        """Returns the size of the state in bytes"""
+        return self._bits+(self._cols*self._rows+7)//8-self._offset
+
+    def getcols(self):
+        """Returns the number of bricks in each row of the wall"""
+        return self._cols
+
+    def getrows(self):
+        """Returns the number of rows of the wall"""
+        return self._rows
+
+    def hasrandom(self):
+        """Returns True if the state has the state of the random generator"""
+        return bool(self._flags & FLAG_RANDOM)
+
+    def getpaddlex(self):
+        """Returns the x coordinate of the left edge of the paddle"""
+        return self._number(0)
+
+    def getclickdist(self):
+        """Returns the distance from the left of the paddle to where it was pressed"""
+        return self._number(1)
+
+    def getlast(self):
+        """Returns the last touch as a pair (x,y), or None if the paddle is not held"""
+        if not self._flags & FLAG_TOUCH:
+            return None
+        return (self._number(2),self._number(3))
+
+    def getballx(self):
+        """Returns the x coordinate of the left edge of the ball"""
+        return self._number(4)
+
+    def getbally(self):
+        """Returns the y coordinate of the bottom edge of the ball"""
+        return self._number(5)
+
+    def getballvx(self):
+        """Returns the horizontal velocity of the ball"""
+        return self._number(6)
+
+    def getballvy(self):
+        """Returns the vertical velocity of the ball"""
+        return self._number(7)
+
+    def gettries(self):
+        """Returns the number of tries left"""
+        return _NUMBERS.unpack_from(self._buffer,self._offset+STATE_HEADER.size)[8]
+
+    def getlostlife(self):
+        """Returns True if the ball was lost"""
+        return bool(_NUMBERS.unpack_from(self._buffer,self._offset+STATE_HEADER.size)[9])
+
+    def getrandom(self):
+        """Returns the state of the random generator, or None if it is not stored"""
+        if not self._flags & FLAG_RANDOM:
+            return None
+        words = _RANDOM.unpack_from(self._buffer,self._offset+STATE_HEADER.size+_NUMBERS.size)
+        return (words[0],tuple(long(word) for word in words[1:626]),
+                words[627] if words[626] else None)
+
+    def isalive(self, slot):
+        """Returns True if the brick in the given slot is still in the wall
+
+        Precondition: slot is an int in 0..cols*rows-1"""
+        value = _BYTE.unpack_from(self._buffer,self._bits+slot//8)[0]
+        return bool((value >> (7-slot % 8)) & 1)
+
+    def getcount(self):
+        """Returns the number of bricks still in the wall"""
+        return sum(_COUNTS[value] for value in self._bytes())
+
+    def getmask(self):
+        """Returns a new bytearray with a 1 for each slot with a brick, as in BrickWall.getmask"""
+        mask = bytearray()
+        for value in self._bytes():
+            mask.extend(_UNPACKED[value])
+        return mask[:self._cols*self._rows]
+
+    # INITIALIZER
+    def __init__(self, buffer, offset=0):
+        """Creates a view of the state in buffer at offset
+
+        Raises ValueError if there is no valid state at offset.
+
+        Precondition: buffer is a string, bytearray, memoryview or mmap; offset
+        is an int >= 0"""
+        if len(buffer) < offset+STATE_HEADER.size:
+            raise ValueError('no state at offset '+`offset`)
+        magic, version, flags, cols, rows = STATE_HEADER.unpack_from(buffer,offset)
+        if magic != STATE_MAGIC:
+            raise ValueError('no state at offset '+`offset`)
+        if version != STATE_VERSION:
+            raise ValueError('unsupported state version '+`version`)
+
+        self._buffer = buffer
+        self._offset = offset
+        self._flags = flags
+        self._cols = cols
+        self._rows = rows
+        self._bits = offset+STATE_HEADER.size+_NUMBERS.size
+        if flags & FLAG_RANDOM:
+            self._bits = self._bits+_RANDOM.size
+        if len(buffer) < offset+self.getsize():
+            raise ValueError('state at offset '+`offset`+' is cut short')
+
+    # CONVERSION
+    def tostate(self):
+        """Returns: the state in the form of Gameplay.getstate
+
+        If the state does not have the random generator, the last value of the
+        tuple is None."""
+        (paddlex, clickdist, lastx, lasty, ballx, bally, ballvx, ballvy,
+         tries, lostlife) = _NUMBERS.unpack_from(self._buffer,self._offset+STATE_HEADER.size)
+        last = (lastx,lasty) if self._flags & FLAG_TOUCH else None
+        return (self.getmask(), paddlex, clickdist, last, ballx, bally, ballvx, ballvy,
+                tries, bool(lostlife), self.getrandom())
+
+    # HELPER METHODS
+    def _number(self, index):
+        """Returns: the double at the given position of the numbers
+
+        Precondition: index is an int in 0..7"""
+        return _FLOAT.unpack_from(self._buffer,self._offset+STATE_HEADER.size+8*index)[0]
+
+    def _bytes(self):
+        """Returns: the bytes of the bitset, as a tuple of ints"""
+        size = (self._cols*self._rows+7)//8
+        return struct.unpack_from('<'+`size`+'B',self._buffer,self._bits)
+
+
+class StateFile(object):
+    """An instance maps a file of states stored back to back.
+
+    The file is mapped with mmap, so states are only read from disk when they
+    are looked at.  Every state must have the same size as the first.  States
+    are added to such a file with append_state.
+
+    INSTANCE ATTRIBUTES:
+        _file [file]: the open file
+        _map  [mmap, or None if the file is empty]: the mapped contents of _file
+        _size [int > 0]: the size of each state
+        _count [int >= 0]: the number of states in the file
+    """
+
+    # GETTERS
+    def __len__(self):
+        """Returns the number of states in the file"""
+        return self._count
+
+    def __getitem__(self, index):
+        """Returns the StateView of the state at the given position
+
+        Precondition: index is an int in 0..len(self)-1"""
+        if index < 0 or index >= self._count:
+            raise IndexError('state index out of range')
+        return StateView(self._map,index*self._size)
+
+    # INITIALIZER
+    def __init__(self, path):
+        """Maps the file of states at path
+
+        Raises ValueError if the file does not start with a state, or if its
+        length is not a whole number of states.
+
+        Precondition: path is a string naming a file"""
+        self._file = open(path,'rb')
+        self._map = None
+        self._size = 1
+        self._count = 0
+        try:
+            self._file.seek(0,2)
+            length = self._file.tell()
+            if length > 0:
+                self._map = mmap.mmap(self._file.fileno(),0,access=mmap.ACCESS_READ)
+                self._size = StateView(self._map).getsize()
+                if length % self._size != 0:
+                    raise ValueError(`path`+' does not hold a whole number of states')
+                self._count = length // self._size
+        except:
+            self.close()
+            raise
+
+    def close(self):
+        """Unmaps and closes the file.  Views of its states can no longer be used."""
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
@@ -0,0 +1,188 @@
+# tournament.py
+"""Parallel evaluation of paddle controllers
+
+A tournament plays many seeded games of Breakout with one controller, spread
+over a pool of processes, and adds up the results.  The games are played by
+simulation.Simulation, so no window is opened.  Game i of a tournament with
+seed s is played with the seed s+i, so running the same tournament twice gives
+the same results.
+
+A controller is a callable as in Simulation.run: it takes the Gameplay object
+and returns the x coordinate the center of the paddle should move to (or None
+to let go of the paddle).  It is sent to the other processes, so it must be
+picklable: a function defined at the top of a module, or an instance of a
+class defined at the top of a module.
+
+The module can also be run as a script to try one of the controllers below:
+
+    python tournament.py --games 200 --controller follow_ball
+
+Run this way, the module sets GAME2D_HEADLESS before anything imports game2d,
+so neither it nor the worker processes load Kivy.  A script that imports this
+module should set GAME2D_HEADLESS itself."""
+import os
+if __name__ == '__main__':
+    os.environ.setdefault('GAME2D_HEADLESS','1')
+
+import multiprocessing
+import time
+from constants import *
+from simulation import *
+
+
+#### CONTROLLERS ####
+def follow_ball(game):
+    """Returns: the center of the ball, so that the paddle is always under it
+
+    Precondition: game is a Gameplay"""
+    return game.get_ballx()+BALL_DIAMETER/2.0
+
+
+def stand_still(game):
+    """Returns: None, so that the paddle never moves
+
+    Precondition: game is a Gameplay"""
+    return None
+
+
+#### HIDDEN HELPER FUNCTIONS ####
+def _play(args):
+    """Returns: (won, cleared, ticks, seconds) for one game
+
+    won is True if the game was won, cleared is the number of bricks removed,
+    ticks the number of steps and seconds the time it took to play.
+
+    Precondition: args is a tuple (controller, seed, maxticks)"""
+    controller, seed, maxticks = args
+    start = time.time()
+    sim = Simulation(seed=seed)
+    won = sim.run(controller,maxticks)
+    cleared = BRICKS_IN_ROW*BRICK_ROWS-sim.getgame().get_bricksleft()
+    return (won, cleared, sim.getticks(), time.time()-start)
+
+
+class Tournament(object):
+    """An instance plays a number of seeded games with one controller.
+
+    The games are played when run is called.  The results can then be read
+    with the getters.
+
+    INSTANCE ATTRIBUTES:
+        _controller [callable]: the controller playing every game
+        _games   [int > 0]: the number of games to play
+        _seed    [int >= 0]: the seed of the first game
+        _maxticks [int > 0]: the most steps each game may last
+        _processes [int > 0, or None for one per core]: the size of the pool
+        _wins    [int >= 0]: the number of games won
+        _cleared [int >= 0]: the number of bricks removed over all games
+        _ticks   [int >= 0]: the number of steps over all games
+        _cputime [float >= 0]: the time spent playing, added over all processes
+        _elapsed [float >= 0]: the time the whole tournament took
+    """
+
+    # GETTERS
+    def getgames(self):
+        """Returns the number of games in the tournament"""
+        return self._games
+
+    def getwins(self):
+        """Returns the number of games won"""
+        return self._wins
+
+    def getwinrate(self):
+        """Returns the fraction of games won"""
+        return self._wins/float(self._games)
+
+    def getcleared(self):
+        """Returns the average number of bricks removed in a game"""
+        return self._cleared/float(self._games)
+
+    def getticks(self):
+        """Returns the number of steps played over all games"""
+        return self._ticks
+
+    def getrate(self):
+        """Returns the number of steps played per second of the whole tournament"""
+        if self._elapsed == 0:
+            return 0.0
+        return self._ticks/self._elapsed
+
+    def getprocessrate(self):
+        """Returns the number of steps one process plays per second"""
+        if self._cputime == 0:
+            return 0.0
+        return self._ticks/self._cputime
+
+    # INITIALIZER
+    def __init__(self, controller, games=100, seed=0, maxticks=100000, processes=None):
+        """Creates a tournament of games games played by controller
+
+        If processes is None, the pool has one process per core.  If it is 1,
+        the games are played in this process, so the controller does not need
+        to be picklable.
+
+        Precondition: controller is a picklable callable from Gameplay to a
+        number or None.  games and maxticks are ints > 0, seed is an int >= 0,
+        and processes is an int > 0 or None."""
+        self._controller = controller
+        self._games = games
+        self._seed = seed
+        self._maxticks = maxticks
+        self._processes = processes
+        self._wins = 0
+        self._cleared = 0
+        self._ticks = 0
+        self._cputime = 0.0
+        self._elapsed = 0.0
+
+    # PLAY
+    def run(self):
+        """Plays every game of the tournament and adds up the results.
+
+        Returns the fraction of games won."""
+        jobs = [(self._controller,self._seed+game,self._maxticks) for game in range(self._games)]
+        start = time.time()
+        if self._processes == 1:
+            results = map(_play,jobs)
+        else:
+            processes = self._processes or multiprocessing.cpu_count()
+            pool = multiprocessing.Pool(processes)
+            try:
+                results = pool.map(_play,jobs,chunksize=max(1,len(jobs)//(8*processes)))
+            finally:
+                pool.close()
+                pool.join()
+        self._elapsed = time.time()-start
+
+        self._wins = 0
+        self._cleared = 0
+        self._ticks = 0
+        self._cputime = 0.0
+        for won, cleared, ticks, seconds in results:
+            self._wins = self._wins+int(won)
+            self._cleared = self._cleared+cleared
+            self._ticks = self._ticks+ticks
+            self._cputime = self._cputime+seconds
+        return self.getwinrate()
+
+
+# Script code
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Play a tournament of Breakout games.')
+    parser.add_argument('--controller',default='follow_ball',
+                        choices=['follow_ball','stand_still'])
+    parser.add_argument('--games',type=int,default=100)
+    parser.add_argument('--seed',type=int,default=0)
+    parser.add_argument('--maxticks',type=int,default=100000)
+    parser.add_argument('--processes',type=int,default=None)
+    options = parser.parse_args()
+
+    tournament = Tournament(globals()[options.controller],options.games,options.seed,
+                            options.maxticks,options.processes)
+    tournament.run()
+    print 'games:          %d' % tournament.getgames()
+    print 'win rate:       %.3f' % tournament.getwinrate()
+    print 'bricks cleared: %.1f of %d' % (tournament.getcleared(),BRICKS_IN_ROW*BRICK_ROWS)
+    print 'ticks/sec:      %.0f (%.0f per process)' % (tournament.getrate(),
+                                                       tournament.getprocessrate())